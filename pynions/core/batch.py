@@ -0,0 +1,343 @@
+"""Bulk LLM completions through provider batch APIs"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+import weakref
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import default_cache_path
+from .config import config
+from .transport import NO_RETRY, RetryPolicy, get_transport
+
+logger = logging.getLogger("pynions.batch")
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+BATCH_ENDPOINT = "/v1/chat/completions"
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 5.0  # Seconds to wait for more requests before submitting
+DEFAULT_POLL_INTERVAL = 60.0
+OPEN_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+
+
+class BatchError(Exception):
+    """Raised to a caller whose request failed inside a batch"""
+
+
+def request_id(body: Dict[str, Any]) -> str:
+    """Stable custom_id for a request body; identical requests share one"""
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def _multipart(fields: Dict[str, str], filename: str, content: bytes):
+    """Encode a multipart/form-data body with one file part"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"'
+            f"\r\n\r\n{value}\r\n".encode("utf-8")
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+        f'filename="{filename}"\r\nContent-Type: application/jsonl\r\n\r\n'.encode(
+            "utf-8"
+        )
+        + content
+        + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    )
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class OpenAIBatchBackend:
+    """OpenAI-compatible Batch API: upload a JSONL file, create, poll, download"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        completion_window: str = "24h",
+    ):
+        self.api_key = api_key
+        self.base_url = (
+            base_url or config.get("OPENAI_BATCH_BASE_URL") or DEFAULT_BASE_URL
+        ).rstrip("/")
+        self.completion_window = completion_window
+        # Polls and downloads are retried; submit() is not, since a retried
+        # upload or create could start the same batch twice
+        self.transport = get_transport(
+            "openai_batch", timeout=300, retry=RetryPolicy(attempts=3)
+        )
+
+    def _headers(self, content_type: str = "application/json") -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": content_type}
+
+    async def _json(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        response = await self.transport.request(
+            method, f"{self.base_url}{path}", **kwargs
+        )
+        response.raise_for_status()
+        return await response.json()
+
+    async def submit(self, requests: Dict[str, Dict[str, Any]]) -> str:
+        """Upload requests (custom_id -> body) and start a batch; returns its id"""
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": body,
+                }
+            )
+            for custom_id, body in requests.items()
+        ]
+        content = ("\n".join(lines) + "\n").encode("utf-8")
+        body, content_type = _multipart({"purpose": "batch"}, "batch.jsonl", content)
+        uploaded = await self._json(
+            "POST",
+            "/files",
+            data=body,
+            headers=self._headers(content_type),
+            retry=NO_RETRY,
+        )
+        batch = await self._json(
+            "POST",
+            "/batches",
+            json={
+                "input_file_id": uploaded["id"],
+                "endpoint": BATCH_ENDPOINT,
+                "completion_window": self.completion_window,
+            },
+            headers=self._headers(),
+            retry=NO_RETRY,
+        )
+        return batch["id"]
+
+    async def poll(
+        self, batch_id: str
+    ) -> Tuple[str, Optional[Dict[str, Dict[str, Any]]]]:
+        """Return (status, results) where results map custom_id to a body or error
+
+        results is None until the batch has finished.
+        """
+        batch = await self._json("GET", f"/batches/{batch_id}", headers=self._headers())
+        status = batch["status"]
+        if status in OPEN_STATUSES:
+            return status, None
+
+        results = {}
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if file_id:
+                results.update(await self._results(file_id))
+        return status, results
+
+    async def _results(self, file_id: str) -> Dict[str, Dict[str, Any]]:
+        response = await self.transport.request(
+            "GET", f"{self.base_url}/files/{file_id}/content", headers=self._headers()
+        )
+        response.raise_for_status()
+        results = {}
+        for line in (await response.text()).splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            reply = item.get("response") or {}
+            if item.get("error") or reply.get("status_code") != 200:
+                error = item.get("error") or reply.get("body", {}).get("error")
+                results[item["custom_id"]] = {"error": error or "Request failed"}
+            else:
+                results[item["custom_id"]] = {"body": reply["body"]}
+        return results
+
+
+class BatchQueue:
+    """Collects completion requests into batches and resolves callers' awaits
+
+    submit() waits until the request's batch has finished, which can take
+    hours. Requests are grouped until max_batch_size is reached or
+    flush_interval passes without a new one. Batch ids and finished results
+    are written to state_path, so after a restart resume() picks up open
+    batches and a resubmitted request is answered from its original batch
+    instead of being sent again. By default each API key gets its own
+    state file, so queues for different keys don't overwrite each other.
+    """
+
+    def __init__(
+        self,
+        backend: OpenAIBatchBackend,
+        state_path: Optional[Path] = None,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        self.backend = backend
+        if state_path is None:
+            key = hashlib.sha256(backend.api_key.encode("utf-8")).hexdigest()[:12]
+            state_path = default_cache_path().parent / f"batches-{key}.json"
+        self.state_path = Path(state_path)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._poller: Optional[asyncio.Task] = None
+        self.state = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if self.state_path.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"batches": {}, "results": {}}
+
+    def _save(self) -> None:
+        """Write state atomically so a crash never leaves a half-written file"""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def _open_batches(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            batch_id: batch
+            for batch_id, batch in self.state["batches"].items()
+            if batch["status"] in OPEN_STATUSES
+        }
+
+    def _in_open_batch(self, custom_id: str) -> bool:
+        return any(custom_id in b["ids"] for b in self._open_batches().values())
+
+    async def submit(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a chat completion request body and wait for its response body"""
+        custom_id = request_id(body)
+        if custom_id in self.state["results"]:
+            result = self.state["results"].pop(custom_id)
+            self._save()
+            return self._unwrap(result)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(custom_id, []).append(future)
+        if custom_id not in self._pending and not self._in_open_batch(custom_id):
+            self._pending[custom_id] = body
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()  # Wait flush_interval from the newest
+                self._flush_timer = None
+            if len(self._pending) >= self.max_batch_size:
+                await self.flush()
+            else:
+                self._flush_timer = asyncio.get_running_loop().call_later(
+                    self.flush_interval, lambda: asyncio.ensure_future(self.flush())
+                )
+        self._ensure_poller()
+        return self._unwrap(await future)
+
+    @staticmethod
+    def _unwrap(result: Dict[str, Any]) -> Dict[str, Any]:
+        if "error" in result:
+            raise BatchError(str(result["error"]))
+        return result["body"]
+
+    async def flush(self) -> Optional[str]:
+        """Submit queued requests now; returns the new batch id"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return None
+        requests, self._pending = self._pending, {}
+        try:
+            batch_id = await self.backend.submit(requests)
+        except Exception as e:
+            logger.error(f"Failed to submit batch of {len(requests)}: {str(e)}")
+            for custom_id in requests:
+                self._resolve(custom_id, {"error": f"Batch submission failed: {e}"})
+            return None
+
+        self.state["batches"][batch_id] = {
+            "status": "validating",
+            "ids": list(requests),
+            "submitted_at": time.time(),
+        }
+        self._save()
+        logger.info(f"Submitted batch {batch_id} with {len(requests)} requests")
+        self._ensure_poller()
+        return batch_id
+
+    def _resolve(self, custom_id: str, result: Dict[str, Any]) -> bool:
+        """Hand a result to waiting callers; False if nobody is waiting"""
+        waiters = [f for f in self._waiters.pop(custom_id, []) if not f.done()]
+        for future in waiters:
+            future.set_result(result)
+        return bool(waiters)
+
+    async def poll_once(self) -> None:
+        """Check every open batch and deliver the results of finished ones"""
+        for batch_id, batch in self._open_batches().items():
+            try:
+                status, results = await self.backend.poll(batch_id)
+            except Exception as e:
+                logger.warning(f"Polling batch {batch_id} failed: {str(e)}")
+                continue
+            batch["status"] = status
+            if results is not None:
+                for custom_id in batch["ids"]:
+                    result = results.get(custom_id) or {
+                        "error": f"Batch {batch_id} ended with status {status}"
+                    }
+                    if not self._resolve(custom_id, result):
+                        # Kept for a caller that resubmits after a restart
+                        self.state["results"][custom_id] = result
+                logger.info(f"Batch {batch_id} {status}")
+            self._save()
+
+    async def resume(self) -> None:
+        """Start polling batches left open by an earlier process"""
+        self._ensure_poller()
+
+    def _ensure_poller(self) -> None:
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll_loop())
+
+    async def _poll_loop(self) -> None:
+        while self._pending or self._open_batches():
+            await asyncio.sleep(self.poll_interval)
+            await self.poll_once()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "open_batches": len(self._open_batches()),
+            "waiting": sum(len(w) for w in self._waiters.values()),
+            "stored_results": len(self.state["results"]),
+        }
+
+
+# One queue per event loop and API key; futures belong to a loop
+_queues: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_batch_queue(api_key: str) -> BatchQueue:
+    """Shared batch queue, configured by the PYNIONS_BATCH_* settings"""
+    queues = _queues.setdefault(asyncio.get_running_loop(), {})
+    if api_key not in queues:
+        queues[api_key] = BatchQueue(
+            OpenAIBatchBackend(api_key),
+            max_batch_size=int(
+                config.get("PYNIONS_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE)
+            ),
+            flush_interval=float(
+                config.get("PYNIONS_BATCH_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+            ),
+            poll_interval=float(
+                config.get("PYNIONS_BATCH_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+            ),
+        )
+    return queues[api_key]
@@ -0,0 +1,186 @@
+"""Fit prompts into a model's context window before sending them"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from .tokens import (
+    CHARS_PER_TOKEN,
+    MESSAGE_OVERHEAD,
+    context_window,
+    count_message_tokens,
+    count_tokens,
+    estimate_message_tokens,
+    estimate_tokens,
+)
+
+DEFAULT_RESERVE = 512  # Slack for estimation error and provider overhead
+# Share of the allowance above which prompts are counted with the tokenizer
+EXACT_COUNT_FROM = 0.75
+TRUNCATION_MARKER = "\n\n[...]"
+
+logger = logging.getLogger("pynions.budget")
+
+
+class TokenBudgetError(ValueError):
+    """Raised when the fixed parts of a prompt alone exceed the budget"""
+
+
+def compact(text: str) -> str:
+    """Drop whitespace that costs tokens but carries no content"""
+    text = re.sub(r"(?<=\S)[ \t]{2,}", " ", text)  # Indentation is kept
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _cut(text: str, chars: int) -> str:
+    """Cut text to at most chars, at a paragraph or sentence end if one is near"""
+    if len(text) <= chars:
+        return text
+    head = text[:chars]
+    for boundary in ("\n\n", "\n", ". "):
+        end = head.rfind(boundary)
+        if end >= chars // 2:
+            return head[: end + len(boundary)].rstrip()
+    return head
+
+
+def truncate(text: str, tokens: int, keep_tail: bool = False) -> str:
+    """Shorten text to about tokens, marking where content was removed
+
+    With keep_tail the start and end are both kept and the middle goes,
+    which preserves closing instructions at the end of a prompt.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    marker = TRUNCATION_MARKER + "\n\n" if keep_tail else TRUNCATION_MARKER
+    chars = max(tokens * CHARS_PER_TOKEN - len(marker), 0)
+    if not keep_tail:
+        return _cut(text, chars) + marker
+    tail_chars = chars // 3
+    tail = text[len(text) - tail_chars :] if tail_chars else ""
+    return _cut(text, chars - tail_chars) + marker + tail
+
+
+class TokenBudget:
+    """Prompt token allowance for one LLM call
+
+    The allowance is the model's context window minus max_tokens, which is
+    reserved for the answer, and a small safety reserve. limit caps it
+    further, e.g. to keep costs down on models with large windows.
+
+        budget = TokenBudget("gpt-4o-mini", max_tokens=1000)
+        pages = budget.allocate(pages, budget.remaining(system_prompt))
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens: int = 0,
+        window: Optional[int] = None,
+        reserve: int = DEFAULT_RESERVE,
+        limit: Optional[int] = None,
+    ):
+        self.model = model
+        self.window = window or context_window(model)
+        self.max_tokens = max_tokens or 0
+        self.prompt_tokens = self.window - self.max_tokens - reserve
+        if limit is not None:
+            self.prompt_tokens = min(self.prompt_tokens, limit)
+
+    def remaining(self, *fixed: str) -> int:
+        """Tokens left for variable content after the given fixed text"""
+        return self.prompt_tokens - sum(estimate_tokens(text) for text in fixed)
+
+    def count_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """Prompt tokens of messages
+
+        The character estimate is enough for prompts well inside the
+        allowance; near or over it the model's tokenizer decides, so
+        prompts are not trimmed on a rough guess.
+        """
+        estimate = estimate_message_tokens(messages)
+        if estimate < self.prompt_tokens * EXACT_COUNT_FROM:
+            return estimate
+        return count_message_tokens(messages, self.model)
+
+    def fits(self, messages: List[Dict[str, Any]]) -> bool:
+        return self.count_messages(messages) <= self.prompt_tokens
+
+    def allocate(
+        self,
+        texts: Dict[str, str],
+        tokens: int,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, str]:
+        """Share tokens between texts, trimming only the ones that don't fit
+
+        Texts smaller than their weighted share are kept whole and their
+        unused share goes to the others, so one long page cannot crowd out
+        the rest. Whitespace is compacted first.
+        """
+        if tokens <= 0 and any(texts.values()):
+            raise TokenBudgetError(
+                f"No room left for content in {self.prompt_tokens} prompt tokens"
+            )
+        texts = {name: compact(text or "") for name, text in texts.items()}
+        weights = weights or {}
+        sizes = {name: estimate_tokens(text) for name, text in texts.items()}
+        shares = {}
+        pending = set(texts)
+        left = tokens
+        while pending:
+            total_weight = sum(weights.get(name, 1.0) for name in pending)
+            fair = {
+                name: left * weights.get(name, 1.0) / total_weight for name in pending
+            }
+            small = {name for name in pending if sizes[name] <= fair[name]}
+            if not small:
+                shares.update({name: int(fair[name]) for name in pending})
+                break
+            for name in small:
+                shares[name] = sizes[name]
+                left -= sizes[name]
+            pending -= small
+
+        fitted = {name: truncate(text, shares[name]) for name, text in texts.items()}
+        trimmed = [name for name in texts if fitted[name] != texts[name]]
+        if trimmed:
+            logger.info(f"Trimmed {len(trimmed)} of {len(texts)} inputs to fit")
+        return fitted
+
+    def fit_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return messages that fit the budget, trimming the longest if needed
+
+        The longest message loses content from its middle, so instructions
+        at either end survive. Raises TokenBudgetError when that is not
+        enough.
+        """
+        excess = self.count_messages(messages) - self.prompt_tokens
+        if excess <= 0:
+            return messages
+        index = max(
+            range(len(messages)),
+            key=lambda i: len(str(messages[i].get("content") or "")),
+        )
+        content = str(messages[index].get("content") or "")
+        tokens = count_tokens(content, self.model)
+        keep = tokens - excess - MESSAGE_OVERHEAD
+        if keep <= 0:
+            raise TokenBudgetError(
+                f"Prompt needs about {self.prompt_tokens + excess} tokens; "
+                f"{self.model} has room for {self.prompt_tokens} with "
+                f"max_tokens={self.max_tokens}"
+            )
+        logger.warning(
+            f"Prompt over budget by ~{excess} tokens for {self.model}; "
+            "trimming the longest message"
+        )
+        fitted = list(messages)
+        # truncate() works in estimated tokens; scale by this text's ratio
+        keep = keep * estimate_tokens(content) // max(tokens, 1)
+        fitted[index] = {
+            **messages[index],
+            "content": truncate(content, keep, keep_tail=True),
+        }
+        return fitted
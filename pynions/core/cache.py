@@ -0,0 +1,562 @@
+"""Persistent, size-bounded caches backed by SQLite"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import config
+from .utils import normalize_url
+
+DEFAULT_CACHE_DIR = "data/cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    meta TEXT NOT NULL DEFAULT '{}',
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, name)
+);
+"""
+
+_initialized = set()
+
+
+def default_cache_path() -> Path:
+    """Location of the shared cache database"""
+    return Path(config.get("PYNIONS_CACHE_DIR", DEFAULT_CACHE_DIR)) / "cache.sqlite3"
+
+
+class CacheEntry:
+    """A cached value with its metadata and age"""
+
+    def __init__(self, key, value, meta, created_at, expires_at):
+        self.key = key
+        self.value = value
+        self.meta = meta
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at is None or time.time() < self.expires_at
+
+
+class SQLiteCache:
+    """Key/value cache shared by threads and processes through one SQLite file
+
+    Each namespace is bounded by max_bytes and evicts least recently used
+    entries first. SQLite's WAL mode and IMMEDIATE transactions let several
+    processes read and write the same file safely; a busy writer simply waits
+    for the lock.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        path: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.namespace = namespace
+        self.path = Path(path) if path else default_cache_path()
+        self.max_bytes = max_bytes or int(
+            config.get("PYNIONS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        )
+        self.logger = logging.getLogger(f"pynions.cache.{namespace}")
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def _init_db(self) -> None:
+        key = str(self.path.resolve())
+        if key in _initialized:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        _initialized.add(key)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for key, fresh or not, and mark it recently used"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, meta, created_at, expires_at FROM entries "
+                "WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key),
+            )
+        finally:
+            conn.close()
+        value, meta, created_at, expires_at = row
+        return CacheEntry(key, value, json.loads(meta), created_at, expires_at)
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: Optional[float] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Store value under key and evict old entries if over budget"""
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(namespace, key, value, meta, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.namespace,
+                    key,
+                    value,
+                    json.dumps(meta or {}),
+                    len(value),
+                    now,
+                    expires_at,
+                    now,
+                ),
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def refresh(
+        self, key: str, ttl: Optional[float], meta: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Restart an entry's lifetime, e.g. after a successful revalidation"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE entries SET created_at = ?, expires_at = ?, last_access = ?, "
+                "meta = COALESCE(?, meta) WHERE namespace = ? AND key = ?",
+                (
+                    now,
+                    now + ttl if ttl is not None else None,
+                    now,
+                    json.dumps(meta) if meta is not None else None,
+                    self.namespace,
+                    key,
+                ),
+            )
+        finally:
+            conn.close()
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        """Remove all entries and counters in this namespace"""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+            conn.execute("DELETE FROM counters WHERE namespace = ?", (self.namespace,))
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used entries until the namespace fits max_bytes"""
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = conn.execute(
+            "SELECT key, size FROM entries WHERE namespace = ? ORDER BY last_access",
+            (self.namespace,),
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+            total -= size
+            evicted += 1
+        self._incr(conn, "evictions", evicted)
+        self.logger.debug(
+            f"Evicted {evicted} entries to stay under {self.max_bytes} bytes"
+        )
+
+    def _incr(self, conn: sqlite3.Connection, name: str, amount: int) -> None:
+        conn.execute(
+            "INSERT INTO counters (namespace, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value",
+            (self.namespace, name, amount),
+        )
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Add to a persistent counter"""
+        self.incr_many({name: amount})
+
+    def incr_many(self, amounts: Dict[str, int]) -> None:
+        """Add to several persistent counters in one transaction"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for name, amount in amounts.items():
+                self._incr(conn, name, amount)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus entry count, stored bytes and hit rate"""
+        conn = self._connect()
+        try:
+            counters = dict(
+                conn.execute(
+                    "SELECT name, value FROM counters WHERE namespace = ?",
+                    (self.namespace,),
+                ).fetchall()
+            )
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries "
+                "WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+        finally:
+            conn.close()
+
+        hits = counters.get("hits", 0) + counters.get("stale_hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        return {
+            **counters,
+            "entries": entries,
+            "bytes": size,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run a blocking cache call without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(fn, *args, **kwargs))
+
+
+class ResponseCache:
+    """Cache of parsed provider responses with TTLs and revalidation data
+
+    Entries are keyed by provider, normalized URL and request options. The
+    ETag and Last-Modified validators of the original response are kept so a
+    stale entry can be revalidated with a conditional request.
+    """
+
+    def __init__(self, provider: str, ttl: float, path: Optional[Path] = None):
+        self.provider = provider
+        self.ttl = ttl
+        self.store = SQLiteCache(f"http:{provider}", path=path)
+
+    def key(self, url: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key for a URL (or list of URLs) plus request options"""
+        urls = [url] if isinstance(url, str) else list(url)
+        canonical = json.dumps(
+            {"urls": [normalize_url(u) for u in urls], "options": options or {}},
+            sort_keys=True,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def lookup(self, key: str) -> Optional[CacheEntry]:
+        """Fetch an entry and decode its JSON value"""
+        entry = await run_sync(self.store.get, key)
+        if entry is not None:
+            entry.value = json.loads(entry.value)
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Headers for revalidating a stale entry, if it has validators"""
+        headers = {}
+        if entry is not None:
+            if entry.meta.get("etag"):
+                headers["If-None-Match"] = entry.meta["etag"]
+            if entry.meta.get("last_modified"):
+                headers["If-Modified-Since"] = entry.meta["last_modified"]
+        return headers
+
+    async def hit(self, entry: CacheEntry) -> Any:
+        """Count a fresh hit and return the cached value"""
+        saved = entry.meta.get("wire_bytes", 0)
+        await run_sync(self.store.incr_many, {"hits": 1, "bytes_saved": saved})
+        return entry.value
+
+    async def miss(self) -> None:
+        """Count a lookup that has to go to the upstream"""
+        await run_sync(self.store.incr, "misses")
+
+    async def revalidated(self, entry: CacheEntry) -> Any:
+        """Restart a stale entry's TTL after the upstream answered 304"""
+        await run_sync(self.store.refresh, entry.key, self.ttl)
+        saved = entry.meta.get("wire_bytes", 0)
+        await run_sync(self.store.incr_many, {"revalidated": 1, "bytes_saved": saved})
+        return entry.value
+
+    async def save(
+        self,
+        key: str,
+        value: Any,
+        headers: Optional[Dict[str, str]] = None,
+        wire_bytes: int = 0,
+    ) -> None:
+        """Store a fresh response along with its validators"""
+        headers = headers or {}
+        meta = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "wire_bytes": wire_bytes,
+        }
+        body = json.dumps(value).encode("utf-8")
+        await run_sync(self.store.set, key, body, self.ttl, meta)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+class StaleWhileRevalidateCache:
+    """JSON cache that serves stale values while refreshing in the background
+
+    A value is fresh for fresh_ttl seconds and may then be served stale for
+    another stale_ttl seconds, during which a single background refresh
+    replaces it. Past the stale window the caller waits for a new fetch.
+    """
+
+    def __init__(self, namespace: str, path: Optional[Path] = None):
+        self.store = SQLiteCache(namespace, path=path)
+        self.logger = self.store.logger
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        fresh_ttl: float,
+        stale_ttl: float = 0,
+    ) -> Tuple[Any, str]:
+        """Return (value, state) where state is "fresh", "stale" or "miss"
+
+        fetch() is awaited on a miss and in the background for stale hits.
+        A None result from fetch() is treated as a failure and not stored.
+        """
+        entry = await run_sync(self.store.get, key)
+        if entry is not None:
+            value = json.loads(entry.value)
+            if entry.fresh:
+                await run_sync(self.store.incr, "hits")
+                return value, "fresh"
+            if time.time() < entry.meta.get("stale_until", 0):
+                await run_sync(self.store.incr, "stale_hits")
+                self._refresh_later(key, fetch, fresh_ttl, stale_ttl)
+                return value, "stale"
+
+        await run_sync(self.store.incr, "misses")
+        value = await fetch()
+        if value is not None:
+            await self._save(key, value, fresh_ttl, stale_ttl)
+        return value, "miss"
+
+    async def _save(self, key: str, value: Any, fresh_ttl: float, stale_ttl: float):
+        meta = {"stale_until": time.time() + fresh_ttl + stale_ttl}
+        body = json.dumps(value).encode("utf-8")
+        await run_sync(self.store.set, key, body, fresh_ttl, meta)
+
+    def _refresh_later(self, key, fetch, fresh_ttl, stale_ttl) -> None:
+        """Start one background refresh per key"""
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                value = await fetch()
+                if value is not None:
+                    await self._save(key, value, fresh_ttl, stale_ttl)
+                    await run_sync(self.store.incr, "refreshes")
+            except Exception as e:
+                self.logger.warning(f"Background refresh failed: {str(e)}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.ensure_future(refresh())
+
+    async def drain(self) -> None:
+        """Wait for pending background refreshes, e.g. before a script exits"""
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+DEFAULT_COMPLETION_TTL = 7 * 24 * 60 * 60
+
+
+class CompletionCache:
+    """Exact-match cache of LLM completions
+
+    Requests are keyed by a canonical hash of everything sent to the model
+    (model, messages, sampling options). Only deterministic requests, i.e.
+    temperature 0, are cached unless nondeterministic=True: reusing one
+    sample of a random process is a choice the caller has to make. Hits
+    count the tokens they saved.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        ttl: Optional[float] = DEFAULT_COMPLETION_TTL,
+        nondeterministic: bool = False,
+        path: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.provider = provider
+        self.ttl = ttl
+        self.nondeterministic = nondeterministic
+        self.store = SQLiteCache(f"llm:{provider}", path=path, max_bytes=max_bytes)
+
+    def cacheable(self, request: Dict[str, Any]) -> bool:
+        """Whether a response to request may be stored and reused"""
+        if self.nondeterministic:
+            return True
+        # Provider defaults for a missing temperature are above zero
+        return request.get("temperature") == 0
+
+    def key(self, request: Dict[str, Any]) -> str:
+        """Cache key for a request; streaming and non-streaming calls share it"""
+        request = {k: v for k, v in request.items() if k != "stream"}
+        canonical = json.dumps(
+            {"provider": self.provider, "request": request},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def get(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a cached response for request, or None on a miss"""
+        if not self.cacheable(request):
+            await run_sync(self.store.incr, "skipped")
+            return None
+        entry = await run_sync(self.store.get, self.key(request))
+        if entry is None or not entry.fresh:
+            await run_sync(self.store.incr, "misses")
+            return None
+        saved = entry.meta.get("tokens", 0)
+        await run_sync(self.store.incr_many, {"hits": 1, "tokens_saved": saved})
+        return json.loads(entry.value)
+
+    async def put(self, request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Store a successful response; empty completions are not cached"""
+        if not self.cacheable(request):
+            return
+        choices = response.get("choices") or []
+        if not choices or not choices[0].get("message", {}).get("content"):
+            return
+        usage = response.get("usage") or {}
+        meta = {"tokens": usage.get("total_tokens") or 0}
+        body = json.dumps(response).encode("utf-8")
+        await run_sync(self.store.set, self.key(request), body, self.ttl, meta)
+
+    async def stream(
+        self, request: Dict[str, Any], events: Callable[[], AsyncIterator[Dict]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Wrap a stream of completion events with the cache
+
+        A hit is replayed as a single event. On a miss the events from
+        events() pass through and are stored once the stream completes.
+        """
+        cached = await self.get(request)
+        if cached is not None:
+            yield {
+                "delta": cached["choices"][0]["message"]["content"],
+                "model": cached.get("model"),
+                "usage": cached.get("usage"),
+                "citations": cached.get("citations"),
+            }
+            return
+
+        parts, response = [], {}
+        async for event in events():
+            for field in ("model", "usage", "citations"):
+                if event.get(field):
+                    response[field] = event[field]
+            if event.get("delta"):
+                parts.append(event["delta"])
+            yield event
+        response["choices"] = [
+            {"message": {"role": "assistant", "content": "".join(parts)}}
+        ]
+        await self.put(request, response)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+def get_completion_cache(
+    provider: str, plugin_config: Dict[str, Any], ttl: float = DEFAULT_COMPLETION_TTL
+) -> Optional[CompletionCache]:
+    """Completion cache configured by a plugin's cache options, if enabled
+
+    Plugins opt in with "cache": True, or all at once with "llm_cache" in
+    pynions.json. "cache_ttl" and "cache_nondeterministic" tune it.
+    """
+    if not plugin_config.get("cache", config.get("llm_cache", False)):
+        return None
+    return CompletionCache(
+        provider,
+        ttl=plugin_config.get("cache_ttl", ttl),
+        nondeterministic=plugin_config.get("cache_nondeterministic", False),
+    )
@@ -0,0 +1,160 @@
+"""Record and replay plugin traffic for offline benchmarks and tests"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import config
+from .utils import normalize_url
+
+logger = logging.getLogger("pynions.cassette")
+
+MODES = ("record", "replay", "off")
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when no recording matches a request"""
+
+
+class Cassette:
+    """On-disk store of request/response pairs with timing metadata
+
+    Each interaction is stored as one JSON line (gzip-compressed when the path
+    ends with .gz). Requests are matched by a hash of the method, normalized
+    URL and body; repeated identical requests replay in recorded order.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", replay_latency: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Invalid cassette mode: {mode} (expected {MODES})")
+        self.path = Path(path)
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        if mode == "replay":
+            self._load()
+
+    def _open(self, mode: str):
+        if self.path.suffix == ".gz":
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self) -> None:
+        """Load all recorded interactions from disk"""
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with self._open("r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        logger.info(f"Loaded {len(self)} interactions from {self.path}")
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> str:
+        """Build a stable match key from a request description"""
+        request = dict(request)
+        if request.get("url"):
+            request["url"] = normalize_url(request["url"])
+        canonical = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+    async def intercept(
+        self,
+        request: Dict[str, Any],
+        perform: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """Replay a recorded result for request, or perform and record it
+
+        perform() must return a JSON-serializable dict.
+        """
+        key = self.request_key(request)
+
+        if self.mode == "replay":
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(f"No recording for request: {request}")
+            # Serve repeated requests in recorded order, then keep the last one
+            index = min(self._cursor[key], len(entries) - 1)
+            self._cursor[key] += 1
+            entry = entries[index]
+            if self.replay_latency:
+                await asyncio.sleep(entry["elapsed"])
+            return entry["response"]
+
+        start = time.perf_counter()
+        response = await perform()
+        if self.mode == "record":
+            self._record(key, request, response, time.perf_counter() - start)
+        return response
+
+    def _record(
+        self,
+        key: str,
+        request: Dict[str, Any],
+        response: Dict[str, Any],
+        elapsed: float,
+    ) -> None:
+        """Append one interaction to the cassette file"""
+        entry = {
+            "key": key,
+            "request": {
+                k: request[k] for k in ("kind", "method", "url") if k in request
+            },
+            "response": response,
+            "elapsed": round(elapsed, 4),
+            "recorded_at": time.time(),
+        }
+        self._entries[key].append(entry)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._open("a") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+_active: Optional[Cassette] = None
+_from_config: Dict[tuple, Cassette] = {}
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the active cassette, if any
+
+    A cassette activated with use_cassette() wins; otherwise one is built
+    from the PYNIONS_CASSETTE, PYNIONS_CASSETTE_MODE and
+    PYNIONS_CASSETTE_LATENCY settings.
+    """
+    if _active is not None:
+        return _active
+
+    path = config.get("PYNIONS_CASSETTE")
+    mode = config.get("PYNIONS_CASSETTE_MODE", "replay")
+    if not path or mode == "off":
+        return None
+
+    latency = str(config.get("PYNIONS_CASSETTE_LATENCY", "")).lower()
+    key = (path, mode, latency in ("1", "true", "yes"))
+    if key not in _from_config:
+        _from_config[key] = Cassette(*key)
+    return _from_config[key]
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", replay_latency: bool = False):
+    """Activate a cassette for all plugins within the block"""
+    global _active
+    previous = _active
+    _active = Cassette(path, mode, replay_latency)
+    try:
+        yield _active
+    finally:
+        _active = previous
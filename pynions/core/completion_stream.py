@@ -0,0 +1,240 @@
+"""Async iteration over streamed LLM completions with timing metrics"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .tokens import CHARS_PER_TOKEN  # Used when the provider does not report usage
+
+
+class StreamStats:
+    """Time-to-first-token and throughput for one streamed completion"""
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.chars = 0
+        self.completion_tokens = 0
+        self.estimated = False
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+
+    def delta(self, text: str) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(text)
+
+    def finish(self, usage: Optional[Dict[str, Any]] = None) -> None:
+        self.finished_at = time.perf_counter()
+        tokens = (usage or {}).get("completion_tokens")
+        self.estimated = not tokens
+        self.completion_tokens = tokens or -(-self.chars // CHARS_PER_TOKEN)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from request start to the first text delta"""
+        if self.started_at is None or self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation speed after the first token"""
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.completion_tokens / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = None
+        if self.started_at is not None and self.finished_at is not None:
+            total = self.finished_at - self.started_at
+        return {
+            "ttft": self.ttft,
+            "tokens_per_second": self.tokens_per_second,
+            "completion_tokens": self.completion_tokens,
+            "estimated_tokens": self.estimated,
+            "chunks": self.chunks,
+            "duration": total,
+        }
+
+
+THINK_OPEN, THINK_CLOSE = "<think>", "</think>"
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest start of tag that text ends with"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkSplitter:
+    """Splits streamed text into ("think", text) and ("answer", text) segments
+
+    Reasoning models wrap their chain of thought in <think>...</think>
+    before the answer. Tags split across deltas are held back until the
+    next delta shows whether they are tags.
+    """
+
+    def __init__(self):
+        self.kind = "answer"
+        self._pending = ""
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        segments = []
+        text, self._pending = self._pending + text, ""
+        while text:
+            tag = THINK_CLOSE if self.kind == "think" else THINK_OPEN
+            index = text.find(tag)
+            if index >= 0:
+                if index:
+                    segments.append((self.kind, text[:index]))
+                text = text[index + len(tag) :]
+                self.kind = "answer" if self.kind == "think" else "think"
+                continue
+            keep = _partial_tag(text, tag)
+            if len(text) > keep:
+                segments.append((self.kind, text[: len(text) - keep]))
+            self._pending = text[len(text) - keep :]
+            break
+        return segments
+
+    def flush(self) -> List[Tuple[str, str]]:
+        """Segments still held back when the stream ends"""
+        pending, self._pending = self._pending, ""
+        return [(self.kind, pending)] if pending else []
+
+
+def split_think(text: str) -> Tuple[str, str]:
+    """(reasoning, answer) of a complete response"""
+    splitter = ThinkSplitter()
+    parts = {"think": [], "answer": []}
+    for kind, segment in splitter.feed(text) + splitter.flush():
+        parts[kind].append(segment)
+    return "".join(parts["think"]).strip(), "".join(parts["answer"]).strip()
+
+
+class CompletionStream:
+    """Async iterator of text deltas from a streamed completion
+
+    Plugins feed it events of the form {"delta": str}, {"usage": dict},
+    {"citations": list} or {"model": str}. The request starts when
+    iteration starts. Use it as an async context manager (or call aclose())
+    when you may stop reading early, so the connection and concurrency slot
+    are released straight away.
+
+        async with llm.stream({"messages": messages}) as stream:
+            async for delta in stream:
+                print(delta, end="")
+        print(stream.stats.as_dict())
+
+    segments() yields reasoning and answer text apart, and another task can
+    await wait_citations() to use the sources before the answer finishes.
+    """
+
+    def __init__(self, events: AsyncIterator[Dict[str, Any]], model: str = None):
+        self._events = events
+        self._iterator = None
+        self._parts: List[str] = []
+        self.model = model
+        self.usage: Optional[Dict[str, Any]] = None
+        self.citations: List[str] = []
+        self.stats = StreamStats()
+        self.done = False
+        self._citations_ready: Optional[asyncio.Event] = None
+
+    @property
+    def text(self) -> str:
+        """Text received so far"""
+        return "".join(self._parts)
+
+    @property
+    def reasoning(self) -> str:
+        """<think> text received so far"""
+        return split_think(self.text)[0]
+
+    @property
+    def answer(self) -> str:
+        """Text received so far outside <think> blocks"""
+        return split_think(self.text)[1]
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        self.stats.start()
+        try:
+            async for event in self._events:
+                self.usage = event.get("usage") or self.usage
+                if event.get("citations"):
+                    self.citations = event["citations"]
+                    self._signal_citations()
+                self.model = event.get("model") or self.model
+                delta = event.get("delta")
+                if delta:
+                    self.stats.delta(delta)
+                    self._parts.append(delta)
+                    yield delta
+            self.done = True
+        finally:
+            self._signal_citations()
+            self.stats.finish(self.usage)
+            await self._events.aclose()
+
+    async def segments(self) -> AsyncIterator[Tuple[str, str]]:
+        """Iterate as ("think", text) and ("answer", text) pairs"""
+        splitter = ThinkSplitter()
+        async for delta in self:
+            for segment in splitter.feed(delta):
+                yield segment
+        for segment in splitter.flush():
+            yield segment
+
+    def _signal_citations(self) -> None:
+        if self._citations_ready is not None:
+            self._citations_ready.set()
+
+    async def wait_citations(self) -> List[str]:
+        """Citations as soon as they arrive, or [] if the stream ends without
+
+        Something else must be reading the stream meanwhile.
+        """
+        if not self.citations and self.stats.finished_at is None:
+            if self._citations_ready is None:
+                self._citations_ready = asyncio.Event()
+            await self._citations_ready.wait()
+        return self.citations
+
+    async def collect(self) -> Dict[str, Any]:
+        """Read the rest of the stream and return a regular response dict"""
+        async for _ in self:
+            pass
+        response = {
+            "choices": [{"message": {"role": "assistant", "content": self.text}}],
+            "model": self.model,
+            "usage": self.usage,
+            "stream": self.stats.as_dict(),
+        }
+        if self.citations:
+            response["citations"] = self.citations
+        return response
+
+    async def aclose(self) -> None:
+        if self._iterator is not None:
+            await self._iterator.aclose()
+        else:
+            await self._events.aclose()
+
+    async def __aenter__(self) -> "CompletionStream":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
@@ -0,0 +1,144 @@
+"""Negative caching and health scores for URLs and domains"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .cache import SQLiteCache, run_sync
+from .utils import normalize_url
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+# How long a failure keeps a URL out of rotation, by error class
+ERROR_TTLS = {
+    "not_found": 24 * HOUR,  # 404/410 rarely come back
+    "blocked": 6 * HOUR,  # 403/451, the site refuses the reader
+    "client_error": HOUR,
+    "empty": HOUR,  # Page extracted to nothing (JS-only, paywalled, ...)
+    "timeout": 10 * MINUTE,
+    "server_error": 5 * MINUTE,
+    "error": 5 * MINUTE,
+}
+
+SCORE_TTL = 7 * 24 * HOUR
+SMOOTHING = 0.3  # Weight of the newest outcome in the rolling score
+
+
+def classify_status(status: int) -> Optional[str]:
+    """Map an upstream HTTP status to an error class
+
+    401, 402 and 429 describe our credentials, quota or rate limits, not
+    the URL, so they are never held against it.
+    """
+    if status in (401, 402, 429) or status < 400:
+        return None
+    if status in (404, 410):
+        return "not_found"
+    if status in (403, 451):
+        return "blocked"
+    if status < 500:
+        return "client_error"
+    return "server_error"
+
+
+def domain_of(url: str) -> str:
+    netloc = urlsplit(normalize_url(url)).netloc
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+class URLHealth:
+    """Tracks which URLs and domains fail so fan-outs can route around them
+
+    Failures put the URL in a negative cache for an error-class-specific TTL.
+    Every outcome also updates rolling success scores (0.0 to 1.0) for the
+    URL and its domain, which rank() uses to try healthy candidates first.
+    Both are persisted so the next run benefits too.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.negative = SQLiteCache("negative", path=path)
+        self.scores = SQLiteCache("url_health", path=path)
+        self.logger = logging.getLogger("pynions.health")
+
+    def known_bad(self, url: str) -> Optional[str]:
+        """Return the error class if url is negatively cached"""
+        entry = self.negative.get(normalize_url(url))
+        if entry is not None and entry.fresh:
+            return entry.meta.get("error")
+        return None
+
+    def record_failure(self, url: str, error: str, detail: str = "") -> None:
+        """Negatively cache url and lower its scores"""
+        ttl = ERROR_TTLS.get(error, ERROR_TTLS["error"])
+        self.negative.set(
+            normalize_url(url), b"", ttl=ttl, meta={"error": error, "detail": detail}
+        )
+        self._update(url, 0.0)
+        self.logger.info(f"Skipping {url} for {ttl // MINUTE} min ({error})")
+
+    def record_success(self, url: str) -> None:
+        """Clear any negative entry and raise the scores"""
+        self.negative.delete(normalize_url(url))
+        self._update(url, 1.0)
+
+    def _update(self, url: str, outcome: float) -> None:
+        for key in (f"url:{normalize_url(url)}", f"domain:{domain_of(url)}"):
+            entry = self.scores.get(key)
+            previous = json.loads(entry.value)["score"] if entry else 1.0
+            score = (1 - SMOOTHING) * previous + SMOOTHING * outcome
+            self.scores.set(key, json.dumps({"score": score}).encode(), ttl=SCORE_TTL)
+
+    def _score(self, key: str) -> float:
+        entry = self.scores.get(key)
+        return json.loads(entry.value)["score"] if entry and entry.fresh else 1.0
+
+    def score(self, url: str) -> float:
+        """Combined health of a URL and its domain; unknown URLs score 1.0"""
+        return self._score(f"url:{normalize_url(url)}") * self._score(
+            f"domain:{domain_of(url)}"
+        )
+
+    def rank(self, candidates: List[Any], key=lambda item: item) -> List[Any]:
+        """Drop known-bad candidates and order the rest by health
+
+        The sort is stable, so equally healthy candidates keep their original
+        (e.g. SERP) order. key extracts the URL from each candidate.
+        """
+        healthy = [item for item in candidates if not self.known_bad(key(item))]
+        skipped = len(candidates) - len(healthy)
+        if skipped:
+            self.logger.info(f"Skipped {skipped} known-bad URLs")
+        return sorted(healthy, key=lambda item: -self.score(key(item)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "negative_entries": self.negative.stats()["entries"],
+            "tracked": self.scores.stats()["entries"],
+        }
+
+    # Async wrappers so callers on the event loop never block on SQLite
+    async def aknown_bad(self, url: str) -> Optional[str]:
+        return await run_sync(self.known_bad, url)
+
+    async def arecord_failure(self, url: str, error: str, detail: str = "") -> None:
+        await run_sync(self.record_failure, url, error, detail)
+
+    async def arecord_success(self, url: str) -> None:
+        await run_sync(self.record_success, url)
+
+    async def arank(self, candidates: List[Any], key=lambda item: item) -> List[Any]:
+        return await run_sync(self.rank, candidates, key)
+
+
+_default: Optional[URLHealth] = None
+
+
+def get_url_health() -> URLHealth:
+    """Process-wide URL health tracker"""
+    global _default
+    if _default is None:
+        _default = URLHealth()
+    return _default
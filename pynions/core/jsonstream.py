@@ -0,0 +1,338 @@
+"""Validate JSON answers while they stream in and retry as soon as they break"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .completion_stream import CompletionStream
+
+logger = logging.getLogger("pynions.jsonstream")
+
+DEFAULT_ATTEMPTS = 3
+MAX_PREAMBLE = 2000  # Characters of prose allowed before the JSON starts
+MAX_TRAILER = 256  # Characters read after the JSON before the stream is dropped
+
+_THINK_OPEN, _THINK_CLOSE = "<think>", "</think>"
+_LITERALS = {"t": "true", "f": "false", "n": "null"}
+_NUMBER_CHARS = set("0123456789+-.eE")
+_ESCAPES = set('"\\/bfnrtu')
+_HEX = set("0123456789abcdefABCDEF")
+# Number grammar: state -> {character class: next state}
+_NUMBER = {
+    "sign": {"0": "zero", "digit": "int"},
+    "zero": {".": "dot", "e": "exp_start"},
+    "int": {"0": "int", "digit": "int", ".": "dot", "e": "exp_start"},
+    "dot": {"0": "frac", "digit": "frac"},
+    "frac": {"0": "frac", "digit": "frac", "e": "exp_start"},
+    "exp_start": {"0": "exp", "digit": "exp", "+": "exp_sign", "-": "exp_sign"},
+    "exp_sign": {"0": "exp", "digit": "exp"},
+    "exp": {"0": "exp", "digit": "exp"},
+}
+_NUMBER_ENDS = {"zero", "int", "frac", "exp"}
+_TYPES = {"{": "object", "[": "array", '"': "string", "t": "boolean", "f": "boolean"}
+
+
+class JSONStreamError(ValueError):
+    """Raised when streamed output can no longer become the expected JSON"""
+
+    def __init__(self, message: str, position: int, text: str = ""):
+        super().__init__(f"{message} at character {position}")
+        self.position = position
+        self.text = text
+
+
+class _Frame:
+    """An object or array that is still open"""
+
+    def __init__(self, kind: str, schema: Optional[Dict[str, Any]]):
+        self.kind = kind
+        self.schema = schema or {}
+        self.key: Optional[str] = None
+        self.keys = set()
+
+
+class IncrementalJSONValidator:
+    """Character-level JSON checker for a streamed answer
+
+    feed() accepts text as it arrives and raises JSONStreamError at the first
+    character that makes valid JSON impossible, or that breaks the schema:
+    a wrong type is caught as soon as a value starts, and a missing required
+    key as soon as its object closes. <think> blocks, code fences and a
+    short lead-in before the JSON are skipped.
+
+    The schema is a small JSON Schema subset: "type" (a name or a list),
+    "properties", "additionalProperties" (a schema), "required" and "items".
+    """
+
+    def __init__(
+        self,
+        schema: Optional[Dict[str, Any]] = None,
+        max_preamble: int = MAX_PREAMBLE,
+    ):
+        self.schema = schema
+        self.max_preamble = max_preamble
+        self.position = 0
+        self.complete = False
+        self.trailer = 0
+        self._mode = "preamble"  # preamble, think, json or done
+        self._pending = ""
+        self._preamble = 0
+        self._chars: List[str] = []
+        self._stack: List[_Frame] = []
+        self._state = "value"
+        self._in_string = False
+        self._is_key = False
+        self._escape = False
+        self._unicode = 0  # Hex digits still expected after \\u
+        self._key_chars: List[str] = []
+        self._literal = ""
+        self._number = ""  # Grammar state while inside a number
+
+    def _error(self, message: str) -> JSONStreamError:
+        return JSONStreamError(message, self.position, "".join(self._chars[-80:]))
+
+    def feed(self, text: str) -> None:
+        """Check the next piece of the answer"""
+        if self._mode in ("preamble", "think"):
+            text = self._skip_preamble(self._pending + text)
+        for ch in text:
+            self.position += 1
+            if self._mode == "done":
+                self.trailer += 1
+                continue
+            self._consume(ch)
+
+    def _skip_preamble(self, text: str) -> str:
+        """Drop reasoning and lead-in text; return what belongs to the JSON"""
+        self._pending = ""
+        while text:
+            if self._mode == "think":
+                end = text.find(_THINK_CLOSE)
+                if end < 0:
+                    # Keep enough to recognise a closing tag split across chunks
+                    self._pending = text[-(len(_THINK_CLOSE) - 1) :]
+                    return ""
+                text = text[end + len(_THINK_CLOSE) :]
+                self._mode = "preamble"
+                continue
+
+            think = text.find(_THINK_OPEN)
+            starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+            start = min(starts) if starts else -1
+            if think >= 0 and (start < 0 or think < start):
+                self._count_preamble(text[:think])
+                text = text[think + len(_THINK_OPEN) :]
+                self._mode = "think"
+                continue
+            if start >= 0:
+                self._count_preamble(text[:start])
+                self._mode = "json"
+                return text[start:]
+
+            # A "<think" split across chunks must not count as prose yet
+            tail = next(
+                (i for i in range(len(text)) if _THINK_OPEN.startswith(text[i:])),
+                len(text),
+            )
+            self._count_preamble(text[:tail])
+            self._pending = text[tail:]
+            return ""
+        return ""
+
+    def _count_preamble(self, text: str) -> None:
+        self.position += len(text)
+        self._preamble += len(text.strip().strip("`"))
+        if self._preamble > self.max_preamble:
+            raise self._error("No JSON found in the response")
+
+    def _slot_schema(self) -> Optional[Dict[str, Any]]:
+        """Schema for the value about to start"""
+        if not self._stack:
+            return self.schema
+        frame = self._stack[-1]
+        if frame.kind == "object":
+            properties = frame.schema.get("properties", {})
+            return properties.get(frame.key, frame.schema.get("additionalProperties"))
+        return frame.schema.get("items")
+
+    def _check_type(self, ch: str, schema: Optional[Dict[str, Any]]) -> None:
+        expected = (schema or {}).get("type")
+        if not expected:
+            return
+        expected = [expected] if isinstance(expected, str) else expected
+        actual = "null" if ch == "n" else _TYPES.get(ch, "number")
+        if actual in expected or (actual == "number" and "integer" in expected):
+            return
+        where = f"'{self._stack[-1].key}'" if self._stack else "the answer"
+        raise self._error(f"Expected {'/'.join(expected)} for {where}, got {actual}")
+
+    def _consume(self, ch: str) -> None:
+        self._chars.append(ch)
+        if self._in_string:
+            if self._unicode:
+                if ch not in _HEX:
+                    raise self._error(f"Invalid \\u escape, got {ch!r}")
+                self._unicode -= 1
+            elif self._escape:
+                if ch not in _ESCAPES:
+                    raise self._error(f"Invalid escape \\{ch}")
+                self._escape = False
+                self._unicode = 4 if ch == "u" else 0
+            elif ch < " ":
+                raise self._error(f"Unescaped control character {ch!r} in string")
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._is_key:
+                    self._stack[-1].key = "".join(self._key_chars)
+                    self._stack[-1].keys.add(self._stack[-1].key)
+                    self._state = "colon"
+                else:
+                    self._value_done()
+                return
+            if self._is_key:
+                self._key_chars.append(ch)
+            return
+
+        if self._literal:
+            if ch != self._literal[0]:
+                raise self._error("Invalid literal")
+            self._literal = self._literal[1:]
+            if not self._literal:
+                self._value_done()
+            return
+
+        if self._number:
+            if ch in _NUMBER_CHARS:
+                self._number = self._number_step(ch)
+                return
+            self._end_number()
+            self._chars.pop()
+            self._value_done()
+            self._consume(ch)
+            return
+
+        if ch in " \t\r\n":
+            return
+
+        state = self._state
+        if state in ("value", "value_or_end"):
+            if ch == "]" and state == "value_or_end":
+                self._close("array")
+                return
+            self._start_value(ch)
+        elif state in ("key", "key_or_end"):
+            if ch == "}" and state == "key_or_end":
+                self._close("object")
+            elif ch == '"':
+                self._in_string, self._is_key, self._key_chars = True, True, []
+            else:
+                raise self._error(f"Expected a double-quoted property name, got {ch!r}")
+        elif state == "colon":
+            if ch != ":":
+                raise self._error(f"Expected ':' after property name, got {ch!r}")
+            self._state = "value"
+        elif state == "comma_or_end":
+            frame = self._stack[-1]
+            if ch == ",":
+                self._state = "key" if frame.kind == "object" else "value"
+            elif ch == "}" and frame.kind == "object":
+                self._close("object")
+            elif ch == "]" and frame.kind == "array":
+                self._close("array")
+            else:
+                raise self._error(f"Expected ',' or end of {frame.kind}, got {ch!r}")
+
+    def _start_value(self, ch: str) -> None:
+        if ch not in _TYPES and ch not in _LITERALS and ch not in "-0123456789":
+            raise self._error(f"Unexpected character {ch!r}")
+        schema = self._slot_schema()
+        self._check_type(ch, schema)
+        if ch == "{":
+            self._stack.append(_Frame("object", schema))
+            self._state = "key_or_end"
+        elif ch == "[":
+            self._stack.append(_Frame("array", schema))
+            self._state = "value_or_end"
+        elif ch == '"':
+            self._in_string, self._is_key = True, False
+        elif ch in _LITERALS:
+            self._literal = _LITERALS[ch][1:]
+        else:
+            self._number = "sign" if ch == "-" else "zero" if ch == "0" else "int"
+
+    def _number_step(self, ch: str) -> str:
+        kind = "digit" if ch in "123456789" else "e" if ch in "eE" else ch
+        state = _NUMBER[self._number].get(kind)
+        if state is None:
+            raise self._error(f"Invalid number, unexpected {ch!r}")
+        return state
+
+    def _end_number(self) -> None:
+        if self._number not in _NUMBER_ENDS:
+            raise self._error("Incomplete number")
+        self._number = ""
+
+    def _close(self, kind: str) -> None:
+        frame = self._stack.pop()
+        if kind == "object":
+            missing = [
+                k for k in frame.schema.get("required", []) if k not in frame.keys
+            ]
+            if missing:
+                raise self._error(f"Missing required keys {missing}")
+        self._value_done()
+
+    def _value_done(self) -> None:
+        if self._stack:
+            self._state = "comma_or_end"
+        else:
+            self._mode = "done"
+            self.complete = True
+
+    def finish(self) -> Any:
+        """Parse the complete answer; raises JSONStreamError if it was cut short"""
+        if self._number and len(self._stack) == 0:
+            self._end_number()
+            self._value_done()
+        if not self.complete:
+            raise self._error("Response ended before the JSON was complete")
+        try:
+            return json.loads("".join(self._chars))
+        except json.JSONDecodeError as e:  # Anything the checks above missed
+            raise JSONStreamError(e.msg, e.pos, e.doc[-80:])
+
+
+async def parse_stream(
+    open_stream: Callable[[], CompletionStream],
+    schema: Optional[Dict[str, Any]] = None,
+    attempts: int = DEFAULT_ATTEMPTS,
+) -> Tuple[Any, CompletionStream]:
+    """Stream a completion and return (parsed JSON, stream)
+
+    open_stream() starts a new streamed completion. The answer is checked
+    as it arrives; once it goes wrong the stream is closed, which stops
+    generation, and a fresh one is started, up to attempts times. The
+    prompt and the tokens already generated are still billed; the plugins
+    record them in the ledger. The returned stream carries usage,
+    citations and timing stats.
+    """
+    error = None
+    for attempt in range(1, attempts + 1):
+        validator = IncrementalJSONValidator(schema)
+        stream = open_stream()
+        try:
+            async with stream:
+                async for delta in stream:
+                    validator.feed(delta)
+                    if validator.trailer > MAX_TRAILER:
+                        break  # The answer is complete; skip the commentary
+            return validator.finish(), stream
+        except JSONStreamError as e:
+            error = e
+            logger.warning(
+                f"Invalid JSON on attempt {attempt}/{attempts} ({str(e)}); "
+                f"aborted after {stream.stats.chunks} chunks"
+            )
+    raise error
@@ -0,0 +1,214 @@
+"""Pools of API keys with per-key rate limits, quotas and circuit breakers"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import config
+
+logger = logging.getLogger("pynions.keypool")
+
+WINDOW = 60.0  # Rate limits are counted per minute
+DEFAULT_COOLDOWN = 60.0
+DEFAULT_FAILURE_THRESHOLD = 3
+
+# Statuses that say something about the key rather than the request
+KEY_ERRORS = (401, 402, 429)
+
+
+class KeyPoolExhaustedError(Exception):
+    """Raised when every key in a pool is revoked or out of quota"""
+
+
+def load_keys(env_name: str) -> List[str]:
+    """Read keys from NAME_S (comma separated) or fall back to NAME
+
+    e.g. SERPER_API_KEYS="key1,key2" or SERPER_API_KEY="key1".
+    """
+    raw = config.get(f"{env_name}S") or config.get(env_name) or ""
+    if isinstance(raw, (list, tuple)):
+        raw = ",".join(raw)
+    keys = [key.strip() for key in re.split(r"[,\s]+", raw) if key.strip()]
+    return list(dict.fromkeys(keys))  # Drop duplicates, keep order
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given in seconds"""
+    value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to the default cooldown
+
+
+class APIKey:
+    """One credential and its rate-limit, quota and circuit state"""
+
+    def __init__(self, value: str, rpm: Optional[int] = None, quota: int = None):
+        self.value = value
+        self.rpm = rpm
+        self.quota = quota
+        self.used = 0
+        self.failures = 0
+        self.revoked = False
+        self.disabled_until = 0.0
+        self.last_used = 0.0
+        self._window = deque()
+
+    @property
+    def label(self) -> str:
+        """Masked form that is safe to log"""
+        return f"...{self.value[-4:]}"
+
+    @property
+    def remaining(self) -> float:
+        if self.quota is None:
+            return float("inf")
+        return self.quota - self.used
+
+    def ready_at(self, now: float) -> float:
+        """Earliest time this key may be used again (inf if never)"""
+        if self.revoked or self.remaining <= 0:
+            return float("inf")
+        while self._window and self._window[0] <= now - WINDOW:
+            self._window.popleft()
+        ready = self.disabled_until
+        if self.rpm and len(self._window) >= self.rpm:
+            ready = max(ready, self._window[0] + WINDOW)
+        return ready
+
+    def take(self, now: float) -> None:
+        self.used += 1
+        self.last_used = now
+        self._window.append(now)
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "key": self.label,
+            "used": self.used,
+            "remaining": None if self.quota is None else self.remaining,
+            "revoked": self.revoked,
+            "cooling_down": self.disabled_until > now,
+        }
+
+
+class KeyPool:
+    """Spreads requests for one provider across several API keys
+
+    acquire() returns the usable key with the most remaining quota (least
+    recently used on ties), waiting when every key is at its per-minute
+    limit or cooling down. report() feeds the outcome back: 401 revokes the
+    key, 402 marks its quota spent, 429 cools it down for Retry-After, and
+    repeated 5xx or connection errors open its circuit for a cooldown.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        keys: List[str],
+        rpm: Optional[int] = None,
+        quota: Optional[int] = None,
+        cooldown: float = DEFAULT_COOLDOWN,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+    ):
+        self.provider = provider
+        self.keys = [APIKey(value, rpm=rpm, quota=quota) for value in keys]
+        self.cooldown = cooldown
+        self.failure_threshold = failure_threshold
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def active(self) -> int:
+        """Number of keys that can still serve requests"""
+        now = time.monotonic()
+        return sum(1 for key in self.keys if key.ready_at(now) != float("inf"))
+
+    async def acquire(self) -> APIKey:
+        """Wait for and claim the best available key"""
+        while True:
+            now = time.monotonic()
+            ready = [(key.ready_at(now), key) for key in self.keys]
+            available = [key for at, key in ready if at <= now]
+            if available:
+                key = max(available, key=lambda k: (k.remaining, -k.last_used))
+                key.take(now)
+                return key
+
+            wait = min((at for at, _ in ready), default=float("inf"))
+            if wait == float("inf"):
+                raise KeyPoolExhaustedError(
+                    f"No usable {self.provider} API keys left "
+                    f"({len(self.keys)} revoked or out of quota)"
+                )
+            logger.debug(f"All {self.provider} keys busy, waiting {wait - now:.1f}s")
+            await asyncio.sleep(wait - now)
+
+    def report(self, key: APIKey, status: Optional[int], headers=None) -> None:
+        """Record the outcome of a request made with key
+
+        status is the HTTP status, or None when the request failed to
+        complete (timeout, connection error).
+        """
+        now = time.monotonic()
+        if status == 401:
+            key.revoked = True
+            logger.warning(
+                f"Removing {self.provider} key {key.label} from rotation (HTTP 401)"
+            )
+        elif status == 402:
+            key.quota = key.used
+            logger.warning(f"{self.provider} key {key.label} is out of quota")
+        elif status == 429:
+            delay = retry_after(headers) or self.cooldown
+            key.disabled_until = now + delay
+            logger.info(f"{self.provider} key {key.label} rate limited for {delay}s")
+        elif status is None or status >= 500:
+            key.failures += 1
+            if key.failures >= self.failure_threshold:
+                key.disabled_until = now + self.cooldown
+                key.failures = 0
+                logger.info(
+                    f"Opening circuit for {self.provider} key {key.label} "
+                    f"for {self.cooldown}s"
+                )
+        else:
+            key.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "provider": self.provider,
+            "active": self.active,
+            "keys": [key.as_dict(now) for key in self.keys],
+        }
+
+
+_pools: Dict[Tuple, KeyPool] = {}
+
+
+def get_key_pool(
+    provider: str, env_name: str, plugin_config: Dict[str, Any] = None
+) -> KeyPool:
+    """Shared key pool for a provider
+
+    Plugin instances using the same keys share one pool, so limits hold
+    across workers. Per-key limits come from the key_rpm and key_quota
+    options of the first plugin to create the pool.
+    """
+    plugin_config = plugin_config or {}
+    keys = load_keys(env_name)
+    pool_key = (provider, tuple(keys))
+    if pool_key not in _pools:
+        _pools[pool_key] = KeyPool(
+            provider,
+            keys,
+            rpm=plugin_config.get("key_rpm"),
+            quota=plugin_config.get("key_quota"),
+            cooldown=plugin_config.get("key_cooldown", DEFAULT_COOLDOWN),
+        )
+    return _pools[pool_key]
@@ -0,0 +1,341 @@
+"""Persistent ledger of LLM and search calls, with spending budgets"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .cache import default_cache_path, run_sync
+from .config import config
+from .prompt import cached_tokens
+
+logger = logging.getLogger("pynions.ledger")
+
+PERIODS = ("run", "day", "workflow")
+DEFAULT_THROTTLE_AT = 0.8  # Share of a budget after which calls are slowed
+DEFAULT_THROTTLE_DELAY = 5.0  # Seconds added before each call when throttled
+# USD per call (per credit for Serper) for providers not billed by token
+CALL_COSTS = {"serper": 0.001}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    workflow TEXT,
+    kind TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    latency REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS calls_day ON calls (day);
+CREATE INDEX IF NOT EXISTS calls_run ON calls (run_id);
+CREATE INDEX IF NOT EXISTS calls_workflow ON calls (workflow);
+"""
+
+# Identifies this process's calls for "run" budgets
+RUN_ID = uuid.uuid4().hex[:12]
+_workflow: ContextVar[Optional[str]] = ContextVar("pynions_workflow", default=None)
+
+
+@contextmanager
+def workflow_scope(name: str):
+    """Attribute calls made inside the block (and its tasks) to a workflow"""
+    token = _workflow.set(name)
+    try:
+        yield
+    finally:
+        _workflow.reset(token)
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised instead of making a call that a budget no longer allows"""
+
+
+class Budget:
+    """Spending limit in USD and/or tokens for a run, a day or a workflow
+
+    Past throttle_at of the limit every call waits throttle_delay seconds
+    first, so a runaway job slows down before it is stopped; at the limit
+    new calls raise BudgetExceededError.
+    """
+
+    def __init__(
+        self,
+        period: str,
+        usd: Optional[float] = None,
+        tokens: Optional[int] = None,
+        throttle_at: float = DEFAULT_THROTTLE_AT,
+        throttle_delay: float = DEFAULT_THROTTLE_DELAY,
+    ):
+        if period not in PERIODS:
+            raise ValueError(f"Invalid budget period: {period}")
+        self.period = period
+        self.usd = usd
+        self.tokens = tokens
+        self.throttle_at = throttle_at
+        self.throttle_delay = throttle_delay
+
+    def used(self, totals: Dict[str, Any]) -> float:
+        """Share of the budget used, 1.0 meaning exhausted"""
+        shares = [0.0]
+        if self.usd:
+            shares.append(totals["cost"] / self.usd)
+        if self.tokens:
+            shares.append(totals["tokens"] / self.tokens)
+        return max(shares)
+
+
+def estimate_cost(
+    provider: str, model: Optional[str], usage: Dict[str, Any], batch: bool = False
+) -> float:
+    """Cost in USD from LiteLLM's price list; 0.0 for unknown models
+
+    batch uses the discounted Batch API prices where the list has them.
+    """
+    from litellm import model_cost
+
+    name = model or ""
+    prices = model_cost.get(name) or model_cost.get(f"{provider}/{name}")
+    if not prices:
+        return 0.0
+    prompt = int(usage.get("prompt_tokens") or 0)
+    cached = cached_tokens(usage)
+    input_price = prices.get("input_cost_per_token") or 0.0
+    output_price = prices.get("output_cost_per_token") or 0.0
+    if batch:
+        input_price = prices.get("input_cost_per_token_batches") or input_price
+        output_price = prices.get("output_cost_per_token_batches") or output_price
+    cached_price = prices.get("cache_read_input_token_cost")
+    if cached_price is None:
+        cached_price = input_price
+    cached_price = min(cached_price, input_price)
+    return (
+        (prompt - cached) * input_price
+        + cached * cached_price
+        + int(usage.get("completion_tokens") or 0) * output_price
+    )
+
+
+class Ledger:
+    """Call records in a SQLite file shared by every process on the machine"""
+
+    def __init__(self, path: Optional[Path] = None, budgets: List[Budget] = ()):
+        self.path = Path(path) if path else default_cache_path().parent / "ledger.db"
+        self.budgets = list(budgets)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def record(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        usage: Optional[Dict[str, Any]] = None,
+        latency: float = 0.0,
+        cost: Optional[float] = None,
+        kind: str = "llm",
+        workflow: Optional[str] = None,
+    ) -> None:
+        """Add one call; cost is estimated from usage when not given"""
+        usage = usage or {}
+        workflow = workflow or _workflow.get()
+        if cost is None:
+            cost = estimate_cost(provider, model, usage)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO calls (created_at, day, run_id, workflow, kind, "
+                "provider, model, prompt_tokens, completion_tokens, "
+                "cached_tokens, latency, cost) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    now,
+                    _day(now),
+                    RUN_ID,
+                    workflow,
+                    kind,
+                    provider,
+                    model,
+                    int(usage.get("prompt_tokens") or 0),
+                    int(usage.get("completion_tokens") or 0),
+                    cached_tokens(usage),
+                    latency,
+                    cost,
+                ),
+            )
+        finally:
+            conn.close()
+
+    def _where(self, period: Optional[str], workflow: Optional[str]):
+        if period is None:
+            return "1 = 1", ()
+        if period == "run":
+            return "run_id = ?", (RUN_ID,)
+        if period == "day":
+            return "day = ?", (_day(time.time()),)
+        if period == "workflow":
+            return "workflow = ?", (workflow or _workflow.get(),)
+        raise ValueError(f"Invalid period: {period}")
+
+    def totals(
+        self, period: Optional[str] = None, workflow: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Calls, tokens and cost for this run, today, a workflow or all time
+
+        The "workflow" period defaults to the workflow of the current scope.
+        """
+        where, params = self._where(period, workflow)
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0), "
+                "COALESCE(SUM(completion_tokens), 0), "
+                "COALESCE(SUM(cached_tokens), 0), COALESCE(SUM(cost), 0), "
+                f"COALESCE(AVG(latency), 0) FROM calls WHERE {where}",
+                params,
+            ).fetchone()
+        finally:
+            conn.close()
+        calls, prompt, completion, cached, cost, latency = row
+        return {
+            "calls": calls,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cached_tokens": cached,
+            "tokens": prompt + completion,
+            "cost": round(cost, 6),
+            "latency_avg": round(latency, 3),
+        }
+
+    def summary(
+        self,
+        by: str = "model",
+        period: Optional[str] = None,
+        workflow: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Totals grouped by provider, model, kind, workflow, day or run_id"""
+        if by not in ("provider", "model", "kind", "workflow", "day", "run_id"):
+            raise ValueError(f"Cannot group by {by}")
+        where, params = self._where(period, workflow)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {by}, COUNT(*), SUM(prompt_tokens + completion_tokens), "
+                f"SUM(cached_tokens), SUM(cost) FROM calls WHERE {where} "
+                f"GROUP BY {by} ORDER BY SUM(cost) DESC",
+                params,
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                by: value,
+                "calls": calls,
+                "tokens": tokens,
+                "cached_tokens": cached,
+                "cost": round(cost, 6),
+            }
+            for value, calls, tokens, cached, cost in rows
+        ]
+
+    async def check(self) -> None:
+        """Wait or raise before a call, depending on how much budget is left"""
+        delay = 0.0
+        workflow = _workflow.get()  # Context does not reach the executor thread
+        for budget in self.budgets:
+            if budget.period == "workflow" and workflow is None:
+                continue
+            used = budget.used(await run_sync(self.totals, budget.period, workflow))
+            if used >= 1:
+                raise BudgetExceededError(
+                    f"The {budget.period} budget is used up "
+                    f"({budget.usd or '-'} USD, {budget.tokens or '-'} tokens)"
+                )
+            if used >= budget.throttle_at:
+                delay = max(delay, budget.throttle_delay)
+        if delay:
+            logger.warning(f"Budget nearly used up; waiting {delay}s before the call")
+            await asyncio.sleep(delay)
+
+
+def _day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _configured_budgets() -> List[Budget]:
+    """Budgets from PYNIONS_BUDGET_<RUN|DAY|WORKFLOW>_<USD|TOKENS>"""
+    budgets = []
+    throttle_at = float(config.get("PYNIONS_BUDGET_THROTTLE_AT", DEFAULT_THROTTLE_AT))
+    for period in PERIODS:
+        usd = config.get(f"PYNIONS_BUDGET_{period.upper()}_USD")
+        tokens = config.get(f"PYNIONS_BUDGET_{period.upper()}_TOKENS")
+        if usd or tokens:
+            budgets.append(
+                Budget(
+                    period,
+                    usd=float(usd) if usd else None,
+                    tokens=int(tokens) if tokens else None,
+                    throttle_at=throttle_at,
+                )
+            )
+    return budgets
+
+
+_ledgers: Dict[str, Ledger] = {}
+
+
+def get_ledger() -> Ledger:
+    """Process-wide ledger in the cache directory, with configured budgets"""
+    path = default_cache_path().parent / "ledger.db"
+    key = str(path)
+    if key not in _ledgers:
+        _ledgers[key] = Ledger(path, _configured_budgets())
+    return _ledgers[key]
+
+
+async def record_call(
+    provider: str,
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, Any]] = None,
+    latency: float = 0.0,
+    cost: Optional[float] = None,
+    kind: str = "llm",
+) -> None:
+    """Record a call in the shared ledger without blocking the event loop"""
+    await run_sync(
+        get_ledger().record,
+        provider,
+        model,
+        usage,
+        latency,
+        cost,
+        kind,
+        _workflow.get(),
+    )
+
+
+async def check_budget() -> None:
+    """Enforce the shared ledger's budgets before making a call"""
+    await get_ledger().check()
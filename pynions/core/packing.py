@@ -0,0 +1,156 @@
+"""Pack many small LLM tasks into one multi-item prompt"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .completion_stream import CompletionStream
+from .jsonstream import IncrementalJSONValidator, JSONStreamError, parse_stream
+from .prompt import PromptBuilder
+from .tokens import count_tokens
+
+logger = logging.getLogger("pynions.packing")
+
+DEFAULT_MAX_ITEMS = 10
+DEFAULT_MAX_PROMPT_TOKENS = 6000  # Item text per packed call
+DEFAULT_ANSWER_TOKENS = 400  # Output allowance per item
+DEFAULT_FLUSH_INTERVAL = 0.05  # Seconds to wait for more items before sending
+
+PACK_INSTRUCTIONS = """You will receive several numbered items. Handle each item on its own, exactly as the instructions above describe for a single one, and do not let items influence each other.
+
+Return only a JSON object that maps every item number to its answer, with no other text:
+{{"1": <answer for item 1>, "2": <answer for item 2>}}
+
+Each answer is {answer_format}."""
+
+
+def matches_schema(value: Any, schema: Optional[Dict[str, Any]]) -> bool:
+    """Whether a parsed value fits a jsonstream schema and is not empty"""
+    if value in (None, "", [], {}):
+        return False
+    # The validator only starts at an object or array, so wrap the value
+    validator = IncrementalJSONValidator(
+        {"type": "object", "properties": {"value": schema or {}}}
+    )
+    try:
+        validator.feed(json.dumps({"value": value}))
+        validator.finish()
+    except JSONStreamError:
+        return False
+    return True
+
+
+class RequestPacker:
+    """Sends small tasks submitted close together as one structured prompt
+
+    Calls for short items, such as a definition per topic, cost mostly
+    request overhead and rate limit. submit() queues an item and waits for
+    its answer. Items are packed until max_items or max_prompt_tokens is
+    reached or flush_interval passes, then sent in one call whose JSON
+    answer maps item numbers to answers. Each answer is checked against
+    item_schema; missing or invalid ones, and every item of a pack that
+    failed outright, are re-issued on their own through single().
+
+    stream(messages, max_tokens) starts a streamed completion; instructions
+    are the worker's usual single-item instructions.
+    """
+
+    def __init__(
+        self,
+        stream: Callable[[List[Dict[str, Any]], int], CompletionStream],
+        instructions: str,
+        single: Callable[[str], Awaitable[Any]],
+        item_schema: Optional[Dict[str, Any]] = None,
+        answer_format: str = "a string",
+        max_items: int = DEFAULT_MAX_ITEMS,
+        max_prompt_tokens: int = DEFAULT_MAX_PROMPT_TOKENS,
+        answer_tokens: int = DEFAULT_ANSWER_TOKENS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.stream = stream
+        self.single = single
+        self.item_schema = item_schema
+        self.prompt = PromptBuilder(
+            instructions, PACK_INSTRUCTIONS.format(answer_format=answer_format)
+        )
+        self.max_items = max_items
+        self.max_prompt_tokens = max_prompt_tokens
+        self.answer_tokens = answer_tokens
+        self.flush_interval = flush_interval
+        self.stats = {"packs": 0, "failed_packs": 0, "packed": 0, "reissued": 0}
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def submit(self, text: str) -> Any:
+        """Queue one item's input and wait for its answer"""
+        tokens = count_tokens(text)
+        if self._pending and self._tokens + tokens > self.max_prompt_tokens:
+            self.flush()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._tokens += tokens
+        if len(self._pending) >= self.max_items:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self.flush
+            )
+        return await future
+
+    def flush(self) -> None:
+        """Send the queued items now"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending, self._tokens = self._pending, [], 0
+        if items:
+            task = asyncio.ensure_future(self._run(items))
+            self._tasks.add(task)  # Keep a reference until it finishes
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: List[Tuple[str, asyncio.Future]]) -> None:
+        if len(items) == 1:
+            await self._single(items[0])
+            return
+
+        answers: Dict[str, Any] = {}
+        messages = self.prompt.build(
+            *(f"[{i}]\n{text}" for i, (text, _) in enumerate(items, 1))
+        )
+        try:
+            answers, _ = await parse_stream(
+                lambda: self.stream(messages, self.answer_tokens * len(items)),
+                {"type": "object"},
+            )
+            self.stats["packs"] += 1
+        except Exception as e:
+            logger.warning(f"Packed call for {len(items)} items failed: {str(e)}")
+            self.stats["failed_packs"] += 1
+
+        failed = []
+        for i, item in enumerate(items, 1):
+            answer = answers.get(str(i))
+            if matches_schema(answer, self.item_schema):
+                self.stats["packed"] += 1
+                if not item[1].done():
+                    item[1].set_result(answer)
+            else:
+                failed.append(item)
+        if failed:
+            logger.info(f"Re-issuing {len(failed)} of {len(items)} items singly")
+            self.stats["reissued"] += len(failed)
+            await asyncio.gather(*(self._single(item) for item in failed))
+
+    async def _single(self, item: Tuple[str, asyncio.Future]) -> None:
+        text, future = item
+        try:
+            result = await self.single(text)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
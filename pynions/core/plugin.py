@@ -1,4 +1,5 @@
 from typing import Dict, Any
+import logging
 from .config import config
 
 
@@ -7,6 +8,7 @@ class Plugin:
 
     def __init__(self, plugin_config: Dict[str, Any] = None):
         self.config = plugin_config or {}
+        self.logger = logging.getLogger(f"pynions.plugins.{self.__class__.__name__}")
 
     def get_env(self, key: str) -> str:
         """Get environment variable through core config"""
@@ -0,0 +1,122 @@
+"""Cache-friendly prompt layout and provider prompt-cache accounting"""
+
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from .cache import SQLiteCache, run_sync
+from .tokens import count_tokens
+
+# Providers only cache prefixes of at least this many tokens (OpenAI,
+# Anthropic Sonnet); shorter prefixes are always billed in full
+MIN_CACHEABLE_PREFIX = 1024
+EPHEMERAL = {"type": "ephemeral"}
+
+
+class PromptBuilder:
+    """Builds chat messages as a fixed prefix followed by per-call data
+
+    Provider-side prompt caching only pays off when calls share an exact
+    prefix. The static blocks (role, instructions, output format) go into
+    the system message, identical on every call; the topic, domain or
+    research data goes into the user message after it. Keep anything that
+    changes per call out of the static blocks.
+    """
+
+    def __init__(self, *blocks: str):
+        self.prefix = "\n\n".join(block.strip() for block in blocks if block)
+
+    @property
+    def prefix_key(self) -> str:
+        """Short hash of the prefix, for checking that calls share it"""
+        return hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def prefix_tokens(self) -> int:
+        return count_tokens(self.prefix)
+
+    @property
+    def cacheable(self) -> bool:
+        """Whether the prefix is long enough for providers to cache"""
+        return self.prefix_tokens >= MIN_CACHEABLE_PREFIX
+
+    def build(self, *data: str, cache_control: bool = False) -> List[Dict[str, Any]]:
+        """Messages for one call: the static prefix, then data joined by blank lines
+
+        cache_control marks the end of the prefix as a cache breakpoint,
+        which Anthropic models need; other providers cache automatically.
+        """
+        system: Dict[str, Any] = {"role": "system", "content": self.prefix}
+        if cache_control:
+            system["cache_control"] = EPHEMERAL
+        user = {"role": "user", "content": "\n\n".join(d.strip() for d in data)}
+        return [system, user] if self.prefix else [user]
+
+
+def cached_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    """Prompt tokens served from the provider's prompt cache
+
+    Reads the OpenAI field (prompt_tokens_details.cached_tokens) and the
+    Anthropic and DeepSeek equivalents.
+    """
+    if not usage:
+        return 0
+    details = usage.get("prompt_tokens_details") or {}
+    return int(
+        usage.get("cached_tokens")
+        or details.get("cached_tokens")
+        or usage.get("cache_read_input_tokens")
+        or usage.get("prompt_cache_hit_tokens")
+        or 0
+    )
+
+
+def _store(provider: str) -> SQLiteCache:
+    return SQLiteCache(f"prompt_cache:{provider}")
+
+
+async def record_prompt_usage(
+    provider: str, usage: Optional[Dict[str, Any]], latency: float
+) -> None:
+    """Count one call's prompt and cached tokens, and its latency
+
+    A call is a hit when any of its prompt was served from cache; hit and
+    miss latencies are kept apart so the speed-up can be compared.
+    """
+    if not usage:
+        return
+    cached = cached_tokens(usage)
+    outcome = "hits" if cached else "misses"
+    await run_sync(
+        _store(provider).incr_many,
+        {
+            outcome: 1,
+            f"{outcome}_latency_ms": int(latency * 1000),
+            "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+            "cached_tokens": cached,
+        },
+    )
+
+
+def prompt_cache_stats(provider: str) -> Dict[str, Any]:
+    """Prompt cache counters for a provider, with averages worked out"""
+    stats = _store(provider).stats()
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    prompt_tokens = stats.get("prompt_tokens", 0)
+    return {
+        "calls": hits + misses,
+        "hits": hits,
+        "hit_rate": stats["hit_rate"],
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": stats.get("cached_tokens", 0),
+        "cached_share": (
+            round(stats.get("cached_tokens", 0) / prompt_tokens, 3)
+            if prompt_tokens
+            else 0.0
+        ),
+        "hit_latency": (
+            stats.get("hits_latency_ms", 0) / hits / 1000 if hits else None
+        ),
+        "miss_latency": (
+            stats.get("misses_latency_ms", 0) / misses / 1000 if misses else None
+        ),
+    }
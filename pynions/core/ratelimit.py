@@ -0,0 +1,275 @@
+"""Admission of LLM calls against provider tokens- and requests-per-minute limits"""
+
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from .config import config
+from .tokens import count_message_tokens
+
+logger = logging.getLogger("pynions.ratelimit")
+
+WINDOW = 60.0  # Provider limits are counted per minute
+DEFAULT_RATE_COOLDOWN = 10.0  # Pause after a 429 without Retry-After
+LEARNING_RATE = 0.2  # Weight of each call's usage in the corrections
+MIN_COMPLETION_RATIO = 0.1  # Expected output never drops below this share
+
+
+class Reservation:
+    """Tokens and a request taken from the window for one call"""
+
+    __slots__ = ("scheduler", "at", "tokens", "prompt_tokens", "max_tokens", "done")
+
+    def __init__(
+        self, scheduler: "RateScheduler", tokens: int, prompt: int, max_tokens: int
+    ):
+        self.scheduler = scheduler
+        self.at = time.monotonic()
+        self.tokens = tokens
+        self.prompt_tokens = prompt
+        self.max_tokens = max_tokens
+        self.done = False
+
+    def settle(self, usage: Optional[Dict[str, Any]]) -> None:
+        """Replace the estimate with the call's actual usage"""
+        self.scheduler.settle(self, usage)
+
+    def release(self) -> None:
+        """Give back the tokens of a call that failed; no-op once settled"""
+        self.scheduler.release(self)
+
+
+class RateScheduler:
+    """Admits calls only while they fit a provider's TPM and RPM limits
+
+    A request's cost is estimated before it is sent: the counted prompt
+    tokens plus the output it is expected to use out of max_tokens. It waits
+    until that many tokens and one request are free in the last minute.
+    Waiting calls are admitted in order, so a large call is not starved by
+    small ones behind it. When a call finishes, settle() swaps its estimate
+    for the reported usage, and the prompt and output ratios used for later
+    estimates are corrected towards it. After a 429, pause() stops admission
+    and goes back to reserving the full max_tokens.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tpm: Optional[int] = None,
+        rpm: Optional[int] = None,
+        window: float = WINDOW,
+    ):
+        self.name = name
+        self.tpm = tpm
+        self.rpm = rpm
+        self.window = window
+        self.prompt_ratio = 1.0  # Reported prompt tokens per counted token
+        self.completion_ratio = 1.0  # Output tokens used per max_tokens
+        self.paused_until = 0.0
+        self.stats = {"admitted": 0, "waited": 0.0, "settled": 0, "rate_limited": 0}
+        self._entries: deque = deque()
+        self._waiters: deque = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def estimate(
+        self, messages: List[Dict[str, Any]], max_tokens: int, model: str = None
+    ) -> Reservation:
+        """Expected cost of a call, not yet admitted"""
+        prompt = count_message_tokens(messages, model)
+        tokens = round(
+            prompt * self.prompt_ratio + (max_tokens or 0) * self.completion_ratio
+        )
+        return Reservation(self, tokens, prompt, max_tokens or 0)
+
+    async def acquire(
+        self, messages: List[Dict[str, Any]], max_tokens: int, model: str = None
+    ) -> Reservation:
+        """Wait until the call fits both windows and reserve its share"""
+        reservation = self.estimate(messages, max_tokens, model)
+        queued = time.monotonic()
+        if self._waiters or not self._admit(reservation):
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((reservation, future))
+            self._wake()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._remove(reservation)  # Admitted just as it was cancelled
+                elif (reservation, future) in self._waiters:
+                    self._waiters.remove((reservation, future))
+                self._wake()
+                raise
+        self.stats["waited"] += time.monotonic() - queued
+        return reservation
+
+    def settle(self, reservation: Reservation, usage: Optional[Dict[str, Any]]) -> None:
+        """Charge a call's reported usage and learn from its estimate
+
+        Without usage the estimate stays charged, since the call did run.
+        Usage counted locally (estimated) is charged but not learned from,
+        as a stream cut short says nothing about the output ratio.
+        """
+        if reservation.done:
+            return
+        reservation.done = True
+        if not usage:
+            return
+        prompt = int(usage.get("prompt_tokens") or 0)
+        completion = int(usage.get("completion_tokens") or 0)
+        if not usage.get("estimated"):
+            self._learn(reservation, prompt, completion)
+        reservation.tokens = prompt + completion
+        self.stats["settled"] += 1
+        self._wake()  # An overestimate frees tokens right away
+
+    def _learn(self, reservation: Reservation, prompt: int, completion: int) -> None:
+        if reservation.prompt_tokens and prompt:
+            self.prompt_ratio += LEARNING_RATE * (
+                prompt / reservation.prompt_tokens - self.prompt_ratio
+            )
+        if reservation.max_tokens:
+            ratio = min(completion / reservation.max_tokens, 1.0)
+            self.completion_ratio = max(
+                MIN_COMPLETION_RATIO,
+                self.completion_ratio + LEARNING_RATE * (ratio - self.completion_ratio),
+            )
+
+    def release(self, reservation: Reservation) -> None:
+        """Drop a failed call's tokens; it still counts as a request"""
+        if reservation.done:
+            return
+        reservation.done = True
+        reservation.tokens = 0
+        self._wake()
+
+    def pause(self, delay: Optional[float] = None) -> None:
+        """Stop admitting calls after the provider answered 429"""
+        delay = delay if delay is not None else DEFAULT_RATE_COOLDOWN
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        # The estimates ran low; reserve whole outputs until usage says otherwise
+        self.completion_ratio = 1.0
+        self.stats["rate_limited"] += 1
+        logger.warning(f"{self.name} rate limited; pausing calls for {delay}s")
+        self._wake()
+
+    def usage(self) -> Dict[str, int]:
+        """Tokens and requests counted in the current window"""
+        self._expire(time.monotonic())
+        return {
+            "tokens": sum(entry.tokens for entry in self._entries),
+            "requests": len(self._entries),
+            "waiting": len(self._waiters),
+        }
+
+    def _expire(self, now: float) -> None:
+        while self._entries and self._entries[0].at <= now - self.window:
+            self._entries.popleft()
+
+    def _ready_at(self, reservation: Reservation, now: float) -> float:
+        """When reservation fits both windows, assuming nothing else settles"""
+        self._expire(now)
+        ready = self.paused_until
+        if self.rpm and len(self._entries) >= self.rpm:
+            ready = max(ready, self._entries[-self.rpm].at + self.window)
+        if self.tpm and self._entries:
+            # A call larger than the whole limit still runs, on its own
+            excess = sum(e.tokens for e in self._entries) + reservation.tokens
+            excess -= self.tpm
+            for entry in self._entries:
+                if excess <= 0:
+                    break
+                excess -= entry.tokens
+                ready = max(ready, entry.at + self.window)
+        return ready
+
+    def _admit(self, reservation: Reservation) -> bool:
+        now = time.monotonic()
+        if self._ready_at(reservation, now) > now:
+            return False
+        reservation.at = now
+        self._entries.append(reservation)
+        self.stats["admitted"] += 1
+        return True
+
+    def _remove(self, reservation: Reservation) -> None:
+        if reservation in self._entries:
+            self._entries.remove(reservation)
+
+    def _wake(self) -> None:
+        """Admit waiting calls in order, then sleep until the head can run"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            reservation, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._admit(reservation):
+                break
+            self._waiters.popleft()
+            future.set_result(None)
+        if self._waiters:
+            reservation = self._waiters[0][0]
+            now = time.monotonic()
+            delay = max(self._ready_at(reservation, now) - now, 0.001)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+
+# Futures belong to one event loop, so keep schedulers per loop
+_schedulers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_rate_scheduler(
+    provider: str, model: str, plugin_config: Dict[str, Any] = None
+) -> Optional[RateScheduler]:
+    """Scheduler shared by all calls to a provider's model, or None if unlimited
+
+    Limits come from the plugin's tpm and rpm options, else from the
+    <PROVIDER>_TPM and <PROVIDER>_RPM settings (e.g. OPENAI_TPM=200000).
+    Providers limit each model separately, so each gets its own window.
+    """
+    plugin_config = plugin_config or {}
+    prefix = provider.upper()
+    tpm = plugin_config.get("tpm") or config.get(f"{prefix}_TPM")
+    rpm = plugin_config.get("rpm") or config.get(f"{prefix}_RPM")
+    if not tpm and not rpm:
+        return None
+    schedulers = _schedulers.setdefault(asyncio.get_running_loop(), {})
+    key = (provider, model)
+    if key not in schedulers:
+        schedulers[key] = RateScheduler(
+            f"{provider}/{model}",
+            tpm=int(tpm) if tpm else None,
+            rpm=int(rpm) if rpm else None,
+        )
+    return schedulers[key]
+
+
+@asynccontextmanager
+async def reserve(
+    provider: str,
+    model: str,
+    plugin_config: Dict[str, Any],
+    messages: List[Dict[str, Any]],
+    max_tokens: int,
+):
+    """Hold room for one call under the model's limits; yields None if unlimited
+
+    Settle the reservation with the call's usage inside the block. If the
+    block exits without that, the reservation's tokens are released.
+    """
+    rate = get_rate_scheduler(provider, model, plugin_config)
+    if rate is None:
+        yield None
+        return
+    reservation = await rate.acquire(messages, max_tokens, model)
+    try:
+        yield reservation
+    finally:
+        reservation.release()
@@ -0,0 +1,111 @@
+"""Host-aware scheduling so parallel fetches stay polite to each site"""
+
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+from .config import config
+from .health import domain_of
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST = 2
+DEFAULT_MIN_INTERVAL = 0.5  # Seconds between request starts on one host
+
+
+class _Host:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.next_start = 0.0
+        self.users = 0  # Jobs holding or waiting for a slot
+
+
+class HostScheduler:
+    """Caps total and per-host concurrency and spaces requests to a host
+
+    A job first waits for a slot on its host, then for its start time on
+    that host, and only then for a global slot. That way jobs queued behind
+    a busy host never hold global slots that other hosts could use. A
+    host is forgotten once it has no jobs and its next start time has
+    passed, so long runs over many sites don't accumulate state.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        per_host: int = DEFAULT_PER_HOST,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._hosts: Dict[str, _Host] = {}
+        self.stats = {"jobs": 0, "waited": 0.0}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Hold a request slot for the host of url"""
+        name = domain_of(url)
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = _Host(self.per_host)
+        host.users += 1
+        queued = time.monotonic()
+        try:
+            async with host.semaphore:
+                # Reserve the next start time, then sleep without holding anything
+                now = time.monotonic()
+                start = max(now, host.next_start)
+                host.next_start = start + self.min_interval
+                if start > now:
+                    await asyncio.sleep(start - now)
+                async with self._global:
+                    self.stats["jobs"] += 1
+                    self.stats["waited"] += time.monotonic() - queued
+                    yield
+        finally:
+            host.users -= 1
+            if not host.users:
+                # Keep the host until its spacing no longer matters
+                delay = host.next_start - time.monotonic()
+                if delay > 0:
+                    asyncio.get_running_loop().call_later(
+                        delay, self._evict, name, host
+                    )
+                else:
+                    self._evict(name, host)
+
+    def _evict(self, name: str, host: _Host) -> None:
+        if not host.users and self._hosts.get(name) is host:
+            del self._hosts[name]
+
+    async def run(self, url: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() in a slot for the host of url"""
+        async with self.slot(url):
+            return await fn()
+
+
+# Semaphores belong to one event loop, so keep one scheduler per loop
+_schedulers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_host_scheduler() -> HostScheduler:
+    """Scheduler shared by all page extraction on the running event loop
+
+    Limits come from the PYNIONS_FETCH_CONCURRENCY, PYNIONS_HOST_CONCURRENCY
+    and PYNIONS_HOST_INTERVAL settings.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _schedulers:
+        _schedulers[loop] = HostScheduler(
+            max_concurrency=int(
+                config.get("PYNIONS_FETCH_CONCURRENCY", DEFAULT_CONCURRENCY)
+            ),
+            per_host=int(config.get("PYNIONS_HOST_CONCURRENCY", DEFAULT_PER_HOST)),
+            min_interval=float(
+                config.get("PYNIONS_HOST_INTERVAL", DEFAULT_MIN_INTERVAL)
+            ),
+        )
+    return _schedulers[loop]
@@ -0,0 +1,70 @@
+"""Request coalescing for identical in-flight calls"""
+
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key
+
+    The first caller for a key starts the call; anyone asking for the same key
+    while it is still running awaits the same future instead of issuing a
+    duplicate request. Nothing is cached once the call has finished.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self.logger = logging.getLogger(f"pynions.{name}")
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Check whether a call for this key is currently running"""
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once per key, sharing the result with concurrent callers
+
+        Followers get a deep copy of the result so that one caller mutating
+        the returned data does not affect the others.
+        """
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.stats["calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+            self.logger.debug(f"Coalesced in-flight call: {key}")
+
+        self._waiters[key] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Only cancel the shared call once nobody is waiting for it anymore
+            if not task.done() and self._release(key) == 0:
+                task.cancel()
+            raise
+        else:
+            self._release(key)
+
+        return result if leader else copy.deepcopy(result)
+
+    def _release(self, key: Hashable) -> int:
+        """Decrement the waiter count for a key and return what is left"""
+        if key not in self._waiters:
+            return 0
+        self._waiters[key] -= 1
+        return self._waiters[key]
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Drop a finished call so the next request starts a fresh one"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            self._waiters.pop(key, None)
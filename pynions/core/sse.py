@@ -0,0 +1,117 @@
+"""Incremental parsing of server-sent event (text/event-stream) bodies"""
+
+import json
+import re
+from typing import Any, AsyncIterator, List, Optional
+
+from .streaming import TransferStats, iter_text
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+class ServerSentEvent:
+    """One dispatched event: its type, data lines joined by newlines, and id"""
+
+    __slots__ = ("event", "data", "id", "retry")
+
+    def __init__(
+        self,
+        data: str,
+        event: str = "message",
+        id: Optional[str] = None,
+        retry: Optional[int] = None,
+    ):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def json(self) -> Any:
+        return json.loads(self.data)
+
+    def __repr__(self) -> str:
+        return f"ServerSentEvent(event={self.event!r}, data={self.data[:40]!r})"
+
+
+class SSEParser:
+    """Turns text/event-stream text into events as it arrives
+
+    Follows the HTML event-stream rules: lines may end in CRLF, LF or CR
+    (even split across chunks), several data lines make one event, lines
+    starting with ":" are comments (keep-alives), and an event is
+    dispatched at the blank line that ends it. An unfinished event at the
+    end of the body is dropped.
+    """
+
+    def __init__(self):
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None
+        self._buffer = ""
+        self._started = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._event = ""
+        self._data: List[str] = []
+
+    def feed(self, text: str) -> List[ServerSentEvent]:
+        """Parse the next piece of the body; returns the events it completed"""
+        if not self._started and text:
+            self._started = True
+            text = text[1:] if text.startswith("\ufeff") else text
+        data = self._buffer + text
+        # A trailing CR may be the first half of a CRLF in the next chunk
+        held = data.endswith("\r")
+        lines = _LINE_BREAK.split(data[:-1] if held else data)
+        self._buffer = lines.pop() + ("\r" if held else "")
+
+        events = []
+        for line in lines:
+            event = self._line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _line(self, line: str) -> Optional[ServerSentEvent]:
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id" and "\0" not in value:
+            self.last_event_id = value
+        elif field == "retry" and value.isdigit():
+            self.retry = int(value)
+        return None
+
+    def _dispatch(self) -> Optional[ServerSentEvent]:
+        event = None
+        if self._data:
+            event = ServerSentEvent(
+                "\n".join(self._data),
+                self._event or "message",
+                self.last_event_id,
+                self.retry,
+            )
+        self._reset()
+        return event
+
+
+async def iter_events(
+    response, stats: Optional[TransferStats] = None, max_bytes: Optional[int] = None
+) -> AsyncIterator[ServerSentEvent]:
+    """Yield server-sent events from a streamed response as they complete"""
+    parser = SSEParser()
+    stream = iter_text(response, stats or TransferStats(), max_bytes=max_bytes)
+    try:
+        async for text in stream:
+            for event in parser.feed(text):
+                yield event
+    finally:
+        await stream.aclose()
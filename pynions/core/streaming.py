@@ -0,0 +1,162 @@
+"""Memory-bounded, incremental reading of HTTP response bodies"""
+
+import codecs
+import zlib
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Brotli support is optional
+    brotli = None
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Only advertise encodings we can actually decode
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+
+
+class BodyTooLargeError(Exception):
+    """Raised when a response body exceeds the configured size cap"""
+
+
+class TransferStats:
+    """Byte counters for one response body"""
+
+    def __init__(self):
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.truncated = False
+        self.encoding = "identity"
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes compression kept off the wire"""
+        return max(self.decoded_bytes - self.wire_bytes, 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "encoding": self.encoding,
+            "wire_bytes": self.wire_bytes,
+            "decoded_bytes": self.decoded_bytes,
+            "bytes_saved": self.bytes_saved,
+            "truncated": self.truncated,
+        }
+
+
+class _Identity:
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _Deflate:
+    """Deflate decoder tolerating both zlib-wrapped and raw streams"""
+
+    def __init__(self):
+        self._decoder = None
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._decoder is None:
+            # Servers disagree on whether "deflate" carries a zlib header
+            wbits = zlib.MAX_WBITS if data[:1] == b"\x78" else -zlib.MAX_WBITS
+            self._decoder = zlib.decompressobj(wbits)
+        return self._decoder.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._decoder.flush() if self._decoder else b""
+
+
+class _Brotli:
+    def __init__(self):
+        self._decoder = brotli.Decompressor()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decoder.process(data)
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def decompressor(content_encoding: Optional[str]):
+    """Incremental decoder for a Content-Encoding (gzip, deflate, br)"""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _Deflate()
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("Received brotli-encoded body but brotli is not installed")
+        return _Brotli()
+    return _Identity()
+
+
+async def iter_text(
+    response,
+    stats: TransferStats,
+    max_bytes: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding: str = "utf-8",
+) -> AsyncIterator[str]:
+    """Yield decoded text from a response as it arrives
+
+    The response must come from a request made with auto_decompress=False so
+    the wire bytes can be counted; compressed bodies are inflated here.
+    Reading stops with BodyTooLargeError once the decoded size passes
+    max_bytes.
+    """
+    inflater = decompressor(response.headers.get("Content-Encoding"))
+    stats.encoding = (response.headers.get("Content-Encoding") or "identity").lower()
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    async for chunk in response.content.iter_chunked(chunk_size):
+        stats.wire_bytes += len(chunk)
+        data = inflater.decompress(chunk)
+        stats.decoded_bytes += len(data)
+        if max_bytes is not None and stats.decoded_bytes > max_bytes:
+            raise BodyTooLargeError(
+                f"Response body exceeded {max_bytes} bytes after decoding"
+            )
+        text = decoder.decode(data)
+        if text:
+            yield text
+
+    tail = decoder.decode(inflater.flush(), final=True)
+    if tail:
+        yield tail
+
+
+async def read_text(
+    response,
+    max_bytes: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    truncate: bool = True,
+) -> Tuple[str, TransferStats]:
+    """Read a response body into a string within a size budget
+
+    Stops reading as soon as max_chars characters are available. When the
+    decoded body passes max_bytes the text read so far is returned with
+    stats.truncated set, or BodyTooLargeError is raised if truncate is False.
+    """
+    stats = TransferStats()
+    parts = []
+    length = 0
+    stream = iter_text(response, stats, max_bytes=max_bytes)
+    try:
+        async for text in stream:
+            if max_chars is not None and length + len(text) > max_chars:
+                parts.append(text[: max_chars - length])
+                stats.truncated = True
+                break
+            parts.append(text)
+            length += len(text)
+    except BodyTooLargeError:
+        if not truncate:
+            raise
+        stats.truncated = True
+    finally:
+        await stream.aclose()
+
+    return "".join(parts), stats
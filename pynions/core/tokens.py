@@ -0,0 +1,244 @@
+"""Fast local token estimates and counts for budgeting prompts
+
+estimate_tokens() is a character heuristic that needs no tokenizer.
+count_tokens() and count_tokens_batch() give exact counts from the
+model's tokenizer, loaded on first use per tokenizer family, and fall back
+to the heuristic when no tokenizer is available.
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("pynions.tokens")
+
+CHARS_PER_TOKEN = 4  # Rough average for English prose
+MESSAGE_OVERHEAD = 4  # Role and separator tokens per chat message
+DEFAULT_CONTEXT_WINDOW = 128000
+
+# Context windows by model name prefix; the longest matching prefix wins
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "claude": 200000,
+    "sonar": 128000,
+    "sonar-pro": 200000,
+}
+
+# Tokenizer family by model name prefix; the longest matching prefix wins
+TOKENIZER_FAMILIES = {
+    "gpt-3.5-turbo": "cl100k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-4o": "o200k_base",
+    "gpt-4.1": "o200k_base",
+    "gpt-5": "o200k_base",
+    "o1": "o200k_base",
+    "o3": "o200k_base",
+    "o4-mini": "o200k_base",
+    "text-embedding-3": "cl100k_base",
+    "claude": "claude",
+}
+# Close enough for models without a public tokenizer, e.g. Perplexity's sonar
+DEFAULT_FAMILY = "cl100k_base"
+DEFAULT_COUNT_CACHE_SIZE = 1024  # Counted texts remembered per family
+MIN_CACHED_CHARS = 256  # Shorter texts are cheaper to count again than to cache
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text without calling a tokenizer"""
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimate the prompt tokens of a list of chat messages"""
+    return sum(
+        estimate_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD
+        for message in messages
+    )
+
+
+def context_window(model: str) -> int:
+    """Context window in tokens for a model, e.g. "anthropic/claude-3-5-sonnet" """
+    name = model.rsplit("/", 1)[-1].lower()
+    matches = [prefix for prefix in CONTEXT_WINDOWS if name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def tokenizer_family(model: Optional[str]) -> str:
+    """Tokenizer family for a model, e.g. "o200k_base" for "gpt-4o-mini" """
+    name = (model or "").rsplit("/", 1)[-1].lower()
+    matches = [prefix for prefix in TOKENIZER_FAMILIES if name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_FAMILY
+    return TOKENIZER_FAMILIES[max(matches, key=len)]
+
+
+def _bundled_tokenizers() -> Optional[str]:
+    """LiteLLM ships tokenizer files, which saves downloading them"""
+    spec = importlib.util.find_spec("litellm")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    path = os.path.join(
+        list(spec.submodule_search_locations)[0], "litellm_core_utils", "tokenizers"
+    )
+    return path if os.path.isdir(path) else None
+
+
+def _load_tiktoken(family: str) -> Callable[[List[str]], List[int]]:
+    bundled = _bundled_tokenizers()
+    # Only a default: a cache dir the user chose, under either name, wins
+    if bundled and "DATA_GYM_CACHE_DIR" not in os.environ:
+        os.environ.setdefault("TIKTOKEN_CACHE_DIR", bundled)
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(family)
+    return lambda texts: [
+        len(tokens) for tokens in encoding.encode_ordinary_batch(texts)
+    ]
+
+
+def _load_claude(family: str) -> Callable[[List[str]], List[int]]:
+    from tokenizers import Tokenizer
+
+    bundled = _bundled_tokenizers()
+    if not bundled:
+        raise FileNotFoundError("No Claude tokenizer file found")
+    tokenizer = Tokenizer.from_file(os.path.join(bundled, "anthropic_tokenizer.json"))
+    return lambda texts: [len(e.ids) for e in tokenizer.encode_batch(texts)]
+
+
+class TokenCounter:
+    """Token counts for one tokenizer family
+
+    The tokenizer is loaded on the first count, not at import. Counts of
+    longer texts, such as system prompts and research sections that go
+    into many prompts, are kept in an LRU cache. count_many() sends all
+    uncached texts to the tokenizer in one batch, which runs across threads.
+    If the tokenizer cannot be loaded, counts fall back to estimate_tokens()
+    and exact is False.
+    """
+
+    def __init__(self, family: str, cache_size: int = DEFAULT_COUNT_CACHE_SIZE):
+        self.family = family
+        self.cache_size = cache_size
+        self.exact: Optional[bool] = None  # Known once the tokenizer is loaded
+        self.hits = 0
+        self.misses = 0
+        self._encode: Optional[Callable[[List[str]], List[int]]] = None
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self) -> Callable[[List[str]], List[int]]:
+        with self._lock:
+            if self._encode is None:
+                loader = _load_claude if self.family == "claude" else _load_tiktoken
+                try:
+                    self._encode = loader(self.family)
+                    self.exact = True
+                except Exception as e:
+                    logger.warning(
+                        f"No {self.family} tokenizer ({str(e)}); estimating counts"
+                    )
+                    self._encode = lambda texts: [estimate_tokens(t) for t in texts]
+                    self.exact = False
+        return self._encode
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """Token counts for many texts at once, in order"""
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                text = text or ""
+                if len(text) >= MIN_CACHED_CHARS and text in self._cache:
+                    self._cache.move_to_end(text)
+                    counts[i] = self._cache[text]
+                    self.hits += 1
+                else:
+                    missing.setdefault(text, []).append(i)
+        if missing:
+            unique = list(missing)
+            with self._lock:
+                self.misses += len(unique)
+            for text, count in zip(unique, self._load()(unique)):
+                for i in missing[text]:
+                    counts[i] = count
+                if len(text) >= MIN_CACHED_CHARS:
+                    self._remember(text, count)
+        return counts
+
+    def _remember(self, text: str, count: int) -> None:
+        with self._lock:
+            self._cache[text] = count
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "family": self.family,
+            "exact": self.exact,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """Shared counter for a model's tokenizer family"""
+    family = tokenizer_family(model)
+    with _counters_lock:
+        if family not in _counters:
+            _counters[family] = TokenCounter(family)
+        return _counters[family]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Exact token count of text for a model (an estimate without a tokenizer)"""
+    return get_token_counter(model).count(text)
+
+
+def count_tokens_batch(texts: List[str], model: Optional[str] = None) -> List[int]:
+    """Token counts for many texts, tokenized together"""
+    return get_token_counter(model).count_many(list(texts))
+
+
+def count_message_tokens(
+    messages: List[Dict[str, Any]], model: Optional[str] = None
+) -> int:
+    """Prompt tokens of a list of chat messages"""
+    contents = [str(message.get("content") or "") for message in messages]
+    return sum(count_tokens_batch(contents, model)) + MESSAGE_OVERHEAD * len(messages)
+
+
+def estimate_usage(
+    messages: List[Dict[str, Any]], completion: str, model: Optional[str] = None
+) -> Dict[str, Any]:
+    """Usage of a call the provider never reported, e.g. a stream cut short"""
+    prompt = count_message_tokens(messages, model)
+    output = count_tokens(completion, model)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": output,
+        "total_tokens": prompt + output,
+        "estimated": True,
+    }
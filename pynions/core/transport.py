@@ -0,0 +1,599 @@
+"""Shared HTTP transport for plugins: pooled clients, timeouts, retries, metrics"""
+
+import asyncio
+import base64
+import copy
+import hashlib
+import inspect
+import json as jsonlib
+import logging
+import random
+import time
+import weakref
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+import httpx
+from multidict import CIMultiDict
+
+from .cassette import get_cassette
+from .singleflight import SingleFlight
+from .streaming import DEFAULT_CHUNK_SIZE, decompressor
+from .utils import normalize_url
+
+logger = logging.getLogger("pynions.transport")
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 100
+HOOK_EVENTS = ("request", "response", "retry")
+
+# Framing headers that stop being true once a body is buffered
+_SKIP_HEADERS = {"content-length", "transfer-encoding"}
+
+
+def _encode_body(body: bytes) -> Dict[str, Any]:
+    """Body as recorded in a cassette: text, or base64 for binary data"""
+    try:
+        return {"body": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body": base64.b64encode(body).decode("ascii"), "base64": True}
+
+
+def _decode_body(response: Dict[str, Any]) -> bytes:
+    if response.get("base64"):
+        return base64.b64decode(response["body"])
+    return response["body"].encode("utf-8")
+
+
+def _body_fingerprint(kwargs: Dict[str, Any]) -> str:
+    """Stable hash of a request's json or data, for matching and coalescing"""
+    if kwargs.get("json") is not None:
+        payload = jsonlib.dumps(kwargs["json"], sort_keys=True).encode("utf-8")
+    elif kwargs.get("data") is not None:
+        data = kwargs["data"]
+        payload = data if isinstance(data, bytes) else str(data).encode("utf-8")
+    else:
+        return ""
+    return hashlib.sha256(payload).hexdigest()
+
+
+class TransportError(Exception):
+    """Raised when a request could not be completed"""
+
+
+class TransportTimeoutError(TransportError, asyncio.TimeoutError):
+    """Raised when a request times out"""
+
+
+class HTTPStatusError(TransportError):
+    """Raised by raise_for_status() for 4xx and 5xx responses"""
+
+    def __init__(self, message: str, response: "TransportResponse"):
+        super().__init__(message)
+        self.response = response
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a request
+
+    Connection errors, timeouts and the given statuses are retried with
+    exponential backoff and jitter, honouring Retry-After when present.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 1,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        statuses=(502, 503, 504),
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = set(statuses)
+
+    def should_retry(self, attempt: int, status: Optional[int] = None) -> bool:
+        """Whether attempt (1-based) may be followed by another"""
+        if attempt >= self.attempts:
+            return False
+        return status is None or status in self.statuses
+
+    def delay(self, attempt: int, headers=None) -> float:
+        retry_after = headers.get("Retry-After") if headers is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+
+NO_RETRY = RetryPolicy()
+
+
+class TransportMetrics:
+    """Request, byte and latency counters for one transport"""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.wire_bytes = 0
+        self.statuses: Counter = Counter()
+        self._latencies = deque(maxlen=window)  # Seconds to response headers
+
+    def record(self, status: Optional[int], latency: float) -> None:
+        self.requests += 1
+        if status is None:
+            self.errors += 1
+        else:
+            self.statuses[status] += 1
+        self._latencies.append(latency)
+
+    def _percentile(self, fraction: float) -> float:
+        ordered = sorted(self._latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = self._latencies
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "wire_bytes": self.wire_bytes,
+            "statuses": dict(self.statuses),
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50": self._percentile(0.5),
+            "latency_p95": self._percentile(0.95),
+        }
+
+
+_metrics: Dict[str, TransportMetrics] = {}
+
+
+def get_metrics(name: str) -> TransportMetrics:
+    """Metrics for a provider, shared by its Transport
+
+    Clients with their own HTTP stack (e.g. LiteLLM) record here too, so
+    transport_stats() covers every provider.
+    """
+    if name not in _metrics:
+        _metrics[name] = TransportMetrics()
+    return _metrics[name]
+
+
+class TransportRequest:
+    """A request as seen by hooks; hooks may change headers"""
+
+    def __init__(self, method: str, url: str, headers: Dict[str, str], body: bytes):
+        self.method = method.upper()
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.fingerprint = ""  # Stable body hash used to match recordings
+        self.attempt = 1
+
+
+class TransportResponse:
+    """Backend-independent response with an aiohttp-like API
+
+    content.iter_chunked() yields the bytes as they came off the wire (still
+    compressed), which is what streaming.iter_text expects; read(), text()
+    and json() return the decoded body. wire_bytes counts what was received.
+    """
+
+    def __init__(self, raw, latency: float, metrics: TransportMetrics):
+        self.status = raw.status
+        self.headers = raw.headers
+        self.url = raw.url
+        self.latency = latency
+        self._raw = raw
+        self._metrics = metrics
+        self._body: Optional[bytes] = None
+        self.wire_bytes = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content(self) -> "TransportResponse":
+        return self  # aiohttp-style alias for iter_chunked()
+
+    async def iter_chunked(
+        self, size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        if self._raw is None:
+            raise TransportError("Response body was already consumed")
+        async for chunk in self._raw.aiter_raw(size):
+            self._metrics.wire_bytes += len(chunk)
+            self.wire_bytes += len(chunk)
+            yield chunk
+
+    async def read(self) -> bytes:
+        """Read and decode the whole body"""
+        if self._body is None:
+            decoder = decompressor(self.headers.get("Content-Encoding"))
+            parts = [decoder.decompress(c) async for c in self.iter_chunked()]
+            parts.append(decoder.flush())
+            self._body = b"".join(parts)
+            await self.release()
+        return self._body
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return (await self.read()).decode(encoding, errors="replace")
+
+    async def json(self, **kwargs) -> Any:
+        return jsonlib.loads(await self.read())
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise HTTPStatusError(f"HTTP {self.status} for {self.url}", self)
+
+    async def release(self) -> None:
+        """Return the connection to the pool"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            await raw.aclose()
+
+    def __deepcopy__(self, memo) -> "TransportResponse":
+        # Coalesced followers get their own headers and body, not the socket
+        clone = copy.copy(self)
+        clone.headers = CIMultiDict(self.headers)
+        clone._raw = None
+        return clone
+
+
+class _RecordedRaw:
+    """Backend response replayed from a cassette"""
+
+    def __init__(self, data: Dict[str, Any], url: str):
+        self.status = data["status"]
+        self.headers = CIMultiDict(data.get("headers", {}))
+        self.url = url
+        self._body = _decode_body(data)
+
+    async def aiter_raw(self, size: int) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._body), size):
+            yield self._body[start : start + size]
+
+    async def aclose(self) -> None:
+        pass
+
+
+class AiohttpBackend:
+    """Pooled aiohttp session; bodies are left compressed for byte metrics"""
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        connector = aiohttp.TCPConnector(limit=max_connections, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+
+    async def send(self, request: TransportRequest, timeout: float, connect: float):
+        try:
+            response = await self.session.request(
+                request.method,
+                request.url,
+                headers=request.headers,
+                data=request.body or None,
+                timeout=aiohttp.ClientTimeout(total=timeout, connect=connect),
+            )
+        except asyncio.TimeoutError as e:
+            raise TransportTimeoutError(f"Timed out requesting {request.url}") from e
+        except aiohttp.ClientError as e:
+            raise TransportError(str(e)) from e
+        return _AiohttpRaw(response)
+
+    async def aclose(self) -> None:
+        await self.session.close()
+
+
+class _AiohttpRaw:
+    def __init__(self, response: aiohttp.ClientResponse):
+        self.status = response.status
+        self.headers = CIMultiDict(response.headers)
+        self.url = str(response.url)
+        self._response = response
+        self._complete = False
+
+    async def aiter_raw(self, size: int) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._response.content.iter_chunked(size):
+                yield chunk
+            self._complete = True
+        except asyncio.TimeoutError as e:
+            raise TransportTimeoutError(f"Timed out reading {self.url}") from e
+        except aiohttp.ClientError as e:
+            raise TransportError(str(e)) from e
+
+    async def aclose(self) -> None:
+        # A partly read body can't be reused, so drop that connection
+        if self._complete:
+            self._response.release()
+        else:
+            self._response.close()
+
+
+class HttpxBackend:
+    """Pooled httpx client; bodies are left compressed for byte metrics"""
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections)
+        )
+
+    async def send(self, request: TransportRequest, timeout: float, connect: float):
+        built = self.client.build_request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            content=request.body or None,
+            timeout=httpx.Timeout(timeout, connect=connect),
+        )
+        try:
+            response = await self.client.send(built, stream=True)
+        except httpx.TimeoutException as e:
+            raise TransportTimeoutError(f"Timed out requesting {request.url}") from e
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        return _HttpxRaw(response)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class _HttpxRaw:
+    def __init__(self, response: httpx.Response):
+        self.status = response.status_code
+        self.headers = CIMultiDict(response.headers.multi_items())
+        self.url = str(response.url)
+        self._response = response
+
+    async def aiter_raw(self, size: int) -> AsyncIterator[bytes]:
+        """Yield data as it arrives, at most size bytes at a time
+
+        httpx's own chunk size waits until a chunk is full, which would hold
+        back server-sent events.
+        """
+        try:
+            async for data in self._response.aiter_raw():
+                for i in range(0, len(data), size):
+                    yield data[i : i + size]
+        except httpx.TimeoutException as e:
+            raise TransportTimeoutError(f"Timed out reading {self.url}") from e
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+BACKENDS = {"aiohttp": AiohttpBackend, "httpx": HttpxBackend}
+
+
+async def _close_on_shutdown(backend):
+    """Close a backend when its event loop shuts down its async generators
+
+    asyncio.run() does this on exit, so pooled sessions never leak even
+    though plugins don't close them explicitly.
+    """
+    try:
+        yield
+    finally:
+        await backend.aclose()
+
+
+class Transport:
+    """HTTP client shared by plugins
+
+    One Transport per provider keeps a pooled connection per event loop,
+    applies default timeouts and a retry policy, runs hooks, counts bytes
+    and latency, honours the active cassette, and can coalesce identical
+    buffered requests. backend is "aiohttp" or "httpx"; register more in
+    BACKENDS.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: str = "aiohttp",
+        timeout: float = DEFAULT_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        retry: RetryPolicy = NO_RETRY,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown transport backend: {backend}")
+        self.name = name
+        self.backend = backend
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.retry = retry
+        self.metrics = get_metrics(name)
+        self.logger = logging.getLogger(f"pynions.transport.{name}")
+        self._hooks: Dict[str, List[Callable]] = {event: [] for event in HOOK_EVENTS}
+        self._clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._inflight = SingleFlight(f"transport.{name}")
+
+    def add_hook(self, event: str, fn: Callable) -> None:
+        """Register fn(request), fn(request, response) or fn(request, outcome)
+
+        Events are "request" (before each attempt), "response" (once a
+        response is accepted) and "retry" (before a retry; outcome is the
+        response or the exception). Hooks may be sync or async.
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError(f"Unknown hook event: {event} (expected {HOOK_EVENTS})")
+        self._hooks[event].append(fn)
+
+    async def _run_hooks(self, event: str, *args) -> None:
+        for fn in self._hooks[event]:
+            result = fn(*args)
+            if inspect.isawaitable(result):
+                await result
+
+    async def _client(self):
+        """Pooled backend client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            client = BACKENDS[self.backend](self.max_connections)
+            closer = _close_on_shutdown(client)
+            await closer.__anext__()
+            self._clients[loop] = (client, closer)
+        return self._clients[loop][0]
+
+    async def _send(self, request: TransportRequest, timeout: float, connect: float):
+        """Send one attempt, through the cassette when one is active"""
+        client = await self._client()
+        cassette = get_cassette()
+        if cassette is None:
+            return await client.send(request, timeout, connect)
+
+        async def perform() -> Dict[str, Any]:
+            raw = await client.send(request, timeout, connect)
+            body = b"".join(
+                [chunk async for chunk in raw.aiter_raw(DEFAULT_CHUNK_SIZE)]
+            )
+            await raw.aclose()
+            headers = {
+                k.lower(): v
+                for k, v in raw.headers.items()
+                if k.lower() not in _SKIP_HEADERS
+            }
+            return {"status": raw.status, "headers": headers, **_encode_body(body)}
+
+        description = {
+            "kind": "http",
+            "method": request.method,
+            "url": request.url,
+            "body": request.fingerprint,
+            "accept": request.headers.get("Accept", ""),
+        }
+        return _RecordedRaw(await cassette.intercept(description, perform), request.url)
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        data: Any = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        """Send a request and yield the response before the body is read"""
+        headers = dict(headers or {})
+        if json is not None:
+            body = jsonlib.dumps(json).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        elif isinstance(data, str):
+            body = data.encode("utf-8")
+        else:
+            body = data or b""
+        request = TransportRequest(method, url, headers, body)
+        request.fingerprint = _body_fingerprint({"json": json, "data": data})
+        retry = retry or self.retry
+        timeout = timeout or self.timeout
+        connect = connect_timeout or self.connect_timeout
+
+        while True:
+            await self._run_hooks("request", request)
+            start = time.perf_counter()
+            try:
+                raw = await self._send(request, timeout, connect)
+            except TransportError as e:
+                self.metrics.record(None, time.perf_counter() - start)
+                if not retry.should_retry(request.attempt):
+                    raise
+                outcome, delay = e, retry.delay(request.attempt)
+            else:
+                self.metrics.record(raw.status, time.perf_counter() - start)
+                response = TransportResponse(
+                    raw, time.perf_counter() - start, self.metrics
+                )
+                if not retry.should_retry(request.attempt, response.status):
+                    break
+                await response.release()
+                outcome, delay = response, retry.delay(request.attempt, raw.headers)
+
+            self.metrics.retries += 1
+            self.logger.info(
+                f"Retrying {request.method} {url} in {delay:.1f}s "
+                f"(attempt {request.attempt} failed: {getattr(outcome, 'status', outcome)})"
+            )
+            await self._run_hooks("retry", request, outcome)
+            await asyncio.sleep(delay)
+            request.attempt += 1
+
+        await self._run_hooks("response", request, response)
+        try:
+            yield response
+        finally:
+            await response.release()
+
+    async def request(
+        self, method: str, url: str, *, coalesce: bool = False, **kwargs
+    ) -> TransportResponse:
+        """Send a request and return the response with its body read
+
+        With coalesce=True, identical requests (method, normalized URL, body
+        and Accept header) that are already in flight share one response.
+        """
+
+        async def perform() -> TransportResponse:
+            async with self.stream(method, url, **kwargs) as response:
+                await response.read()
+                return response
+
+        if not coalesce:
+            return await perform()
+        key = (
+            method.upper(),
+            normalize_url(url),
+            _body_fingerprint(kwargs),
+            (kwargs.get("headers") or {}).get("Accept", ""),
+        )
+        return await self.coalesce(key, perform)
+
+    async def coalesce(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once for concurrent callers with the same key
+
+        request(coalesce=True) uses this for buffered responses; plugins
+        use it to share work built on streamed responses, such as a parsed
+        page or search result. Followers get a deep copy of the result.
+        """
+        if self._inflight.in_flight(key):
+            self.metrics.coalesced += 1
+        return await self._inflight.do(key, fn)
+
+    async def aclose(self) -> None:
+        """Close the pooled client for the running event loop"""
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+
+_transports: Dict[str, Transport] = {}
+
+
+def get_transport(name: str, backend: str = "aiohttp", **options) -> Transport:
+    """Shared transport for a provider, created on first use
+
+    Options apply only when the transport is first created.
+    """
+    if name not in _transports:
+        _transports[name] = Transport(name, backend=backend, **options)
+    return _transports[name]
+
+
+def transport_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every provider, by name"""
+    return {name: metrics.as_dict() for name, metrics in _metrics.items()}
@@ -3,6 +3,7 @@
 from pathlib import Path
 from datetime import datetime
 from pynions.core.config import config
+from urllib.parse import urlsplit, urlunsplit
 import re
 import json
 
@@ -14,6 +15,29 @@ def slugify(text):
     return re.sub(r"[-\s]+", "_", text)
 
 
+def normalize_url(url):
+    """Normalize a URL so equivalent spellings map to the same key"""
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "https").lower()
+    netloc = parts.netloc.lower()
+    if scheme == "http" and netloc.endswith(":80"):
+        netloc = netloc[:-3]
+    elif scheme == "https" and netloc.endswith(":443"):
+        netloc = netloc[:-4]
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def normalize_query(query):
+    """Normalize a search query by collapsing whitespace and case"""
+    return " ".join(query.lower().split())
+
+
 def get_valid_status_types():
     """Get list of valid status types from config"""
     # This function is no longer needed with the new simplified config
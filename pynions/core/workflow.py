@@ -1,5 +1,6 @@
 from typing import Any, Dict, List, Optional
 import logging
+from .ledger import workflow_scope
 from .plugin import Plugin
 
 
@@ -46,14 +47,16 @@ class Workflow:
         current_input = initial_input
 
         try:
-            while current_step:
-                step_result = await current_step.execute(current_input)
-                results[current_step.name] = step_result
-
-                current_step = (
-                    current_step.next_steps[0] if current_step.next_steps else None
-                )
-                current_input = step_result
+            # Calls made by the steps count toward this workflow's budget
+            with workflow_scope(self.name):
+                while current_step:
+                    step_result = await current_step.execute(current_input)
+                    results[current_step.name] = step_result
+
+                    current_step = (
+                        current_step.next_steps[0] if current_step.next_steps else None
+                    )
+                    current_input = step_result
 
         except Exception as e:
             print(f"Workflow error in step {current_step.name}: {str(e)}")
@@ -1,9 +1,12 @@
 from pynions.core import Plugin
 import asyncio
-import aiohttp
 from typing import Dict, Any, Optional, List
 import json
+from pynions.core.cache import ResponseCache
 from pynions.core.config import config
+from pynions.core.transport import get_transport
+
+DEFAULT_CACHE_TTL = 3 * 24 * 60 * 60  # SERP page analysis changes slowly
 
 
 class Frase(Plugin):
@@ -16,12 +19,19 @@ class Frase(Plugin):
             raise ValueError("FRASE_API_KEY not found in configuration")
 
         self.base_url = "https://api.frase.io/api/v1/process_serp"
+        self.transport = get_transport("frase")
         self.headers = {
             "token": self.api_key,
             "Accept": "application/json",
             "Content-Type": "application/json",
         }
 
+        self.cache = None
+        if self.config.get("cache", config.get("http_cache", False)):
+            self.cache = ResponseCache(
+                "frase", ttl=self.config.get("cache_ttl", DEFAULT_CACHE_TTL)
+            )
+
     async def execute(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Execute the Frase API request"""
         if "serp_urls" not in params:
@@ -29,26 +39,39 @@ class Frase(Plugin):
             return None
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json={"serp_urls": params["serp_urls"]},
-                    timeout=30,
-                ) as response:
-                    text = await response.text()
-
-                    if response.status != 200:
-                        self.logger.error(f"Error from Frase API: {response.status}")
-                        self.logger.error(f"Response text: {text}")
-                        return None
-
-                    try:
-                        return json.loads(text)
-                    except json.JSONDecodeError as e:
-                        self.logger.error(f"Failed to parse JSON response: {e}")
-                        self.logger.error(f"Raw response: {text}")
-                        return None
+            if self.cache:
+                cache_key = self.cache.key(params["serp_urls"])
+                entry = await self.cache.lookup(cache_key)
+                if entry and entry.fresh:
+                    return await self.cache.hit(entry)
+                await self.cache.miss()
+
+            response = await self.transport.request(
+                "POST",
+                self.base_url,
+                headers=self.headers,
+                json={"serp_urls": params["serp_urls"]},
+                timeout=30,
+            )
+            text = await response.text()
+
+            if response.status != 200:
+                self.logger.error(f"Error from Frase API: {response.status}")
+                self.logger.error(f"Response text: {text}")
+                return None
+
+            try:
+                result = json.loads(text)
+            except json.JSONDecodeError as e:
+                self.logger.error(f"Failed to parse JSON response: {e}")
+                self.logger.error(f"Raw response: {text}")
+                return None
+
+            if self.cache:
+                await self.cache.save(
+                    cache_key, result, response.headers, response.wire_bytes
+                )
+            return result
 
         except Exception as e:
             self.logger.error(f"Error processing URLs: {e}")
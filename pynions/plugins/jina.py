@@ -1,8 +1,31 @@
 import asyncio
-import aiohttp
-from typing import Any, Dict, Optional
+import json
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
 from pynions.core import Plugin
+from pynions.core.cache import ResponseCache
 from pynions.core.config import config
+from pynions.core.health import classify_status, get_url_health
+from pynions.core.keypool import KEY_ERRORS, KeyPoolExhaustedError, get_key_pool
+from pynions.core.scheduler import get_host_scheduler
+from pynions.core.tokens import CHARS_PER_TOKEN
+from pynions.core.transport import get_transport
+from pynions.core.streaming import (
+    ACCEPT_ENCODING,
+    BodyTooLargeError,
+    TransferStats,
+    iter_text,
+    read_text,
+)
+from pynions.core.utils import normalize_url
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024  # Hard cap on a single decoded response
+DEFAULT_CACHE_TTL = 24 * 60 * 60  # Pages are re-extracted at most once a day
+
+# Metadata lines Jina puts before the page body in its plain-text format
+_TEXT_FIELDS = {"Title": "title", "URL Source": "url", "Description": "description"}
+_CONTENT_MARKER = "Markdown Content:\n"
+_MAX_PREAMBLE_CHARS = 8192
 
 
 class JinaAIReader(Plugin):
@@ -10,15 +33,36 @@ class JinaAIReader(Plugin):
 
     def __init__(self, plugin_config: Dict[str, Any] = None):
         super().__init__(plugin_config)
-        self.api_key = config.get("JINA_API_KEY")
-        if not self.api_key:
+        self.keys = get_key_pool("jina", "JINA_API_KEY", self.config)
+        if not self.keys:
             raise ValueError("JINA_API_KEY not found in configuration")
+        self.api_key = self.keys.keys[0].value
 
         self.base_url = "https://r.jina.ai"
+        self.transport = get_transport("jina")
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
         }
+        self.max_bytes = self.config.get("max_bytes", DEFAULT_MAX_BYTES)
+
+        self.cache = None
+        if self.config.get("cache", config.get("http_cache", False)):
+            self.cache = ResponseCache(
+                "jina", ttl=self.config.get("cache_ttl", DEFAULT_CACHE_TTL)
+            )
+        self.track_health = self.config.get("track_health", True)
+        # Per-site politeness; pass a HostScheduler to use custom limits
+        self.scheduler = self.config.get("scheduler")
+
+    def _char_budget(self) -> Optional[int]:
+        """Character budget for page content, from max_chars or max_tokens"""
+        if self.config.get("max_chars") is not None:
+            return self.config["max_chars"]
+        if self.config.get("max_tokens") is not None:
+            return self.config["max_tokens"] * CHARS_PER_TOKEN
+        return None
 
     async def execute(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Extract content from a URL using Jina AI Reader"""
@@ -26,30 +70,199 @@ class JinaAIReader(Plugin):
         if not url:
             raise ValueError("URL is required in input_data")
 
+        if self.track_health:
+            error = await get_url_health().aknown_bad(url)
+            if error:
+                self.logger.info(f"Skipping known-bad URL ({error}): {url}")
+                return None
+
+        if not self.config.get("coalesce", True):
+            return await self._fetch(url)
+
+        # Instances with different budgets must not share results
+        key = (
+            "extract",
+            normalize_url(url),
+            self.config.get("format"),
+            self._char_budget(),
+        )
+        return await self.transport.coalesce(key, lambda: self._fetch(url))
+
+    async def _fetch(self, url: str) -> Optional[Dict[str, Any]]:
+        """Fetch and parse a single URL from the Jina AI Reader API"""
+        max_chars = self._char_budget()
+        # A content budget needs the plain-text format, which can be cut short
+        text_mode = self.config.get("format") == "text" or max_chars is not None
+        headers = dict(self.headers)
+        if text_mode:
+            headers["Accept"] = "text/plain"
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/{url}", headers=self.headers
-                ) as response:
+            entry = None
+            if self.cache:
+                cache_key = self.cache.key(
+                    url, {"format": headers["Accept"], "max_chars": max_chars}
+                )
+                entry = await self.cache.lookup(cache_key)
+                if entry and entry.fresh:
+                    return await self.cache.hit(entry)
+                await self.cache.miss()
+                headers.update(self.cache.conditional_headers(entry))
+
+            scheduler = self.scheduler or get_host_scheduler()
+            async with scheduler.slot(url):
+                async with self._request(url, headers) as response:
+                    if response.status == 304 and entry is not None:
+                        return await self.cache.revalidated(entry)
+
                     if response.status != 200:
                         error_msg = f"Jina API error: {response.status}"
                         if response.status == 401:
                             error_msg += " (Invalid API key)"
                         self.logger.error(error_msg)
+                        error = classify_status(response.status)
+                        if error:
+                            await self._record_failure(
+                                url, error, f"HTTP {response.status}"
+                            )
                         return None
 
-                    data = (await response.json()).get("data", {})
-                    return {
-                        "title": data.get("title", ""),
-                        "description": data.get("description", ""),
-                        "url": data.get("url", url),
-                        "content": data.get("content", ""),
-                    }
+                    if text_mode:
+                        result, stats = await self._read_text(response, url, max_chars)
+                    else:
+                        try:
+                            body, stats = await read_text(
+                                response, max_bytes=self.max_bytes, truncate=False
+                            )
+                        except BodyTooLargeError:
+                            # Cut-off JSON can't be parsed, but the page is fine
+                            self.logger.warning(
+                                f"Response for {url} exceeds {self.max_bytes} bytes;"
+                                " use text format or max_chars for large pages"
+                            )
+                            return None
+                        data = json.loads(body).get("data", {})
+                        result = {
+                            "title": data.get("title", ""),
+                            "description": data.get("description", ""),
+                            "url": data.get("url", url),
+                            "content": data.get("content", ""),
+                        }
+
+                    result["truncated"] = stats.truncated
+                    result["transfer"] = stats.as_dict()
+                    self.logger.debug(
+                        f"Read {stats.wire_bytes} bytes for {url} "
+                        f"({stats.bytes_saved} saved by {stats.encoding})"
+                    )
+                    if not result["content"].strip():
+                        await self._record_failure(url, "empty")
+                        return result
+                    if self.track_health:
+                        await get_url_health().arecord_success(url)
+                    if self.cache:
+                        await self.cache.save(
+                            cache_key, result, response.headers, stats.wire_bytes
+                        )
+                    return result
 
+        except KeyPoolExhaustedError as e:
+            self.logger.error(str(e))
+            return None
+        except asyncio.TimeoutError:
+            self.logger.error(f"Timeout extracting content from {url}")
+            await self._record_failure(url, "timeout")
+            return None
         except Exception as e:
             self.logger.error(f"Error extracting content: {str(e)}")
+            await self._record_failure(url, "error", str(e))
             return None
 
+    @asynccontextmanager
+    async def _request(self, url: str, headers: Dict[str, str]):
+        """GET url through the reader, moving to another key on 401/402/429"""
+        for attempt in range(len(self.keys)):
+            key = await self.keys.acquire()
+            headers = {**headers, "Authorization": f"Bearer {key.value}"}
+            yielded = False
+            try:
+                async with self.transport.stream(
+                    "GET", f"{self.base_url}/{url}", headers=headers
+                ) as response:
+                    self.keys.report(key, response.status, response.headers)
+                    last_attempt = attempt == len(self.keys) - 1
+                    if response.status in KEY_ERRORS and not last_attempt:
+                        self.logger.warning(
+                            f"Jina key {key.label} got {response.status}, "
+                            "retrying with another key"
+                        )
+                        continue
+                    yielded = True
+                    yield response
+                    return
+            except Exception:
+                if not yielded:
+                    self.keys.report(key, None)
+                raise
+
+    async def _record_failure(self, url: str, error: str, detail: str = "") -> None:
+        """Remember a failed extraction so the URL is skipped for a while"""
+        if self.track_health:
+            await get_url_health().arecord_failure(url, error, detail)
+
+    async def _read_text(
+        self, response, url: str, max_chars: Optional[int]
+    ) -> Tuple[Dict[str, Any], TransferStats]:
+        """Stream Jina's plain-text format, stopping at the content budget"""
+        stats = TransferStats()
+        result = {"title": "", "description": "", "url": url, "content": ""}
+        preamble = ""
+        in_content = False
+        parts = []
+        length = 0
+
+        stream = iter_text(response, stats, max_bytes=self.max_bytes)
+        try:
+            async for text in stream:
+                if not in_content:
+                    preamble += text
+                    marker = preamble.find(_CONTENT_MARKER)
+                    if marker == -1 and len(preamble) < _MAX_PREAMBLE_CHARS:
+                        continue
+                    if marker == -1:
+                        # No metadata block: treat everything as content
+                        text = preamble
+                    else:
+                        self._parse_preamble(preamble[:marker], result)
+                        text = preamble[marker + len(_CONTENT_MARKER) :]
+                    in_content = True
+
+                if max_chars is not None and length + len(text) > max_chars:
+                    parts.append(text[: max_chars - length])
+                    stats.truncated = True
+                    break
+                parts.append(text)
+                length += len(text)
+        except BodyTooLargeError:
+            stats.truncated = True
+        finally:
+            await stream.aclose()
+
+        if not in_content:
+            # Short page whose body never reached the content marker
+            parts.append(preamble[:max_chars] if max_chars is not None else preamble)
+
+        result["content"] = "".join(parts).strip()
+        return result, stats
+
+    @staticmethod
+    def _parse_preamble(preamble: str, result: Dict[str, Any]) -> None:
+        """Copy Title/URL Source/Description lines into the result"""
+        for line in preamble.splitlines():
+            name, sep, value = line.partition(":")
+            if sep and name.strip() in _TEXT_FIELDS and value.strip():
+                result[_TEXT_FIELDS[name.strip()]] = value.strip()
+
 
 async def test_reader():
     """Test the Jina AI Reader with a sample URL"""
@@ -1,8 +1,77 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional
+import asyncio
 import logging
-from litellm import completion
+import time
+import weakref
+from litellm import RateLimitError, ServiceUnavailableError, acompletion
 from pynions.core import Plugin
+from pynions.core.batch import get_batch_queue
+from pynions.core.budget import TokenBudget
+from pynions.core.cache import get_completion_cache
+from pynions.core.cassette import CassetteMissError, get_cassette
+from pynions.core.completion_stream import CompletionStream
 from pynions.core.config import config
+from pynions.core.keypool import retry_after
+from pynions.core.ledger import (
+    BudgetExceededError,
+    check_budget,
+    estimate_cost,
+    record_call,
+)
+from pynions.core.prompt import record_prompt_usage
+from pynions.core.ratelimit import get_rate_scheduler, reserve
+from pynions.core.tokens import estimate_usage
+from pynions.core.transport import get_metrics
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 300  # 5 minutes
+RETRY_DELAY = 10  # Seconds before retrying a rate limit or overload
+
+# API key variable and display name per provider
+PROVIDERS = {
+    "openai": ("OPENAI_API_KEY", "OpenAI"),
+    "anthropic": ("ANTHROPIC_API_KEY", "Anthropic"),
+    "perplexity": ("PERPLEXITY_API_KEY", "Perplexity"),
+    "gemini": ("GEMINI_API_KEY", "Gemini"),
+}
+
+# Completion slots shared by all instances on an event loop, by limit
+_slots: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _semaphore(limit: int) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphores = _slots.setdefault(loop, {})
+    if limit not in semaphores:
+        semaphores[limit] = asyncio.Semaphore(limit)
+    return semaphores[limit]
+
+
+def model_provider(model: str) -> str:
+    """Provider of a LiteLLM model name, e.g. "anthropic/claude-3-5-sonnet" """
+    if "/" in model:
+        return model.split("/", 1)[0]
+    for prefix, provider in (
+        ("claude", "anthropic"),
+        ("sonar", "perplexity"),
+        ("gemini", "gemini"),
+    ):
+        if model.startswith(prefix):
+            return provider
+    return "openai"
+
+
+def _usage_dict(usage) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+        "completion_tokens": getattr(usage, "completion_tokens", 0),
+        "total_tokens": getattr(usage, "total_tokens", 0),
+        # Prompt tokens served from the provider's prompt cache
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
 
 
 class LiteLLM(Plugin):
@@ -15,22 +84,30 @@ class LiteLLM(Plugin):
 
         # Set default model and get appropriate API key
         self.model = self.config.get("model", "gpt-4o-mini")
+        # Requests issued at once across all LiteLLM instances; a stream
+        # frees its slot once the response has started
+        self.max_concurrency = int(
+            self.config.get(
+                "max_concurrency",
+                config.get("LITELLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+            )
+        )
+        self.timeout = self.config.get("timeout", DEFAULT_TIMEOUT)
+        # Opt-in exact-match cache; None when disabled
+        self.cache = get_completion_cache("litellm", self.config)
 
-        # Determine which API key to use based on model
-        if "anthropic" in self.model:
-            self.api_key = config.get("ANTHROPIC_API_KEY")
-            if not self.api_key:
-                raise ValueError("No Anthropic API key provided")
-        else:
-            self.api_key = config.get("OPENAI_API_KEY")
-            if not self.api_key:
-                raise ValueError("No OpenAI API key provided")
+        # Determine which API key to use based on the model's provider
+        self.provider = model_provider(self.model)
+        key_env, name = PROVIDERS.get(
+            self.provider, (f"{self.provider.upper()}_API_KEY", self.provider)
+        )
+        self.api_key = config.get(key_env)
+        if not self.api_key and self.provider in PROVIDERS:
+            raise ValueError(f"No {name} API key provided")
 
         # Log configuration
         self.logger.info(f"Initialized LiteLLM with model: {self.model}")
-        self.logger.info(
-            f"Using API key for: {'Anthropic' if 'anthropic' in self.model else 'OpenAI'}"
-        )
+        self.logger.info(f"Using API key for: {name}")
 
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Execute LLM completion request with retry logic"""
@@ -42,78 +119,71 @@ class LiteLLM(Plugin):
             # Get optional parameters with defaults
             temperature = self.config.get("temperature", 0.7)
             max_tokens = self.config.get("max_tokens", 2000)
-            max_retries = 5
-            retry_delay = 10  # seconds between retries
+            # Fail fast (or trim) before waiting on an oversized request
+            messages = self._fit(messages, max_tokens)
+            # ModelRouter sets 1 and falls back to another model instead
+            max_retries = self.config.get("max_retries", 5)
 
             self.logger.info(f"Making completion request with {len(messages)} messages")
             self.logger.info(f"Model: {self.model}")
             self.logger.info(f"Temperature: {temperature}")
             self.logger.info(f"Max tokens: {max_tokens}")
 
+            request = self._request(messages, temperature, max_tokens)
+            if self.cache and not self.config.get("stream"):
+                cached = await self.cache.get(request)
+                if cached is not None:
+                    self.logger.info("Returning cached completion")
+                    return cached
+            if self.config.get("batch"):
+                formatted_response = await self._batch(
+                    messages, temperature, max_tokens
+                )
+                if self.cache:
+                    await self.cache.put(request, formatted_response)
+                return formatted_response
+            cassette = get_cassette()
+
             # Implement retry logic
             for attempt in range(max_retries):
                 try:
-                    # Make completion request
-                    response = completion(
-                        model=self.model,
-                        messages=messages,
-                        temperature=temperature,
-                        max_tokens=max_tokens,
-                        api_key=self.api_key,
-                        timeout=300,  # 5 minute timeout
-                    )
-
-                    # Extract usage data if available
-                    usage_data = None
-                    if hasattr(response, "usage"):
-                        usage_data = {
-                            "prompt_tokens": getattr(
-                                response.usage, "prompt_tokens", 0
-                            ),
-                            "completion_tokens": getattr(
-                                response.usage, "completion_tokens", 0
-                            ),
-                            "total_tokens": getattr(response.usage, "total_tokens", 0),
-                        }
-
-                    # Format response to match expected structure
-                    formatted_response = {
-                        "choices": [
-                            {
-                                "message": {
-                                    "role": "assistant",
-                                    "content": response.choices[0].message.content,
-                                }
-                            }
-                        ],
-                        "model": response.model,
-                        "usage": usage_data,
-                    }
+                    if self.config.get("stream"):
+                        # Same result, plus time-to-first-token stats
+                        formatted_response = await self.stream(input_data).collect()
+                    elif cassette:
+                        formatted_response = await cassette.intercept(
+                            {"kind": "litellm", **request},
+                            lambda: self._complete(messages, temperature, max_tokens),
+                        )
+                    else:
+                        formatted_response = await self._complete(
+                            messages, temperature, max_tokens
+                        )
+                    usage_data = formatted_response["usage"]
 
                     self.logger.info("Successfully generated completion")
                     if usage_data:
                         self.logger.info(f"Token usage: {usage_data}")
+                    if self.cache and not self.config.get("stream"):
+                        await self.cache.put(request, formatted_response)
 
                     return formatted_response
 
+                except (CassetteMissError, BudgetExceededError):
+                    raise  # Retrying cannot produce a recording or budget
                 except Exception as e:
-                    error_message = str(e)
-                    if "overloaded" in error_message.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (
-                                attempt + 1
-                            )  # Exponential backoff
-                            self.logger.warning(
-                                f"Anthropic API overloaded. Retrying in {wait_time} seconds... (Attempt {attempt + 1}/{max_retries})"
-                            )
-                            import asyncio
-
-                            await asyncio.sleep(wait_time)
-                            continue
-
-                    self.logger.error(
-                        f"LiteLLM error on attempt {attempt + 1}: {error_message}"
-                    )
+                    delay = self._backoff(e, attempt)
+                    if delay is not None and attempt < max_retries - 1:
+                        self.logger.warning(
+                            f"{str(e)[:200]}; retrying in {delay}s "
+                            f"(Attempt {attempt + 1}/{max_retries})"
+                        )
+                        # No slot is held while waiting, and cancelling
+                        # the caller stops the retry loop here
+                        await asyncio.sleep(delay)
+                        continue
+
+                    self.logger.error(f"LiteLLM error on attempt {attempt + 1}: {e}")
                     if attempt == max_retries - 1:
                         raise  # Re-raise the last error if all retries failed
 
@@ -126,6 +196,261 @@ class LiteLLM(Plugin):
             self.logger.error(traceback.format_exc())
             raise  # Re-raise the error for proper handling
 
+    def _backoff(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying error, or None if it isn't transient"""
+        if isinstance(error, RateLimitError):
+            # A rate scheduler holds the retry until the limit allows it;
+            # without one, back off a fixed delay
+            if get_rate_scheduler(self.provider, self.model, self.config):
+                return 0
+            return RETRY_DELAY
+        if (
+            isinstance(error, ServiceUnavailableError)
+            or "overloaded" in str(error).lower()
+        ):
+            return RETRY_DELAY * (attempt + 1)
+        return None
+
+    async def retry(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Await call(), retrying rate limits and overload like execute() does
+
+        Streams can't be retried once handed out, so call should open and
+        read a fresh stream each time. Other errors are raised at once.
+        """
+        max_retries = self.config.get("max_retries", 5)
+        for attempt in range(max_retries):
+            try:
+                return await call()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None or attempt == max_retries - 1:
+                    raise
+                self.logger.warning(
+                    f"{str(e)[:200]}; retrying in {delay}s "
+                    f"(Attempt {attempt + 1}/{max_retries})"
+                )
+                await asyncio.sleep(delay)
+
+    def _fit(self, messages: List[Dict[str, Any]], max_tokens: int) -> List[Dict]:
+        """Trim messages to the context window, leaving room for max_tokens"""
+        if not self.config.get("fit_context", True):
+            return messages
+        budget = TokenBudget(
+            self.model, max_tokens, window=self.config.get("context_window")
+        )
+        return budget.fit_messages(messages)
+
+    def _request(
+        self, messages: List[Dict[str, Any]], temperature: float, max_tokens: int
+    ) -> Dict[str, Any]:
+        """Everything that determines a completion, for cache and cassette keys"""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+    async def _complete(
+        self, messages: List[Dict[str, Any]], temperature: float, max_tokens: int
+    ) -> Dict[str, Any]:
+        """Make a single completion request and format the response"""
+        # LiteLLM uses its own HTTP clients; record its latency alongside
+        # the other providers
+        metrics = get_metrics("litellm")
+        await check_budget()
+        async with self._reserve(messages, max_tokens) as reservation:
+            async with _semaphore(self.max_concurrency):
+                start = time.perf_counter()
+                try:
+                    response = await acompletion(
+                        model=self.model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        api_key=self.api_key,
+                        timeout=self.timeout,
+                    )
+                except Exception as e:
+                    metrics.record(None, time.perf_counter() - start)
+                    self._rate_limited(e)
+                    raise
+                latency = time.perf_counter() - start
+                metrics.record(200, latency)
+
+            # Extract usage data if available
+            usage_data = _usage_dict(getattr(response, "usage", None))
+            if reservation:
+                reservation.settle(usage_data)
+        await record_prompt_usage(self.provider, usage_data, latency)
+        await record_call(self.provider, self.model, usage_data, latency)
+
+        # Format response to match expected structure
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": response.choices[0].message.content,
+                    }
+                }
+            ],
+            "model": response.model,
+            "usage": usage_data,
+        }
+
+    def _reserve(self, messages: List[Dict[str, Any]], max_tokens: int):
+        """Room for one call under the model's TPM/RPM limits, if set"""
+        return reserve(self.provider, self.model, self.config, messages, max_tokens)
+
+    def _rate_limited(self, error: Exception) -> None:
+        if isinstance(error, RateLimitError):
+            rate = get_rate_scheduler(self.provider, self.model, self.config)
+            if rate:
+                response = getattr(error, "response", None)
+                rate.pause(retry_after(getattr(response, "headers", None)))
+
+    async def _batch(
+        self, messages: List[Dict[str, Any]], temperature: float, max_tokens: int
+    ) -> Dict[str, Any]:
+        """Complete through the provider's batch API; may take hours"""
+        if self.provider != "openai":
+            raise ValueError("Batch mode is only available for OpenAI models")
+        request = self._request(messages, temperature, max_tokens)
+        request["model"] = self.model.split("/", 1)[-1]
+        await check_budget()
+        self.logger.info("Queued completion for batch submission")
+        start = time.perf_counter()
+        body = await get_batch_queue(self.api_key).submit(request)
+        usage = body.get("usage")
+        await record_call(
+            self.provider,
+            self.model,
+            usage,
+            time.perf_counter() - start,
+            cost=estimate_cost(self.provider, self.model, usage or {}, batch=True),
+            kind="batch",
+        )
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": body["choices"][0]["message"]["content"],
+                    }
+                }
+            ],
+            "model": body.get("model", self.model),
+            "usage": body.get("usage"),
+        }
+
+    def stream(self, input_data: Dict[str, Any]) -> CompletionStream:
+        """Stream a completion as an async iterator of text deltas
+
+        The returned CompletionStream also exposes the accumulated text,
+        usage and time-to-first-token / tokens-per-second stats. Streams
+        are not retried; a failure surfaces while iterating. Wrap the whole
+        read in retry() to back off from rate limits and overload. A cache
+        hit is replayed as a single delta. input_data may set max_tokens for
+        this call only.
+        """
+        messages = input_data.get("messages", [])
+        if not messages:
+            raise ValueError("No messages provided for completion")
+        temperature = self.config.get("temperature", 0.7)
+        max_tokens = input_data.get("max_tokens") or self.config.get("max_tokens", 2000)
+        messages = self._fit(messages, max_tokens)
+        events = lambda: self._stream_events(messages, temperature, max_tokens)
+        if self.cache:
+            request = self._request(messages, temperature, max_tokens)
+            return CompletionStream(self.cache.stream(request, events), self.model)
+        return CompletionStream(events(), model=self.model)
+
+    async def _stream_events(
+        self, messages: List[Dict[str, Any]], temperature: float, max_tokens: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream events, recorded to or replayed from the active cassette"""
+        cassette = get_cassette()
+        if cassette is None:
+            # Close the live stream ourselves so a consumer that stops early
+            # settles and records it now, not whenever it is collected
+            inner = self._live_events(messages, temperature, max_tokens)
+            try:
+                async for event in inner:
+                    yield event
+            finally:
+                await inner.aclose()
+            return
+
+        async def record() -> Dict[str, Any]:
+            events = self._live_events(messages, temperature, max_tokens)
+            return {"events": [event async for event in events]}
+
+        request = {
+            "kind": "litellm",
+            "stream": True,
+            **self._request(messages, temperature, max_tokens),
+        }
+        for event in (await cassette.intercept(request, record))["events"]:
+            yield event
+
+    async def _live_events(
+        self, messages: List[Dict[str, Any]], temperature: float, max_tokens: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield delta/usage events from a streamed LiteLLM completion"""
+        metrics = get_metrics("litellm")
+        await check_budget()
+        ttft, usage = None, None
+        async with self._reserve(messages, max_tokens) as reservation:
+            async with _semaphore(self.max_concurrency):
+                start = time.perf_counter()
+                try:
+                    response = await acompletion(
+                        model=self.model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        api_key=self.api_key,
+                        timeout=self.timeout,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                except Exception as e:
+                    metrics.record(None, time.perf_counter() - start)
+                    self._rate_limited(e)
+                    raise
+            # The slot is released once the stream has started, so a slow
+            # consumer doesn't hold up other calls
+            failed = False
+            parts = []
+            try:
+                async for chunk in response:
+                    event = {"model": getattr(chunk, "model", None)}
+                    if chunk.choices:
+                        event["delta"] = chunk.choices[0].delta.content or ""
+                        parts.append(event["delta"])
+                    chunk_usage = _usage_dict(getattr(chunk, "usage", None))
+                    if chunk_usage:
+                        event["usage"] = usage = chunk_usage
+                    if ttft is None and event.get("delta"):
+                        ttft = time.perf_counter() - start
+                    yield event
+            except Exception:
+                failed = True
+                metrics.record(None, time.perf_counter() - start)
+                raise
+            finally:
+                if not failed:
+                    # One outcome per call; stream latency is time to first token
+                    metrics.record(200, ttft or time.perf_counter() - start)
+                # Tokens are billed even when the consumer stops early or the
+                # stream breaks, so charge and record the call either way
+                recorded = usage or estimate_usage(messages, "".join(parts), self.model)
+                if reservation:
+                    reservation.settle(recorded)
+                await record_prompt_usage(self.provider, recorded, ttft or 0.0)
+                await record_call(self.provider, self.model, recorded, ttft or 0.0)
+
 
 async def test_completion(prompt: str = "What is SaaS content marketing?"):
     """Test the LiteLLM plugin with a sample prompt"""
@@ -164,6 +489,4 @@ async def test_completion(prompt: str = "What is SaaS content marketing?"):
 
 
 if __name__ == "__main__":
-    import asyncio
-
     asyncio.run(test_completion())
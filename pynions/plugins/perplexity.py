@@ -1,17 +1,48 @@
-import os
-import json
-import httpx
 import asyncio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, AsyncIterator
+from pynions.core.budget import TokenBudget
+from pynions.core.cache import get_completion_cache
+from pynions.core.cassette import CassetteMissError
+from pynions.core.completion_stream import CompletionStream
+from pynions.core.keypool import KeyPoolExhaustedError, get_key_pool
+from pynions.core.ledger import check_budget, record_call
+from pynions.core.prompt import record_prompt_usage
+from pynions.core.ratelimit import get_rate_scheduler, reserve
+from pynions.core.sse import iter_events
+from pynions.core.tokens import estimate_usage
+from pynions.core.transport import (
+    HTTPStatusError,
+    TransportError,
+    TransportTimeoutError,
+    get_transport,
+)
 from .base import Plugin
 
+# Plugin options that configure the client rather than the API request
+_CLIENT_OPTIONS = {
+    "tpm",
+    "rpm",
+    "key_rpm",
+    "key_quota",
+    "key_cooldown",
+    "cache",
+    "cache_ttl",
+    "cache_nondeterministic",
+    "fit_context",
+    "context_window",
+}
+# Answers draw on live search results, so cached ones age out sooner
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
 
 class PerplexityAPI(Plugin):
     """Plugin for interacting with Perplexity AI API"""
 
     def __init__(self, config=None):
         super().__init__(config)
-        self.api_key = os.getenv("PERPLEXITY_API_KEY")
+        self.keys = get_key_pool("perplexity", "PERPLEXITY_API_KEY", config)
+        self.api_key = self.keys.keys[0].value if self.keys else None
         print(f"API Key found: {'Yes' if self.api_key else 'No'}")
         print(
             f"API Key starts with: {self.api_key[:8]}..."
@@ -20,6 +51,7 @@ class PerplexityAPI(Plugin):
         )
 
         self.base_url = "https://api.perplexity.ai/chat/completions"
+        self.transport = get_transport("perplexity", backend="httpx")
         self.default_config = {
             "model": "sonar-reasoning-pro",  # Supported Models https://docs.perplexity.ai/guides/model-cards
             "max_tokens": 1000,
@@ -36,13 +68,16 @@ class PerplexityAPI(Plugin):
         }
         # Merge default config with provided config
         self.config = {**self.default_config, **(config or {})}
+        self.cache = get_completion_cache(
+            "perplexity", self.config, ttl=DEFAULT_CACHE_TTL
+        )
         self.initialize()
 
     def initialize(self):
         """Initialize the plugin"""
         if not self.api_key:
             raise ValueError("PERPLEXITY_API_KEY environment variable is required")
-        if not self.api_key.startswith("pplx-"):
+        if not all(key.value.startswith("pplx-") for key in self.keys.keys):
             raise ValueError(
                 "Invalid PERPLEXITY_API_KEY format. It should start with 'pplx-'"
             )
@@ -63,44 +98,72 @@ class PerplexityAPI(Plugin):
         Returns:
             API response as a dictionary
         """
+        if self.config.get("stream"):
+            return await self.stream(input_data).collect()
+
+        # Built once: an oversized prompt fails here instead of being retried
+        payload = self._payload(input_data)
+        if self.cache:
+            cached = await self.cache.get(payload)
+            if cached is not None:
+                print("Returning cached Perplexity response")
+                return cached
+
+        await check_budget()
         max_retries = 3
         retry_delay = 5  # seconds
         current_retry = 0
 
         while current_retry < max_retries:
+            key = None
             try:
-                # Prepare the payload
-                payload = {
-                    **self.config,
-                    "messages": input_data.get("messages", []),
-                }
-
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                }
-
-                # Using 2 minutes timeout for complex reasoning tasks
-                timeout = httpx.Timeout(120.0, connect=30.0)
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    response = await client.post(
-                        self.base_url, json=payload, headers=headers
+                # Failed attempts give their reserved tokens back on exit
+                async with self._reserve(payload) as reservation:
+                    # Raises KeyPoolExhaustedError once every key is revoked
+                    key = await self.keys.acquire()
+                    headers = {
+                        "Authorization": f"Bearer {key.value}",
+                        "Content-Type": "application/json",
+                    }
+
+                    # Using 2 minutes timeout for complex reasoning tasks
+                    start = time.perf_counter()
+                    response = await self.transport.request(
+                        "POST",
+                        self.base_url,
+                        json=payload,
+                        headers=headers,
+                        timeout=120.0,
+                        connect_timeout=30.0,
                     )
 
+                    self.keys.report(key, response.status, response.headers)
+                    if response.status == 429:
+                        self._rate_limited(key)
+                    if response.status in (401, 402, 429) and self.keys.active:
+                        # Another key can take this request; only 429 counts
+                        # as a retry since it may also mean the provider is busy
+                        print(
+                            f"Key {key.label} got {response.status}, "
+                            "retrying with another key..."
+                        )
+                        if response.status == 429:
+                            current_retry += 1
+                        continue
+
                     try:
-                        response_data = response.json()
+                        response_data = await response.json()
                     except:
-                        print(f"Raw response text: {response.text}")
+                        print(f"Raw response text: {await response.text()}")
                         raise ValueError("Failed to parse JSON response")
 
-                    if response.status_code == 401:
+                    if response.status == 401:
                         raise ValueError("Invalid Perplexity API key")
-                    elif response.status_code == 422:
-                        error_data = response.json()
+                    elif response.status == 422:
                         raise ValueError(
-                            f"Invalid request: {error_data.get('detail', 'Unknown validation error')}"
+                            f"Invalid request: {response_data.get('detail', 'Unknown validation error')}"
                         )
-                    elif response.status_code == 524:
+                    elif response.status == 524:
                         if current_retry < max_retries - 1:
                             print(
                                 f"Request timeout, retrying in {retry_delay} seconds..."
@@ -114,9 +177,20 @@ class PerplexityAPI(Plugin):
                             )
 
                     response.raise_for_status()
-                    return response.json()
+                    latency = time.perf_counter() - start
+                    usage = response_data.get("usage")
+                    if reservation:
+                        reservation.settle(usage)
+                    await record_prompt_usage("perplexity", usage, latency)
+                    await record_call("perplexity", payload["model"], usage, latency)
+                    if self.cache:
+                        await self.cache.put(payload, response_data)
+                    return response_data
 
-            except httpx.TimeoutException as e:
+            except (CassetteMissError, KeyPoolExhaustedError):
+                raise  # Retrying cannot produce a recording or a usable key
+            except TransportTimeoutError as e:
+                self.keys.report(key, None)
                 if current_retry < max_retries - 1:
                     print(f"Timeout error, retrying in {retry_delay} seconds...")
                     await asyncio.sleep(retry_delay)
@@ -126,7 +200,9 @@ class PerplexityAPI(Plugin):
                 raise ValueError(
                     f"Request timed out after {max_retries} retries. The model is taking longer than expected to respond."
                 )
-            except httpx.HTTPError as e:
+            except TransportError as e:
+                if not isinstance(e, HTTPStatusError):
+                    self.keys.report(key, None)  # Connection-level failure
                 if current_retry < max_retries - 1:
                     print(f"HTTP error, retrying in {retry_delay} seconds...")
                     await asyncio.sleep(retry_delay)
@@ -144,3 +220,136 @@ class PerplexityAPI(Plugin):
                 raise ValueError(f"Error making request to Perplexity API: {str(e)}")
 
         raise ValueError(f"Failed after {max_retries} retries")
+
+    def _reserve(self, payload: Dict[str, Any]):
+        """Room for one request under the model's TPM/RPM limits, if set"""
+        return reserve(
+            "perplexity",
+            payload["model"],
+            self.config,
+            payload["messages"],
+            payload.get("max_tokens"),
+        )
+
+    def _rate_limited(self, key) -> None:
+        rate = get_rate_scheduler("perplexity", self.config["model"], self.config)
+        if rate:
+            # Keys of one account share its limit; wait as long as the key
+            rate.pause(max(key.disabled_until - time.monotonic(), 0.0))
+
+    def _payload(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {k: v for k, v in self.config.items() if k not in _CLIENT_OPTIONS}
+        if input_data.get("max_tokens"):
+            payload["max_tokens"] = input_data["max_tokens"]
+        messages = input_data.get("messages", [])
+        if self.config.get("fit_context", True):
+            budget = TokenBudget(
+                payload["model"],
+                payload.get("max_tokens"),
+                window=self.config.get("context_window"),
+            )
+            messages = budget.fit_messages(messages)
+        payload["messages"] = messages
+        return payload
+
+    def stream(self, input_data: Dict[str, Any]) -> CompletionStream:
+        """Stream a response as an async iterator of text deltas
+
+        Citations and usage arrive on the stream object as soon as the API
+        sends them; segments() keeps the <think> reasoning of reasoning
+        models apart from the answer. Streams are not retried; errors
+        surface while iterating. A cache hit is replayed as a single delta.
+        """
+        events = lambda: self._stream_events(input_data)
+        if self.cache:
+            request = self._payload(input_data)
+            return CompletionStream(
+                self.cache.stream(request, events), self.config["model"]
+            )
+        return CompletionStream(events(), self.config["model"])
+
+    async def _stream_events(
+        self, input_data: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield events parsed from the API's server-sent events"""
+        await check_budget()
+        payload = self._payload(input_data)
+        ttft, usage = None, None
+        started, parts = False, []
+        async with self._reserve(payload) as reservation:
+            key = await self.keys.acquire()
+            headers = {
+                "Authorization": f"Bearer {key.value}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            }
+            start = time.perf_counter()
+            try:
+                async with self.transport.stream(
+                    "POST",
+                    self.base_url,
+                    json={**payload, "stream": True},
+                    headers=headers,
+                    timeout=120.0,
+                    connect_timeout=30.0,
+                ) as response:
+                    self.keys.report(key, response.status, response.headers)
+                    if response.status == 429:
+                        self._rate_limited(key)
+                    if response.status != 200:
+                        body = await response.text()
+                        raise ValueError(
+                            f"Perplexity API error {response.status}: {body[:500]}"
+                        )
+
+                    started = True
+                    events = iter_events(response)
+                    try:
+                        async for sse in events:
+                            if sse.data == "[DONE]":
+                                break
+                            if sse.event == "error":
+                                raise ValueError(
+                                    f"Perplexity stream error: {sse.data[:500]}"
+                                )
+                            event = self._parse_chunk(sse.json())
+                            usage = event.get("usage") or usage
+                            parts.append(event.get("delta") or "")
+                            if ttft is None and event.get("delta"):
+                                ttft = time.perf_counter() - start
+                            yield event
+                    finally:
+                        await events.aclose()
+            except TransportError:
+                self.keys.report(key, None)
+                raise
+            finally:
+                if started:
+                    # Billed even if the consumer stopped early or the stream
+                    # broke, so charge and record it either way
+                    model = payload["model"]
+                    recorded = usage or estimate_usage(
+                        payload["messages"], "".join(parts), model
+                    )
+                    if reservation:
+                        reservation.settle(recorded)
+                    await record_prompt_usage("perplexity", recorded, ttft or 0.0)
+                    await record_call("perplexity", model, recorded, ttft or 0.0)
+
+    @staticmethod
+    def _parse_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        # Newer models list sources as search_results instead of citations
+        citations = chunk.get("citations") or [
+            result["url"]
+            for result in chunk.get("search_results") or []
+            if result.get("url")
+        ]
+        event = {
+            "model": chunk.get("model"),
+            "citations": citations,
+            "usage": chunk.get("usage"),
+        }
+        choices = chunk.get("choices") or []
+        if choices:
+            event["delta"] = (choices[0].get("delta") or {}).get("content") or ""
+        return event
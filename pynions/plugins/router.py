@@ -0,0 +1,168 @@
+"""Route each completion to the best available model"""
+
+import time
+from typing import Any, Dict, List, Optional
+from litellm import RateLimitError, ServiceUnavailableError
+from pynions.core import Plugin
+from pynions.core.budget import TokenBudget, TokenBudgetError
+from pynions.core.cassette import CassetteMissError
+from pynions.core.ledger import BudgetExceededError
+from pynions.plugins.litellm_plugin import LiteLLM, model_provider
+
+SMOOTHING = 0.3  # Weight of the newest observation in the rolling averages
+DEFAULT_COOLDOWN = 60  # Seconds a provider is skipped after reporting overload
+UNHEALTHY_ERROR_RATE = 0.5
+
+# Statuses for rate limits, unavailability and Anthropic's "overloaded"
+_OVERLOAD_STATUSES = (429, 503, 529)
+
+# Router options that are not passed on to LiteLLM
+_ROUTER_OPTIONS = {"models", "latency_slo", "overload_cooldown"}
+
+
+def is_overload(error: Exception) -> bool:
+    """Whether an error means the provider is busy rather than the request bad"""
+    if isinstance(error, (RateLimitError, ServiceUnavailableError)):
+        return True
+    return getattr(error, "status_code", None) in _OVERLOAD_STATUSES
+
+
+class ModelStats:
+    """Rolling latency and error rate for one model"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def success(self, latency: float) -> None:
+        self.calls += 1
+        self.latency = (
+            latency
+            if self.latency is None
+            else SMOOTHING * latency + (1 - SMOOTHING) * self.latency
+        )
+        self.error_rate *= 1 - SMOOTHING
+
+    def failure(self) -> None:
+        self.calls += 1
+        self.failures += 1
+        self.error_rate = SMOOTHING + (1 - SMOOTHING) * self.error_rate
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+# Shared by all routers in the process, so every caller learns from each call
+_stats: Dict[str, ModelStats] = {}
+_cooldowns: Dict[str, float] = {}  # Provider -> time its overload pause ends
+
+
+def model_stats(model: str) -> ModelStats:
+    if model not in _stats:
+        _stats[model] = ModelStats()
+    return _stats[model]
+
+
+class ModelRouter(Plugin):
+    """Plugin that picks a model per request and falls back on overload
+
+    Models are listed in order of preference. For each request the router
+    skips models whose context window can't hold the prompt plus
+    max_tokens, providers paused after an overload, models whose observed
+    latency misses latency_slo and models that are mostly failing. A failed
+    call moves on to the next model straight away instead of waiting in
+    LiteLLM's retry loop.
+    """
+
+    def __init__(self, plugin_config: Optional[Dict[str, Any]] = None):
+        super().__init__(plugin_config)
+        self.models = self.config.get(
+            "models", ["gpt-4o-mini", "anthropic/claude-3-5-sonnet-20240620"]
+        )
+        if not self.models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.latency_slo = self.config.get("latency_slo")  # Seconds per call
+        self.cooldown = self.config.get("overload_cooldown", DEFAULT_COOLDOWN)
+        self._clients: Dict[str, LiteLLM] = {}
+
+    def client(self, model: str) -> LiteLLM:
+        """LiteLLM plugin for a model, created on first use"""
+        if model not in self._clients:
+            options = {k: v for k, v in self.config.items() if k not in _ROUTER_OPTIONS}
+            self._clients[model] = LiteLLM(
+                {**options, "model": model, "max_retries": 1}
+            )
+        return self._clients[model]
+
+    def choose(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """Models to try for these messages, best first"""
+        max_tokens = self.config.get("max_tokens", 2000)
+        now = time.monotonic()
+
+        def rank(indexed):
+            index, model = indexed
+            stats = model_stats(model)
+            fits = TokenBudget(model, max_tokens).fits(messages)
+            cooling = _cooldowns.get(model_provider(model), 0) > now
+            slow = (
+                self.latency_slo is not None
+                and stats.latency is not None
+                and stats.latency > self.latency_slo
+            )
+            failing = stats.error_rate > UNHEALTHY_ERROR_RATE
+            return (not fits, cooling, slow, failing, index)
+
+        return [model for _, model in sorted(enumerate(self.models), key=rank)]
+
+    async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete with the best model, falling back to the next on failure"""
+        messages = input_data.get("messages", [])
+        if not messages:
+            raise ValueError("No messages provided for completion")
+
+        errors = []
+        for model in self.choose(messages):
+            start = time.monotonic()
+            try:
+                result = await self.client(model).execute(input_data)
+            except (CassetteMissError, BudgetExceededError):
+                raise  # Another model would fail the same way
+            except TokenBudgetError as e:
+                # Not the model's fault; a larger context window may still fit
+                self.logger.warning(f"{model} can't fit the prompt, trying next")
+                errors.append(f"{model}: {e}")
+                continue
+            except Exception as e:
+                model_stats(model).failure()
+                if is_overload(e):
+                    provider = model_provider(model)
+                    _cooldowns[provider] = time.monotonic() + self.cooldown
+                    self.logger.warning(
+                        f"{provider} overloaded; pausing it for {self.cooldown}s"
+                    )
+                self.logger.warning(f"{model} failed ({str(e)[:200]}), trying next")
+                errors.append(f"{model}: {e}")
+                continue
+
+            model_stats(model).success(time.monotonic() - start)
+            result["router"] = {"model": model, "fallbacks": len(errors)}
+            return result
+
+        raise RuntimeError(f"All models failed: {'; '.join(errors)}")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            model: {
+                **model_stats(model).as_dict(),
+                "cooling": _cooldowns.get(model_provider(model), 0) > now,
+            }
+            for model in self.models
+        }
@@ -1,8 +1,28 @@
 import asyncio
-import aiohttp
-from typing import Dict, Any, Optional
+import json
+import re
+from typing import Dict, Any, Optional, Tuple
 from pynions.core import Plugin
+from pynions.core.cache import StaleWhileRevalidateCache
 from pynions.core.config import config
+from pynions.core.keypool import KEY_ERRORS, KeyPoolExhaustedError, get_key_pool
+from pynions.core.ledger import CALL_COSTS, check_budget, record_call
+from pynions.core.transport import get_transport
+from pynions.core.utils import normalize_query
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Freshness by query pattern; the first matching pattern wins
+DEFAULT_CACHE_POLICIES = [
+    {
+        "pattern": r"\b(news|today|latest|breaking)\b",
+        "fresh": HOUR / 2,
+        "stale": 2 * HOUR,
+    },
+    {"pattern": r"^site:", "fresh": 7 * DAY, "stale": 30 * DAY},
+    {"pattern": r".*", "fresh": DAY, "stale": 7 * DAY},
+]
 
 
 class SerperWebSearch(Plugin):
@@ -10,13 +30,30 @@ class SerperWebSearch(Plugin):
 
     def __init__(self, plugin_config: Dict[str, Any] = None):
         super().__init__(plugin_config)
-        self.api_key = config.get("SERPER_API_KEY")
-        if not self.api_key:
+        self.keys = get_key_pool("serper", "SERPER_API_KEY", self.config)
+        if not self.keys:
             raise ValueError("SERPER_API_KEY not found in configuration")
+        self.api_key = self.keys.keys[0].value
 
         self.base_url = "https://google.serper.dev/search"
+        self.transport = get_transport("serper")
         self.headers = {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
 
+        self.cache = None
+        if self.config.get("cache", config.get("http_cache", False)):
+            self.cache = StaleWhileRevalidateCache("serp")
+        self.cache_policies = [
+            (re.compile(policy["pattern"], re.IGNORECASE), policy)
+            for policy in self.config.get("cache_policies", DEFAULT_CACHE_POLICIES)
+        ]
+
+    def _freshness(self, query: str) -> Tuple[float, float]:
+        """Fresh and stale windows (in seconds) for a query"""
+        for pattern, policy in self.cache_policies:
+            if pattern.search(query):
+                return policy["fresh"], policy.get("stale", 0)
+        return 0, 0
+
     async def execute(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Execute SERP search request"""
         query = input_data.get("query")
@@ -31,23 +68,74 @@ class SerperWebSearch(Plugin):
             "include_top_stories": True,
         }
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.base_url, headers=self.headers, json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_msg = f"Serper API error: {response.status}"
-                        if response.status == 401:
-                            error_msg += " (Invalid API key)"
-                        self.logger.error(error_msg)
-                        return None
-
-                    return await response.json()
-
-        except Exception as e:
-            self.logger.error(f"Error fetching search results: {str(e)}")
-            return None
+        key = (normalize_query(query), payload["num"])
+        if self.cache is None:
+            return await self._coalesced(key, payload)
+
+        fresh, stale = self._freshness(query.strip())
+        if not fresh and not stale:
+            return await self._coalesced(key, payload)
+        result, state = await self.cache.get(
+            json.dumps(key), lambda: self._coalesced(key, payload), fresh, stale
+        )
+        if result is not None and state != "miss":
+            self.logger.debug(f"Serving {state} SERP for: {query}")
+            result = {**result, "credits": 0}  # Nothing was spent on this call
+        return result
+
+    async def _coalesced(self, key: Tuple, payload: Dict[str, Any]):
+        """Search, sharing the call with identical in-flight searches"""
+        if not self.config.get("coalesce", True):
+            return await self._search(payload)
+        # The transport is shared, so separate workers coalesce too
+        return await self.transport.coalesce(
+            ("search", *key), lambda: self._search(payload)
+        )
+
+    async def _search(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Send a single search request to the Serper API
+
+        A key that is rejected or rate limited is retried once with each of
+        the other keys in the pool.
+        """
+        await check_budget()
+        for attempt in range(len(self.keys)):
+            try:
+                key = await self.keys.acquire()
+            except KeyPoolExhaustedError as e:
+                self.logger.error(str(e))
+                return None
+            headers = {**self.headers, "X-API-KEY": key.value}
+            try:
+                response = await self.transport.request(
+                    "POST", self.base_url, headers=headers, json=payload
+                )
+                self.keys.report(key, response.status, response.headers)
+                if response.status != 200:
+                    error_msg = f"Serper API error: {response.status}"
+                    if response.status == 401:
+                        error_msg += " (Invalid API key)"
+                    self.logger.error(error_msg)
+                    last_attempt = attempt == len(self.keys) - 1
+                    if response.status in KEY_ERRORS and not last_attempt:
+                        continue
+                    return None
+
+                result = await response.json()
+                credits = result.get("credits", 1)
+                await record_call(
+                    "serper",
+                    latency=response.latency,
+                    cost=credits * CALL_COSTS["serper"],
+                    kind="search",
+                )
+                return result
+
+            except Exception as e:
+                self.keys.report(key, None)
+                self.logger.error(f"Error fetching search results: {str(e)}")
+                return None
+        return None
 
 
 async def test_search(query: str = "best marketing automation tools 2024"):
@@ -1,6 +1,7 @@
 import time
 from typing import Dict, Any, Optional
 from pynions.core import Plugin
+from pynions.core.ledger import get_ledger
 
 
 class StatsPlugin(Plugin):
@@ -61,6 +62,10 @@ class StatsPlugin(Plugin):
         """Return collected stats"""
         return self.stats.copy()
 
+    def get_ledger_stats(self, period: Optional[str] = "run") -> Dict[str, Any]:
+        """Totals of every recorded call for this run, today or a workflow"""
+        return get_ledger().totals(period)
+
     def get_model_stats(self, model_name: str = None) -> Dict:
         """Get stats for a specific model"""
         if model_name is None:
@@ -0,0 +1,72 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List
+from pynions.core.tokens import TokenCounter, estimate_tokens, tokenizer_family
+
+DEFAULT_MODELS = ["gpt-4o-mini", "gpt-4", "anthropic/claude-3-5-sonnet-20240620"]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark(texts: List[str], model: str) -> Dict[str, float]:
+    """Compare the character estimate with exact counts, for accuracy and speed"""
+    counter = TokenCounter(tokenizer_family(model))
+    _, load = _timed(counter.count, "warm up")
+    estimates, estimate_time = _timed(lambda: [estimate_tokens(t) for t in texts])
+    exact, single_time = _timed(lambda: [counter.count(t) for t in texts])
+    counter = TokenCounter(counter.family)
+    counter.count("warm up")
+    _, batch_time = _timed(counter.count_many, texts)
+    _, cached_time = _timed(counter.count_many, texts)
+
+    errors = [abs(e - x) / x for e, x in zip(estimates, exact) if x]
+    return {
+        "exact": counter.exact,
+        "tokens": sum(exact),
+        "estimate_error": sum(errors) / len(errors) if errors else 0.0,
+        "load": load,
+        "estimate": estimate_time,
+        "single": single_time,
+        "batch": batch_time,
+        "cached": cached_time,
+    }
+
+
+def load_texts(paths: List[str]) -> List[str]:
+    """Paragraphs from the given files, or from saved articles by default"""
+    files = [Path(p) for p in paths] or sorted(Path("data/articles").rglob("*.md"))
+    texts = []
+    for path in files:
+        texts.extend(p for p in path.read_text().split("\n\n") if p.strip())
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark token estimates against exact tokenizer counts"
+    )
+    parser.add_argument("files", nargs="*", help="Text or markdown files to count")
+    parser.add_argument("--model", action="append", help="Model(s) to count for")
+    args = parser.parse_args()
+
+    texts = load_texts(args.files)
+    if not texts:
+        parser.error("No texts found; pass files or generate an article first")
+    print(f"📄 {len(texts)} texts, {sum(len(t) for t in texts)} characters")
+    for model in args.model or DEFAULT_MODELS:
+        result = benchmark(texts, model)
+        print(f"\n📊 {model} ({'exact' if result['exact'] else 'estimated'})")
+        print(f"   {result['tokens']} tokens")
+        print(f"   estimate off by {result['estimate_error']:.1%} on average")
+        print(f"   tokenizer load {result['load'] * 1000:.0f}ms")
+        for name in ("estimate", "single", "batch", "cached"):
+            print(f"   {name:<9}{result[name] * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
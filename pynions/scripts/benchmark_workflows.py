@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from pynions.core.cassette import use_cassette
+
+# Make the top-level workflows package importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+async def run_research(keyword: str):
+    from workflows.research_workflow import research_workflow
+
+    return await research_workflow(keyword)
+
+
+async def run_what_is(topic: str):
+    from pynions.workflows.what_is_workflow import WhatIsWorkflow
+
+    return await WhatIsWorkflow().execute(
+        {"topic": topic, "audience": "marketing professionals"}
+    )
+
+
+WORKFLOWS = {
+    "research": run_research,
+    "what_is": run_what_is,
+}
+
+
+async def benchmark(workflow: str, argument: str, runs: int) -> list:
+    """Run a workflow several times and return the wall-clock durations"""
+    durations = []
+    for run in range(runs):
+        start = time.perf_counter()
+        await WORKFLOWS[workflow](argument)
+        durations.append(time.perf_counter() - start)
+        print(f"⏱️  Run {run + 1}/{runs}: {durations[-1]:.2f}s")
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark workflows against a recorded cassette"
+    )
+    parser.add_argument("workflow", choices=sorted(WORKFLOWS))
+    parser.add_argument("argument", help="Keyword or topic passed to the workflow")
+    parser.add_argument("--cassette", required=True, help="Path to the cassette file")
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument(
+        "--latency",
+        action="store_true",
+        help="Replay the original response latencies",
+    )
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    with use_cassette(args.cassette, mode=args.mode, replay_latency=args.latency):
+        # Recording more than once would append duplicate interactions
+        runs = 1 if args.mode == "record" else args.runs
+        durations = asyncio.run(benchmark(args.workflow, args.argument, runs))
+
+    print(f"\n📊 {args.workflow} ({args.mode}): best {min(durations):.2f}s")
+    print(f"   mean {sum(durations) / len(durations):.2f}s over {len(durations)} runs")
+
+
+if __name__ == "__main__":
+    main()
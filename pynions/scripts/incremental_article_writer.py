@@ -1,13 +1,32 @@
 import asyncio
+import glob
 import json
 import os
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pynions.plugins.perplexity import PerplexityAPI
 
+SECTIONS = [
+    "definition",
+    "methodology",
+    "types",
+    "benefits",
+    "challenges",
+    "best_practices",
+    "trends",
+    "qa",
+]
+# Sections researched ahead of the one being written; 0 runs strictly in turn
+DEFAULT_RESEARCH_AHEAD = 2
+
 
 class IncrementalArticleWriter:
-    """Builds articles incrementally by researching and writing one section at a time"""
+    """Builds articles incrementally by researching and writing one section at a time
+
+    Research for the next sections runs while the current one is written,
+    and progress is saved after every section so an interrupted run can
+    pick up where it stopped.
+    """
 
     def __init__(self):
         self.perplexity = PerplexityAPI(
@@ -91,9 +110,7 @@ Requirements:
     def initialize_article(self, topic: str, audience: str) -> str:
         """Create the initial article file with title"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = (
-            f"data/articles/markdown/{topic.lower().replace(' ', '_')}_{timestamp}.md"
-        )
+        filename = f"data/articles/markdown/{_slug(topic)}_{timestamp}.md"
         os.makedirs(os.path.dirname(filename), exist_ok=True)
 
         title = f"# What Is {topic}: A Comprehensive Guide for {audience}\n\n"
@@ -107,31 +124,81 @@ Requirements:
         with open(filename, "a") as f:
             f.write(content + "\n\n")
 
-    async def generate_article(self, topic: str, audience: str = "professionals"):
-        """Generate a complete article section by section"""
+    def save_progress(
+        self, filename: str, topic: str, audience: str, completed: List[str]
+    ):
+        """Record the finished sections and how much of the file they fill"""
+        progress = {
+            "topic": topic,
+            "audience": audience,
+            "completed": completed,
+            "size": os.path.getsize(filename),
+        }
+        tmp = f"{filename}.progress.tmp"
+        with open(tmp, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp, f"{filename}.progress.json")
+
+    def find_unfinished(
+        self, topic: str, audience: str
+    ) -> Tuple[Optional[str], List[str]]:
+        """Latest interrupted article for this topic and its finished sections
+
+        The file is cut back to the end of the last finished section, so a
+        section that was being appended when the run stopped is written again.
+        """
+        pattern = f"data/articles/markdown/{_slug(topic)}_*.md.progress.json"
+        for path in sorted(glob.glob(pattern), reverse=True):
+            with open(path) as f:
+                progress = json.load(f)
+            filename = path[: -len(".progress.json")]
+            if (progress["topic"], progress["audience"]) != (topic, audience):
+                continue
+            if not os.path.exists(filename):
+                continue
+            with open(filename, "r+") as f:
+                f.truncate(progress["size"])
+            return filename, progress["completed"]
+        return None, []
+
+    async def generate_article(
+        self,
+        topic: str,
+        audience: str = "professionals",
+        research_ahead: int = DEFAULT_RESEARCH_AHEAD,
+        resume: bool = True,
+    ):
+        """Generate a complete article section by section
+
+        Sections are written and appended in order, while research for up
+        to research_ahead following sections runs in the background. With
+        resume, an interrupted article on the same topic is continued from
+        its last finished section.
+        """
+        research: Dict[str, asyncio.Future] = {}
         try:
-            # Initialize article file
-            article_file = self.initialize_article(topic, audience)
-            print(f"\n📄 Created article file: {article_file}")
-
-            # Define sections to generate
-            sections = [
-                "definition",
-                "methodology",
-                "types",
-                "benefits",
-                "challenges",
-                "best_practices",
-                "trends",
-                "qa",
-            ]
-
-            # Generate each section
-            for section in sections:
-                print(f"\n📝 Working on {section.upper()} section...")
+            article_file, completed = (
+                self.find_unfinished(topic, audience) if resume else (None, [])
+            )
+            if article_file:
+                print(f"\n📄 Resuming {article_file} after {len(completed)} sections")
+            else:
+                # Initialize article file
+                article_file = self.initialize_article(topic, audience)
+                print(f"\n📄 Created article file: {article_file}")
+                self.save_progress(article_file, topic, audience, completed)
+
+            pending = [section for section in SECTIONS if section not in completed]
+            for i, section in enumerate(pending):
+                # Keep research running for this and the next sections
+                for upcoming in pending[i : i + research_ahead + 1]:
+                    if upcoming not in research:
+                        research[upcoming] = asyncio.ensure_future(
+                            self.research_section(topic, upcoming)
+                        )
 
-                # Research the section
-                research_data = await self.research_section(topic, section)
+                print(f"\n📝 Working on {section.upper()} section...")
+                research_data = await research.pop(section)
 
                 # Write the section using research
                 section_content = await self.write_section(
@@ -140,8 +207,11 @@ Requirements:
 
                 # Append to article
                 self.append_section(article_file, section_content)
+                completed.append(section)
+                self.save_progress(article_file, topic, audience, completed)
                 print(f"✅ Completed {section} section")
 
+            os.remove(f"{article_file}.progress.json")
             print(f"\n🎉 Article generation complete!")
             print(f"📄 Article saved to: {article_file}")
             return article_file
@@ -149,6 +219,14 @@ Requirements:
         except Exception as e:
             print(f"\n❌ Error: {str(e)}")
             return None
+        finally:
+            for task in research.values():
+                task.cancel()
+            await asyncio.gather(*research.values(), return_exceptions=True)
+
+
+def _slug(topic: str) -> str:
+    return topic.lower().replace(" ", "_")
 
 
 async def main():
@@ -1,11 +1,28 @@
 import asyncio
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pynions import Worker
+from pynions.core.jsonstream import parse_stream
+from pynions.core.packing import RequestPacker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.litellm_plugin import LiteLLM
 from pynions.workers.alternatives_search_worker import AlternativesSearchWorker
 
+INSTRUCTIONS = """Based on the search results given with a brand, identify the most mentioned alternatives to that brand, up to the number of alternatives asked for.
+
+Instructions:
+1. Only include domains that are actual alternatives to the brand
+2. Verify each domain is mentioned in the search results
+3. Return only domain names (e.g., klaviyo.com)
+4. Do not include the brand itself in the results"""
+
+PROMPT = PromptBuilder(
+    INSTRUCTIONS,
+    'Return only a JSON array of domain names, e.g. ["klaviyo.com", "mailchimp.com"].',
+)
+DOMAINS_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
 
 class AlternativesAnalysisWorker(Worker):
     """Worker for analyzing search results to extract alternative brands"""
@@ -19,6 +36,38 @@ class AlternativesAnalysisWorker(Worker):
             }
         )
 
+    @staticmethod
+    def _item(brand: str, number_of_items: int, search_results: Any) -> str:
+        return (
+            f"Brand: {brand}\n"
+            f"Number of alternatives: {number_of_items}\n"
+            f"Search results:\n{search_results}"
+        )
+
+    async def _find_alternatives(self, item: str) -> List[str]:
+        """Domains named as alternatives in one brand's search results"""
+        domains, _ = await parse_stream(
+            lambda: self.llm.stream({"messages": PROMPT.build(item)}),
+            DOMAINS_SCHEMA,
+        )
+        return domains
+
+    def _result(self, brand: str, domains: List[str]) -> Optional[Dict[str, Any]]:
+        alternatives = [
+            domain.strip()
+            for domain in domains
+            if domain.strip() and "." in domain  # Basic domain validation
+        ]
+        if not alternatives:
+            print(f"⚠️ No valid alternatives found for {brand}")
+            return None
+        print(f"✅ Extracted {len(alternatives)} alternatives for {brand}")
+        return {
+            "brand": brand,
+            "alternatives": alternatives,
+            "timestamp": datetime.now().isoformat(),
+        }
+
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze search results to extract alternative brands
@@ -30,58 +79,65 @@ class AlternativesAnalysisWorker(Worker):
                 - search_results: dict - Raw search results from SerperWebSearch
         """
         brand = input_data["brand"]
-        number_of_items = input_data.get("number_of_items", 5)
-        search_results = input_data["search_results"]
-
         print("\n🤖 Analyzing search results...")
 
         try:
-            alternatives_prompt = f"""
-            Based on the search results, identify the top {number_of_items} most mentioned alternatives to {brand}.
-            Return only the domain names (e.g., klaviyo.com) in a comma-separated list.
-            
-            Instructions:
-            1. Only include domains that are actual alternatives to {brand}
-            2. Verify each domain is mentioned in the search results
-            3. Return in format: domain1.com, domain2.com, domain3.com
-            4. Do not include {brand} in the results
-            """
-
-            response = await self.llm.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": alternatives_prompt
-                            + "\n\nSearch results:\n"
-                            + str(search_results),
-                        }
-                    ]
-                }
+            domains = await self._find_alternatives(
+                self._item(
+                    brand,
+                    input_data.get("number_of_items", 5),
+                    input_data["search_results"],
+                )
             )
-
-            alternatives = [
-                domain.strip()
-                for domain in response["content"].split(",")
-                if domain.strip() and "." in domain  # Basic domain validation
-            ]
-
-            if not alternatives:
-                print("⚠️ No valid alternatives found in LLM response")
-                return None
-
-            print(f"✅ Extracted {len(alternatives)} alternatives")
-
-            return {
-                "brand": brand,
-                "alternatives": alternatives,
-                "timestamp": datetime.now().isoformat(),
-            }
+            return self._result(brand, domains)
 
         except Exception as e:
             print(f"❌ Analysis error: {str(e)}")
             return None
 
+    async def execute_many(
+        self, inputs: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Analyze many brands, packing several into each LLM call
+
+        Takes a list of execute() inputs and returns their results in order.
+        A brand whose packed answer is missing or malformed is analyzed on
+        its own.
+        """
+        packer = RequestPacker(
+            lambda messages, max_tokens: self.llm.stream(
+                {"messages": messages, "max_tokens": max_tokens}
+            ),
+            INSTRUCTIONS,
+            self._find_alternatives,
+            item_schema=DOMAINS_SCHEMA,
+            answer_format="a JSON array of domain names",
+            answer_tokens=100,
+        )
+        print(f"\n🤖 Analyzing search results for {len(inputs)} brands...")
+        answers = await asyncio.gather(
+            *(
+                packer.submit(
+                    self._item(
+                        data["brand"],
+                        data.get("number_of_items", 5),
+                        data["search_results"],
+                    )
+                )
+                for data in inputs
+            ),
+            return_exceptions=True,
+        )
+
+        results = []
+        for data, answer in zip(inputs, answers):
+            if isinstance(answer, Exception):
+                print(f"❌ Analysis error for {data['brand']}: {str(answer)}")
+                results.append(None)
+            else:
+                results.append(self._result(data["brand"], answer))
+        return results
+
 
 # Test
 if __name__ == "__main__":
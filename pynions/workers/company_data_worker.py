@@ -1,8 +1,12 @@
 import asyncio
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pynions import Worker
+from pynions.core.budget import TRUNCATION_MARKER, TokenBudget
+from pynions.core.health import get_url_health
+from pynions.core.jsonstream import JSONStreamError, parse_stream
+from pynions.core.tokens import CHARS_PER_TOKEN
 from pynions.plugins.serper import SerperWebSearch
 from pynions.plugins.jina import JinaAIReader
 from pynions.plugins.litellm_plugin import LiteLLM
@@ -11,9 +15,22 @@ from pynions.plugins.litellm_plugin import LiteLLM
 class CompanyDataWorker(Worker):
     """Worker for extracting specific data types from company websites"""
 
-    def __init__(self):
-        self.serper = SerperWebSearch({"max_results": 5})
-        self.jina = JinaAIReader()
+    def __init__(self, worker_config: Optional[Dict[str, Any]] = None):
+        super().__init__(worker_config)
+        # Keep memory and prompt size bounded on bulk runs
+        self.max_page_chars = self.config.get("max_page_chars", 20000)
+        self.max_total_chars = self.config.get("max_total_chars", 60000)
+        # Fetch spare SERP results so known-bad pages can be swapped for alternates
+        self.max_sources = self.config.get("max_sources", 5)
+        self.max_candidates = self.config.get("max_candidates", 8)
+        # "single" sends all pages in one call; "map_reduce" extracts each
+        # page in its own concurrent call and merges the results
+        self.mode = self.config.get("mode", "single")
+        if self.mode not in ("single", "map_reduce"):
+            raise ValueError(f"Invalid mode: {self.mode}")
+
+        self.serper = SerperWebSearch({"max_results": self.max_candidates})
+        self.jina = JinaAIReader({"max_chars": self.max_page_chars})
         self.llm = LiteLLM(
             {
                 "model": "gpt-4o-mini",
@@ -22,6 +39,106 @@ class CompanyDataWorker(Worker):
             }
         )
 
+    async def _extract(self, url: str) -> Optional[Dict[str, Any]]:
+        """Extract one page, returning None when nothing usable came back"""
+        try:
+            content = await self.jina.execute({"url": url})
+            if content and content.get("content"):
+                return content
+            print(f"   ⚠️ No content extracted: {url}")
+        except Exception as e:
+            print(f"   ❌ Error extracting {url}: {str(e)}")
+        return None
+
+    async def _complete_json(self, messages: List[Dict[str, str]]) -> Optional[Any]:
+        """Stream a JSON object answer, or None if no attempt produced one
+
+        The answer is checked as it streams, so a malformed one is abandoned
+        and retried without waiting for the rest of it. Rate limits and
+        overloads are retried with the LLM's backoff.
+        """
+        try:
+            data, _ = await self.llm.retry(
+                lambda: parse_stream(
+                    lambda: self.llm.stream({"messages": messages}),
+                    {"type": "object"},
+                )
+            )
+            return data
+        except JSONStreamError as e:
+            print(f"❌ Error parsing LLM response: {str(e)}")
+            print(f"Raw response: {e.text}")
+            return None
+
+    async def _extract_page(
+        self, data_type: str, system_prompt: str, source: Dict[str, Any]
+    ) -> Optional[Any]:
+        """Map step: extract data from a single page"""
+        try:
+            return await self._complete_json(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {
+                        "role": "user",
+                        "content": f"Extract {data_type} information from "
+                        f"this page ({source['url']}):\n\n{source['content']}",
+                    },
+                ]
+            )
+        except Exception as e:
+            print(f"   ❌ Error analyzing {source['url']}: {str(e)}")
+            return None
+
+    async def _map_reduce(
+        self,
+        domain: str,
+        data_type: str,
+        system_prompt: str,
+        sources: List[Dict[str, Any]],
+    ) -> Any:
+        """Extract each page concurrently, then merge the results in one call
+
+        The merge only sees the small structured results, so its cost does
+        not grow with page size.
+        """
+        print(
+            f"\n🤖 Analyzing {data_type} content of {len(sources)} pages in parallel..."
+        )
+        results = await asyncio.gather(
+            *(self._extract_page(data_type, system_prompt, s) for s in sources)
+        )
+        extracted = []
+        for source, data in zip(sources, results):
+            if data:
+                source["extracted"] = data
+                extracted.append({"url": source["url"], "data": data})
+
+        if not extracted:
+            return {"error": "Failed to parse LLM response"}
+        if len(extracted) == 1:
+            return extracted[0]["data"]
+
+        print(f"🤖 Merging {len(extracted)} page results...")
+        merged = await self._complete_json(
+            [
+                {
+                    "role": "system",
+                    "content": f"""You merge {data_type} data extracted separately from pages of {domain}.
+Instructions:
+1. Combine the JSON objects into ONE object with the same structure
+2. Merge lists and remove duplicates
+3. Keep exact text and values; do not add information
+4. When pages disagree, prefer the more specific or more complete value
+
+IMPORTANT: Respond ONLY with a valid JSON object.""",
+                },
+                {"role": "user", "content": json.dumps(extracted, indent=1)},
+            ]
+        )
+        if merged is None:
+            return {"error": "Failed to merge page results"}
+        return merged
+
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Extract specific data from a company website
@@ -59,36 +176,32 @@ class CompanyDataWorker(Worker):
             # Extract content from each result
             verified_data = []
             total_chars = 0
+            bytes_saved = 0
 
-            for idx, result in enumerate(results["organic"], 1):
-                url = result["link"]
-                print(f"   Processing {idx}/5: {url}")
-
-                try:
-                    content = await self.jina.execute({"url": url})
-                    if content and content.get("content"):
-                        content_length = len(content["content"])
-                        total_chars += content_length
-                        print(f"   ✅ Content extracted: {content_length} characters")
-                        verified_data.append(
-                            {
-                                "url": url,
-                                "content": content["content"],
-                                "title": result.get("title", ""),
-                                "snippet": result.get("snippet", ""),
-                                "length": content_length,
-                            }
-                        )
-                    else:
-                        print("   ⚠️ No content extracted")
-                except Exception as e:
-                    print(f"   ❌ Error extracting content: {str(e)}")
-                    continue
-
-            # Combine all content for LLM analysis
-            combined_content = "\n\n".join(
-                [source["content"] for source in verified_data]
+            candidates = await get_url_health().arank(
+                results["organic"], key=lambda r: r["link"]
             )
+            skipped = len(results["organic"]) - len(candidates)
+            if skipped:
+                print(f"   ⏭️ Skipping {skipped} known-bad URLs")
+
+            # Extract in parallel waves; failures are replaced by the next
+            # candidates until enough sources are in (JinaAIReader keeps the
+            # load on each site polite)
+            pages = []
+            pending = list(candidates)
+            while pending and len(pages) < self.max_sources:
+                wave = pending[: self.max_sources - len(pages)]
+                pending = pending[len(wave) :]
+                print(f"   Processing {len(wave)} pages in parallel")
+                contents = await asyncio.gather(
+                    *(self._extract(result["link"]) for result in wave)
+                )
+                pages += [
+                    (result, content)
+                    for result, content in zip(wave, contents)
+                    if content
+                ]
 
             # Get LLM prompt based on data type
             prompts = {
@@ -111,14 +224,7 @@ class CompanyDataWorker(Worker):
                     - Notable achievements""",
             }
 
-            # Analyze with LLM
-            print(f"\n🤖 Analyzing {data_type} content...")
-            response = await self.llm.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": f"""You are a precise data extractor. Extract {data_type} information from websites.
+            system_prompt = f"""You are a precise data extractor. Extract {data_type} information from websites.
                         Instructions:
                         1. Only include information explicitly stated in the content
                         2. Use exact text and values as shown
@@ -127,30 +233,66 @@ class CompanyDataWorker(Worker):
                         
                         {prompts[data_type]}
                         
-                        IMPORTANT: Respond ONLY with a valid JSON object.""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"Extract {data_type} information from this content:\n\n{combined_content}",
-                        },
-                    ]
+                        IMPORTANT: Respond ONLY with a valid JSON object."""
+            user_prefix = f"Extract {data_type} information from this content:\n\n"
+
+            if self.mode == "map_reduce":
+                # Each page gets its own call, so pages keep their full size
+                fitted = {
+                    result["link"]: content["content"] for result, content in pages
                 }
-            )
+            else:
+                # Share the prompt budget between pages, so a long top-ranked
+                # page cannot crowd out the others
+                budget = TokenBudget(
+                    self.llm.model,
+                    self.llm.config.get("max_tokens", 2000),
+                    limit=self.max_total_chars // CHARS_PER_TOKEN,
+                )
+                fitted = budget.allocate(
+                    {result["link"]: content["content"] for result, content in pages},
+                    budget.remaining(system_prompt, user_prefix),
+                )
+            for result, content in pages:
+                page_content = fitted[result["link"]]
+                content_length = len(page_content)
+                total_chars += content_length
+                bytes_saved += content.get("transfer", {}).get("bytes_saved", 0)
+                truncated = content.get("truncated") or page_content.endswith(
+                    TRUNCATION_MARKER
+                )
+                note = " (truncated)" if truncated else ""
+                print(f"   ✅ {result['link']}: {content_length} characters{note}")
+                verified_data.append(
+                    {
+                        "url": result["link"],
+                        "content": page_content,
+                        "title": result.get("title", ""),
+                        "snippet": result.get("snippet", ""),
+                        "length": content_length,
+                    }
+                )
 
-            # Parse LLM response and handle potential errors
-            try:
-                # Extract JSON from response - handle potential text wrapping
-                response_text = response["content"].strip()
-                if response_text.startswith("```json"):
-                    response_text = response_text.split("```json")[1]
-                if response_text.endswith("```"):
-                    response_text = response_text.rsplit("```", 1)[0]
-
-                analyzed_data = json.loads(response_text.strip())
-            except json.JSONDecodeError as e:
-                print(f"❌ Error parsing LLM response: {str(e)}")
-                print(f"Raw response: {response['content']}")
-                analyzed_data = {"error": "Failed to parse LLM response"}
+            if self.mode == "map_reduce":
+                analyzed_data = await self._map_reduce(
+                    domain, data_type, system_prompt, verified_data
+                )
+            else:
+                # Combine all content for LLM analysis
+                combined_content = "\n\n".join(
+                    [source["content"] for source in verified_data]
+                )
+
+                # Analyze with LLM
+                print(f"\n🤖 Analyzing {data_type} content...")
+                analyzed_data = await self._complete_json(
+                    [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": f"{user_prefix}{combined_content}"},
+                    ]
+                )
+                if analyzed_data is None:
+                    analyzed_data = {"error": "Failed to parse LLM response"}
 
             # Update response data
             response_data = {
@@ -158,6 +300,7 @@ class CompanyDataWorker(Worker):
                 "data_type": data_type,
                 "sources": verified_data,
                 "total_chars": total_chars,
+                "bytes_saved": bytes_saved,
                 "analyzed_data": analyzed_data,
                 "credits_used": results.get("credits", 0),
                 "timestamp": datetime.now().isoformat(),
@@ -4,8 +4,29 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a company research expert. When analyzing companies:
+1. Prioritize CURRENT information over historical data
+2. Verify leadership information from the most recent sources
+3. Note any acquisitions or ownership changes
+4. Check for recent press releases about leadership changes
+5. Cross-reference information across multiple sources
+6. Indicate when information might be outdated""",
+    """Research current company information for the company given below. Focus on:
+
+1. Current ownership status (independent/acquired/public)
+2. Current leadership team (CEO, key executives)
+3. Company history and major milestones
+4. Recent developments (last 12 months)
+5. Mission and values
+6. Notable achievements and metrics
+
+Prioritize official sources (company website, press releases) and recent news. If you find conflicting information about leadership or ownership, note this and provide dates for the information.""",
+)
+
 
 class PerplexityAboutWorker(Worker):
     """Worker for extracting company information from a website using Perplexity AI"""
@@ -44,33 +65,7 @@ class PerplexityAboutWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a company research expert. When analyzing companies:
-1. Prioritize CURRENT information over historical data
-2. Verify leadership information from the most recent sources
-3. Note any acquisitions or ownership changes
-4. Check for recent press releases about leadership changes
-5. Cross-reference information across multiple sources
-6. Indicate when information might be outdated""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Research current company information for {domain}. Focus on:
-
-1. Current ownership status (independent/acquired/public)
-2. Current leadership team (CEO, key executives)
-3. Company history and major milestones
-4. Recent developments (last 12 months)
-5. Mission and values
-6. Notable achievements and metrics
-
-Prioritize official sources (company website, press releases) and recent news. If you find conflicting information about leadership or ownership, note this and provide dates for the information.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Company: {domain}")}
             )
 
             if response:
@@ -2,60 +2,21 @@ import asyncio
 import json
 import os
 import logging
+import re
+import time
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pynions.core import Worker
+from pynions.core.budget import TokenBudget
+from pynions.core.jsonstream import JSONStreamError, parse_stream
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.litellm_plugin import LiteLLM
 
-
-class PerplexityArticleWriterWorker(Worker):
-    """Worker for generating articles using Claude 3.5 Sonnet"""
-
-    def __init__(self, worker_config: Optional[Dict[str, Any]] = None):
-        """Initialize the article writer worker"""
-        super().__init__(worker_config)
-        self.logger = logging.getLogger("pynions.workers.article_writer")
-
-        # Initialize LiteLLM plugin with Claude 3.5 Sonnet and maximized settings
-        self.llm = LiteLLM(
-            {
-                "model": "anthropic/claude-3-5-sonnet-20240620",
-                "temperature": 0.7,  # Good balance for creative yet focused writing
-                "max_tokens": 8192,  # Maximized for comprehensive articles
-                "max_completion_tokens": 8192,
-                "stream": True,  # Enable streaming for large outputs
-                "timeout": 600,  # 10-minute timeout for long articles
-            }
-        )
-
-        self.logger.info(
-            "Initialized ArticleWriter with Claude 3.5 Sonnet (maximized settings)"
-        )
-
-    def _create_article_prompt(
-        self, topic: str, audience: str, research_data: Dict
-    ) -> str:
-        """Create a comprehensive prompt for article generation"""
-
-        # Extract and format all citations for easy reference
-        all_citations = {}
-        for section_name, section_data in research_data["sections"].items():
-            citations = section_data.get("citations", [])
-            for url in citations:
-                domain = url.split("//")[-1].split("/")[0]
-                # Create a more descriptive key based on the domain and section
-                key = f"{domain}_{section_name}"
-                all_citations[key] = url
-
-        # Format citations as inline markdown links
-        formatted_citations = "\n".join(
-            [f"- [{k}]({v})" for k, v in all_citations.items()]
-        )
-
-        return f"""Write a comprehensive, publication-ready article about {topic} for {audience}. This should be a substantial piece (2000-3000 words) that thoroughly explores the topic and provides actionable insights.
+ARTICLE_PROMPT = PromptBuilder(
+    """Write a comprehensive, publication-ready article about the topic below for the audience below. This should be a substantial piece (2000-3000 words) that thoroughly explores the topic and provides actionable insights.
 
 Key Requirements:
-1. Write in a clear, authoritative tone for {audience}
+1. Write in a clear, authoritative tone for the audience
 2. Use proper markdown formatting
 3. Use inline markdown links (format: [descriptive text](url))
 4. Focus on actionable insights
@@ -82,25 +43,12 @@ Writing Style:
 9. Keep sentences concise
 10. Vary paragraph length (but keep them short)
 
-Available Citations (Use as inline links):
-{formatted_citations}
-
-Research Data to Incorporate:
-Definition: {research_data['sections']['definition']['choices'][0]['message']['content']}
-Methodology: {research_data['sections']['methodology']['choices'][0]['message']['content']}
-Types: {research_data['sections']['types']['choices'][0]['message']['content']}
-Benefits: {research_data['sections']['benefits']['choices'][0]['message']['content']}
-Challenges: {research_data['sections']['challenges']['choices'][0]['message']['content']}
-Best Practices: {research_data['sections']['best_practices']['choices'][0]['message']['content']}
-Trends: {research_data['sections']['trends']['choices'][0]['message']['content']}
-Q&A: {research_data['sections']['qa']['choices'][0]['message']['content']}
-
 Article Structure:
-# What Is {topic}: A Comprehensive Guide for {audience}
+# What Is [Topic]: A Comprehensive Guide for [Audience]
 
 [Introduction - 250-300 words]
 - Clear definition and importance
-- Market context and relevance for {audience}
+- Market context and relevance for the audience
 - Overview of key benefits
 - Article roadmap
 
@@ -161,7 +109,183 @@ Writing Guidelines:
 7. Maintain professional tone
 8. Focus on actionability
 9. Add comparison tables
-10. Include specific implementation steps
+10. Include specific implementation steps"""
+)
+
+# Research sections in prompt order, with their labels
+RESEARCH_SECTIONS = {
+    "definition": "Definition",
+    "methodology": "Methodology",
+    "types": "Types",
+    "benefits": "Benefits",
+    "challenges": "Challenges",
+    "best_practices": "Best Practices",
+    "trends": "Trends",
+    "qa": "Q&A",
+}
+
+
+# Sections written concurrently in "sectioned" mode, in article order: the
+# target word count and the research each one draws on. The introduction
+# and conclusion get no heading of their own.
+ARTICLE_SECTIONS = {
+    "Introduction": (300, ["definition"]),
+    "Core Principles": (500, ["definition", "methodology"]),
+    "Key Features & Capabilities": (500, ["types"]),
+    "Benefits & ROI": (500, ["benefits"]),
+    "Implementation Guide": (500, ["methodology", "best_practices", "challenges"]),
+    "Advanced Strategies": (400, ["best_practices", "qa"]),
+    "Future Developments": (300, ["trends"]),
+    "Getting Started": (300, ["best_practices", "qa"]),
+    "Conclusion": (200, []),
+}
+UNTITLED_SECTIONS = {"Introduction"}
+OUTLINE_MAX_TOKENS = 1000
+SECTION_PROMPT_TOKENS = 8000  # Research allowance per section call
+WORDS_PER_TOKEN = 0.75
+
+OUTLINE_PROMPT = PromptBuilder(
+    f"""Plan an article about the topic below for the audience below. The article has these sections, in this order:
+{chr(10).join(f"- {name}" for name in ARTICLE_SECTIONS)}
+
+Return only a JSON object:
+{{"title": "What Is <Topic>: A Comprehensive Guide for <Audience>", "sections": {{"<section name>": ["key point", "..."]}}}}
+
+Give every section 2-4 key points of at most 15 words each. Points must not repeat across sections, so each section can be written on its own without overlapping the others."""
+)
+
+OUTLINE_SCHEMA = {
+    "type": "object",
+    "required": ["title", "sections"],
+    "properties": {
+        "title": {"type": "string"},
+        "sections": {
+            "type": "object",
+            "additionalProperties": {"type": "array", "items": {"type": "string"}},
+        },
+    },
+}
+
+SECTION_PROMPT = PromptBuilder(
+    """You are writing one section of a longer, publication-ready article. Other writers are writing the other sections at the same time from the same outline, so cover only the key points of your section.
+
+Requirements:
+1. Write in a clear, authoritative tone for the audience
+2. Use proper markdown, but do not repeat the section heading; use ### for any subheadings
+3. Use inline markdown links (format: [descriptive text](url)); NO numbered citations
+4. Keep paragraphs short (2-3 sentences maximum) with blank lines between them
+5. Use bullet points for lists longer than 3 items and bold key terms
+6. Include real-world examples, data and comparison tables where relevant
+7. Use active voice and concise sentences
+8. NO meta-commentary, thinking-out-loud or notes about the article
+9. Do not introduce or summarize the whole article unless you are writing the Introduction or the Conclusion
+10. Stay close to the requested length"""
+)
+
+
+class PerplexityArticleWriterWorker(Worker):
+    """Worker for generating articles using Claude 3.5 Sonnet"""
+
+    def __init__(self, worker_config: Optional[Dict[str, Any]] = None):
+        """Initialize the article writer worker"""
+        super().__init__(worker_config)
+        self.logger = logging.getLogger("pynions.workers.article_writer")
+        # "single" writes the article in one call; "sectioned" plans an
+        # outline, then writes all sections concurrently and joins them
+        self.mode = self.config.get("mode", "single")
+        if self.mode not in ("single", "sectioned"):
+            raise ValueError(f"Invalid mode: {self.mode}")
+
+        # Initialize LiteLLM plugin with Claude 3.5 Sonnet and maximized settings
+        self.llm = LiteLLM(
+            {
+                "model": "anthropic/claude-3-5-sonnet-20240620",
+                "temperature": 0.7,  # Good balance for creative yet focused writing
+                "max_tokens": 8192,  # Maximized for comprehensive articles
+                "max_completion_tokens": 8192,
+                "stream": True,  # Enable streaming for large outputs
+                "timeout": 600,  # 10-minute timeout for long articles
+            }
+        )
+
+        # Prompt allowance: the model's window minus room for the article
+        self.budget = TokenBudget(self.llm.model, self.llm.config["max_tokens"])
+
+        self.logger.info(
+            "Initialized ArticleWriter with Claude 3.5 Sonnet (maximized settings)"
+        )
+
+    def _create_article_prompt(
+        self, topic: str, audience: str, research_data: Dict
+    ) -> List[Dict[str, Any]]:
+        """Create the messages for article generation
+
+        The writing instructions are the same for every article and come
+        first, so the provider can serve them from its prompt cache; the
+        topic, citations and research follow.
+        """
+
+        # Extract and format all citations for easy reference; sections often
+        # cite the same pages, so each URL is listed once
+        all_citations = {}
+        for section_name, section_data in research_data["sections"].items():
+            citations = section_data.get("citations", [])
+            for url in citations:
+                domain = url.split("//")[-1].split("/")[0]
+                # Create a more descriptive key based on the domain and section
+                all_citations.setdefault(url, f"{domain}_{section_name}")
+
+        # Format citations as inline markdown links
+        formatted_citations = "\n".join(
+            [f"- [{k}]({v})" for v, k in all_citations.items()]
+        )
+
+        # Share what is left of the context window (after the instructions,
+        # citations and room for the article) between the research sections.
+        # The research models' reasoning is dropped; only answers are needed
+        research = {
+            name: re.sub(
+                r"<think>.*?</think>",
+                "",
+                research_data["sections"][name]["choices"][0]["message"]["content"],
+                flags=re.DOTALL,
+            )
+            for name in RESEARCH_SECTIONS
+        }
+        empty = {name: "" for name in RESEARCH_SECTIONS}
+        research = self.budget.allocate(
+            research,
+            self.budget.remaining(
+                ARTICLE_PROMPT.prefix,
+                self._render_article_prompt(
+                    topic, audience, formatted_citations, empty
+                ),
+            ),
+        )
+        return ARTICLE_PROMPT.build(
+            self._render_article_prompt(topic, audience, formatted_citations, research),
+            cache_control=self.llm.provider == "anthropic",
+        )
+
+    def _render_article_prompt(
+        self,
+        topic: str,
+        audience: str,
+        formatted_citations: str,
+        research: Dict[str, str],
+    ) -> str:
+        """Per-article part of the prompt, sent after the shared instructions"""
+        research_block = "\n".join(
+            f"{label}: {research[name]}" for name, label in RESEARCH_SECTIONS.items()
+        )
+        return f"""Topic: {topic}
+Audience: {audience}
+
+Available Citations (Use as inline links):
+{formatted_citations}
+
+Research Data to Incorporate:
+{research_block}
 
 Please write the complete article now, following this structure and incorporating all research data provided."""
 
@@ -174,39 +298,207 @@ Please write the complete article now, following this structure and incorporatin
             formatted_citations.append(f"[{domain}]({url})")
         return ", ".join(formatted_citations)
 
+    def _section_research(
+        self, names: List[str], research_data: Dict
+    ) -> Tuple[Dict[str, str], List[str]]:
+        """Research answers (reasoning removed) and citations for some sections"""
+        research, citations = {}, []
+        for name in names:
+            section_data = research_data["sections"].get(name)
+            if not section_data:
+                continue
+            research[name] = re.sub(
+                r"<think>.*?</think>",
+                "",
+                section_data["choices"][0]["message"]["content"],
+                flags=re.DOTALL,
+            )
+            citations.extend(
+                url for url in section_data.get("citations", []) if url not in citations
+            )
+        return research, citations
+
+    def _create_outline_prompt(
+        self, topic: str, audience: str, research_data: Dict
+    ) -> List[Dict[str, Any]]:
+        """Messages for the outline call, which only sees the definition"""
+        research, _ = self._section_research(["definition"], research_data)
+        budget = TokenBudget(self.llm.model, OUTLINE_MAX_TOKENS, limit=2000)
+        research = budget.allocate(research, budget.remaining(OUTLINE_PROMPT.prefix))
+        return OUTLINE_PROMPT.build(
+            f"Topic: {topic}\nAudience: {audience}",
+            f"Definition: {research.get('definition', '')}",
+        )
+
+    async def _create_outline(
+        self, topic: str, audience: str, research_data: Dict
+    ) -> Dict[str, Any]:
+        """Title and key points per section; headings only if planning fails"""
+        messages = self._create_outline_prompt(topic, audience, research_data)
+        try:
+            outline, _ = await self.llm.retry(
+                lambda: parse_stream(
+                    lambda: self.llm.stream(
+                        {"messages": messages, "max_tokens": OUTLINE_MAX_TOKENS}
+                    ),
+                    OUTLINE_SCHEMA,
+                )
+            )
+        except JSONStreamError as e:
+            self.logger.warning(f"Could not plan an outline ({str(e)}); continuing")
+            outline = {"sections": {}}
+        outline.setdefault(
+            "title", f"What Is {topic}: A Comprehensive Guide for {audience}"
+        )
+        return outline
+
     def _create_section_prompt(
-        self, section_name: str, section_data: Dict[str, Any], audience: str
-    ) -> str:
-        """Create a prompt for generating a section of the article"""
-        content = section_data["choices"][0]["message"]["content"]
-        citations = section_data.get("citations", [])
-        formatted_citations = self._format_citations(citations)
+        self,
+        section_name: str,
+        topic: str,
+        audience: str,
+        outline: Dict[str, Any],
+        research_data: Dict,
+    ) -> List[Dict[str, Any]]:
+        """Messages for writing one section with its own slice of the research"""
+        words, research_names = ARTICLE_SECTIONS[section_name]
+        points = outline["sections"]
+        outline_block = "\n".join(
+            f"- {name}: {'; '.join(points.get(name, [])) or 'as the heading says'}"
+            for name in ARTICLE_SECTIONS
+        )
+        research, citations = self._section_research(research_names, research_data)
 
-        prompt = f"""You are writing the {section_name} section for an article. Your audience is {audience}.
+        def render(research: Dict[str, str]) -> str:
+            research_block = "\n".join(
+                f"{RESEARCH_SECTIONS[name]}: {text}" for name, text in research.items()
+            )
+            return f"""Topic: {topic}
+Audience: {audience}
+Article title: {outline["title"]}
 
-Research Data:
-{content}
+Article outline:
+{outline_block}
 
-Available Sources:
-{formatted_citations}
+Write the section "{section_name}" (about {words} words).
+
+Available Sources (use as inline links):
+{self._format_citations(citations) or "None"}
+
+Research Data to Incorporate:
+{research_block or "Draw on the outline above."}"""
 
-Write a CONCISE, publication-ready section that:
-1. Opens with a strong, clear statement
-2. Presents key insights in a logical flow
-3. Uses inline markdown links for citations
-4. Maintains professional yet engaging tone
-5. Focuses on actionable insights
+        budget = self._section_budget(section_name)
+        empty = {name: "" for name in research}
+        research = budget.allocate(
+            research, budget.remaining(SECTION_PROMPT.prefix, render(empty))
+        )
+        return SECTION_PROMPT.build(
+            render(research), cache_control=self.llm.provider == "anthropic"
+        )
+
+    def _section_budget(self, section_name: str) -> TokenBudget:
+        words = ARTICLE_SECTIONS[section_name][0]
+        # Room for the target length plus markdown and links
+        max_tokens = int(words / WORDS_PER_TOKEN * 1.5)
+        return TokenBudget(self.llm.model, max_tokens, limit=SECTION_PROMPT_TOKENS)
+
+    async def _write_section(
+        self,
+        section_name: str,
+        topic: str,
+        audience: str,
+        outline: Dict[str, Any],
+        research_data: Dict,
+    ) -> Tuple[str, Dict[str, Any]]:
+        messages = self._create_section_prompt(
+            section_name, topic, audience, outline, research_data
+        )
+        max_tokens = self._section_budget(section_name).max_tokens
 
-Format Guidelines:
-- 2-3 concise paragraphs
-- Use bullet points for lists
-- Include only essential information
-- Link to sources naturally in text
-- Avoid jargon and repetition
+        async def write():
+            async with self.llm.stream(
+                {"messages": messages, "max_tokens": max_tokens}
+            ) as stream:
+                await stream.collect()
+            return stream
 
-Please write the section now:"""
+        stream = await self.llm.retry(write)
+        if not stream.text:
+            raise ValueError(f"Empty response for section {section_name}")
+        return stream.text, stream.stats.as_dict()
 
-        return prompt
+    async def _write_sectioned(
+        self, topic: str, audience: str, research_data: Dict
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Outline once, write every section concurrently, then join them
+
+        Writing takes about as long as the slowest section instead of the
+        whole article. Returns the article and per-call stream stats. A
+        section that still fails after retries is left out and listed in
+        the stats' "failed" entry, so the other sections are kept.
+        """
+        start = time.perf_counter()
+        outline = await self._create_outline(topic, audience, research_data)
+        self.logger.info(
+            f"Planned outline in {time.perf_counter() - start:.1f}s; "
+            f"writing {len(ARTICLE_SECTIONS)} sections concurrently"
+        )
+        results = await asyncio.gather(
+            *(
+                self._write_section(name, topic, audience, outline, research_data)
+                for name in ARTICLE_SECTIONS
+            ),
+            return_exceptions=True,
+        )
+        written, failed = {}, []
+        for name, result in zip(ARTICLE_SECTIONS, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Section {name} failed: {str(result)}")
+                failed.append(name)
+            else:
+                written[name] = result
+        if not written:
+            raise results[0]
+        sections = {name: text for name, (text, _) in written.items()}
+        stats = {
+            "sections": {name: s for name, (_, s) in written.items()},
+            "completion_tokens": sum(
+                s["completion_tokens"] for _, s in written.values()
+            ),
+            "duration": time.perf_counter() - start,
+            "failed": failed,
+        }
+        return self._stitch_sections(outline["title"], sections), stats
+
+    def _stitch_sections(self, title: str, sections: Dict[str, str]) -> str:
+        """Join sections under their headings, with a light consistency pass
+
+        Headings a writer repeated are dropped, headings inside a section
+        are put below the section's own, and paragraphs that already
+        appeared in an earlier section are removed.
+        """
+        seen = set()
+        parts = [f"# {title}"]
+        for name, text in sections.items():
+            text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+            first, _, rest = text.partition("\n")
+            if first.startswith("#") and _same_heading(first, name):
+                text = rest.strip()
+            text = re.sub(r"^#{1,2}(?=\s)", "###", text, flags=re.MULTILINE)
+
+            paragraphs = []
+            for paragraph in re.split(r"\n\s*\n", text):
+                key = re.sub(r"\W+", " ", paragraph).strip().lower()
+                if len(key) > 40 and not paragraph.lstrip().startswith("#"):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                paragraphs.append(paragraph)
+            if name not in UNTITLED_SECTIONS:
+                parts.append(f"## {name}")
+            parts.append("\n\n".join(paragraphs))
+        return self._clean_article_content("\n\n".join(parts))
 
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the article writing process"""
@@ -235,32 +527,28 @@ Please write the section now:"""
                 f"Writing comprehensive article about {topic} for {audience}"
             )
 
-            # Create the comprehensive article prompt
-            article_prompt = self._create_article_prompt(topic, audience, research_data)
-
-            # Generate the complete article
-            self.logger.info("Generating article with maximized settings...")
-            response = await self.llm.execute(
-                {"messages": [{"role": "user", "content": article_prompt}]}
-            )
-
-            if not response or "choices" not in response:
-                raise ValueError("Invalid response from LLM")
-
-            article_content = response["choices"][0]["message"]["content"]
-
-            # Post-process the content to remove any remaining think sections
-            article_content = self._clean_article_content(article_content)
-
-            # Save article
             output_dir = "data/articles/markdown"
             os.makedirs(output_dir, exist_ok=True)
 
             output_path = (
                 f"{output_dir}/{topic.lower().replace(' ', '_')}_{timestamp}.md"
             )
-            with open(output_path, "w") as f:
-                f.write(article_content)
+
+            if self.mode == "sectioned":
+                article_content, stream_stats = await self._write_sectioned(
+                    topic, audience, research_data
+                )
+                self.logger.info(
+                    f"Wrote {len(stream_stats['sections'])} sections "
+                    f"({stream_stats['completion_tokens']} tokens) "
+                    f"in {stream_stats['duration']:.1f}s"
+                )
+                with open(output_path, "w") as f:
+                    f.write(article_content)
+            else:
+                article_content, stream_stats = await self._write_single(
+                    topic, audience, research_data, output_path
+                )
 
             self.logger.info(f"Article saved to: {output_path}")
 
@@ -283,6 +571,8 @@ Please write the section now:"""
                     "word_count": len(article_content.split()),
                     "generated_at": datetime.now().isoformat(),
                     "model": "anthropic/claude-3-5-sonnet-20240620",
+                    "mode": self.mode,
+                    "stream": stream_stats,
                 },
             }
 
@@ -293,6 +583,45 @@ Please write the section now:"""
             self.logger.error(traceback.format_exc())
             raise
 
+    async def _write_single(
+        self, topic: str, audience: str, research_data: Dict, output_path: str
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Write the whole article in one call; returns it with stream stats"""
+        messages = self._create_article_prompt(topic, audience, research_data)
+
+        # Stream the article to a partial file so progress is visible
+        # (and kept) while the model is still writing
+        self.logger.info("Generating article with maximized settings...")
+        partial_path = f"{output_path}.partial"
+
+        async def write_partial():
+            async with self.llm.stream({"messages": messages}) as stream:
+                with open(partial_path, "w") as f:
+                    async for delta in stream:
+                        f.write(delta)
+                        f.flush()
+            return stream
+
+        # A rate limit or overload restarts the article from the top
+        stream = await self.llm.retry(write_partial)
+
+        if not stream.text:
+            raise ValueError("Invalid response from LLM")
+        stream_stats = stream.stats.as_dict()
+        self.logger.info(
+            f"Streamed {stream_stats['completion_tokens']} tokens "
+            f"(first token after {stream_stats['ttft']:.1f}s, "
+            f"{stream_stats['tokens_per_second'] or 0:.0f} tokens/s)"
+        )
+
+        # Post-process the content to remove any remaining think sections
+        article_content = self._clean_article_content(stream.text)
+
+        with open(output_path, "w") as f:
+            f.write(article_content)
+        os.remove(partial_path)
+        return article_content, stream_stats
+
     def _clean_article_content(self, content: str) -> str:
         """Clean the article content by removing think sections and improving formatting"""
         # Remove any content between <think> tags
@@ -323,6 +652,12 @@ Please write the section now:"""
         return content.strip()
 
 
+def _same_heading(line: str, name: str) -> bool:
+    """Whether a markdown heading line just repeats a section name"""
+    words = lambda text: re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    return words(line) == words(name)
+
+
 async def test_article_writer():
     """Test the article writer with existing research data"""
     try:
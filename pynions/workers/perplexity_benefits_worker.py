@@ -4,8 +4,30 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a benefits analysis expert. Your task is to:
+1. Identify all significant advantages and benefits
+2. Categorize benefits by type (e.g., financial, operational)
+3. Find quantifiable impact metrics
+4. Provide real-world success examples
+5. Note context-specific benefits
+6. Use data from reliable sources
+7. Compare benefits across different scenarios""",
+    """Research the benefits and advantages of the topic given below. Focus on:
+1. What are the main benefits and advantages?
+2. How can these benefits be measured or quantified?
+3. What real-world examples demonstrate these benefits?
+4. How do benefits vary by context or implementation?
+5. What ROI or impact metrics are available?
+6. Are there any unique or unexpected advantages?
+7. What do case studies reveal about the benefits?
+
+Use authoritative sources and include specific metrics, case studies, and success stories where available. Organize benefits by category with clear examples.""",
+)
+
 
 class PerplexityBenefitsWorker(Worker):
     """Worker for identifying advantages and benefits of a topic using Perplexity AI"""
@@ -44,34 +66,7 @@ class PerplexityBenefitsWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a benefits analysis expert. Your task is to:
-1. Identify all significant advantages and benefits
-2. Categorize benefits by type (e.g., financial, operational)
-3. Find quantifiable impact metrics
-4. Provide real-world success examples
-5. Note context-specific benefits
-6. Use data from reliable sources
-7. Compare benefits across different scenarios""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Research the benefits and advantages of '{topic}'. Focus on:
-1. What are the main benefits and advantages?
-2. How can these benefits be measured or quantified?
-3. What real-world examples demonstrate these benefits?
-4. How do benefits vary by context or implementation?
-5. What ROI or impact metrics are available?
-6. Are there any unique or unexpected advantages?
-7. What do case studies reveal about the benefits?
-
-Use authoritative sources and include specific metrics, case studies, and success stories where available. Organize benefits by category with clear examples.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
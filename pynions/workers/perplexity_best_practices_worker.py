@@ -4,8 +4,32 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a best practices and implementation expert. Your task is to:
+1. Identify proven best practices and guidelines
+2. Organize recommendations by implementation phase
+3. Provide specific, actionable steps
+4. Include industry standards and frameworks
+5. Note context-specific adaptations
+6. Reference successful implementations
+7. Consider scalability and maintenance
+8. Include quality assurance measures""",
+    """Research the best practices and implementation guidelines for the topic given below. Focus on:
+1. What are the established best practices?
+2. What are the key implementation steps?
+3. What quality standards should be followed?
+4. How should progress be measured?
+5. What tools and resources are recommended?
+6. How should testing and validation be done?
+7. What maintenance practices are important?
+8. How do best practices vary by scale or context?
+
+Use authoritative sources (industry standards, professional organizations, expert practitioners). Include specific examples of successful implementations and organize recommendations by phase with clear, actionable steps.""",
+)
+
 
 class PerplexityBestPracticesWorker(Worker):
     """Worker for identifying best practices and implementation guidelines using Perplexity AI"""
@@ -44,36 +68,7 @@ class PerplexityBestPracticesWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a best practices and implementation expert. Your task is to:
-1. Identify proven best practices and guidelines
-2. Organize recommendations by implementation phase
-3. Provide specific, actionable steps
-4. Include industry standards and frameworks
-5. Note context-specific adaptations
-6. Reference successful implementations
-7. Consider scalability and maintenance
-8. Include quality assurance measures""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Research the best practices and implementation guidelines for '{topic}'. Focus on:
-1. What are the established best practices?
-2. What are the key implementation steps?
-3. What quality standards should be followed?
-4. How should progress be measured?
-5. What tools and resources are recommended?
-6. How should testing and validation be done?
-7. What maintenance practices are important?
-8. How do best practices vary by scale or context?
-
-Use authoritative sources (industry standards, professional organizations, expert practitioners). Include specific examples of successful implementations and organize recommendations by phase with clear, actionable steps.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
@@ -4,8 +4,32 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a challenges and risk analysis expert. Your task is to:
+1. Identify significant challenges and limitations
+2. Categorize issues by type (technical, operational, etc.)
+3. Assess impact and severity of challenges
+4. Find common failure points and pitfalls
+5. Note context-specific difficulties
+6. Use data from real-world examples
+7. Analyze mitigation strategies
+8. Consider regulatory and compliance issues""",
+    """Research the challenges and limitations of the topic given below. Focus on:
+1. What are the main challenges and limitations?
+2. What are common pitfalls and failure points?
+3. How do these challenges impact implementation?
+4. What are the technical limitations?
+5. What operational difficulties exist?
+6. Are there regulatory or compliance challenges?
+7. What resource constraints are common?
+8. How do challenges vary by context or scale?
+
+Use authoritative sources and include specific examples, case studies, and industry reports. Organize challenges by category and severity, with real-world examples of how organizations have faced these issues.""",
+)
+
 
 class PerplexityChallengesWorker(Worker):
     """Worker for identifying challenges and limitations of a topic using Perplexity AI"""
@@ -44,36 +68,7 @@ class PerplexityChallengesWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a challenges and risk analysis expert. Your task is to:
-1. Identify significant challenges and limitations
-2. Categorize issues by type (technical, operational, etc.)
-3. Assess impact and severity of challenges
-4. Find common failure points and pitfalls
-5. Note context-specific difficulties
-6. Use data from real-world examples
-7. Analyze mitigation strategies
-8. Consider regulatory and compliance issues""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Research the challenges and limitations of '{topic}'. Focus on:
-1. What are the main challenges and limitations?
-2. What are common pitfalls and failure points?
-3. How do these challenges impact implementation?
-4. What are the technical limitations?
-5. What operational difficulties exist?
-6. Are there regulatory or compliance challenges?
-7. What resource constraints are common?
-8. How do challenges vary by context or scale?
-
-Use authoritative sources and include specific examples, case studies, and industry reports. Organize challenges by category and severity, with real-world examples of how organizations have faced these issues.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
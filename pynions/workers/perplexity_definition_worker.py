@@ -2,10 +2,40 @@ import asyncio
 import json
 import os
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pynions import Worker
+from pynions.core.packing import RequestPacker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a definition expert. Your task is to:
+1. Find precise, authoritative definitions
+2. Trace historical origins and etymology
+3. Note key developments in meaning over time
+4. Identify academic or industry-standard definitions
+5. Only use reliable, verifiable sources
+6. Note any variations in definition across different contexts""",
+    """Research the definition and origin of the topic given below. Focus on:
+1. What is the most precise, current definition?
+2. What is its origin/etymology?
+3. How has the definition evolved?
+4. Are there different definitions in different contexts?
+5. What are the authoritative sources for this definition?
+
+Only use reliable sources (academic papers, industry standards, official documentation).""",
+)
+
+# Answer of one topic in a packed call
+PACKED_SCHEMA = {
+    "type": "object",
+    "required": ["definition"],
+    "properties": {
+        "definition": {"type": "string"},
+        "sources": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
 
 class PerplexityDefinitionWorker(Worker):
     """Worker for extracting clear definitions and origins of topics using Perplexity AI"""
@@ -44,31 +74,7 @@ class PerplexityDefinitionWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a definition expert. Your task is to:
-1. Find precise, authoritative definitions
-2. Trace historical origins and etymology
-3. Note key developments in meaning over time
-4. Identify academic or industry-standard definitions
-5. Only use reliable, verifiable sources
-6. Note any variations in definition across different contexts""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Research the definition and origin of '{topic}'. Focus on:
-1. What is the most precise, current definition?
-2. What is its origin/etymology?
-3. How has the definition evolved?
-4. Are there different definitions in different contexts?
-5. What are the authoritative sources for this definition?
-
-Only use reliable sources (academic papers, industry standards, official documentation).""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
@@ -84,6 +90,67 @@ Only use reliable sources (academic papers, industry standards, official documen
             print(f"\n❌ Error: {str(e)}")
             return None
 
+    async def execute_many(self, topics: List[str]) -> Dict[str, Optional[Dict]]:
+        """Define many topics, several per Perplexity call
+
+        Topics are packed into shared calls; any topic whose answer is
+        missing or malformed is researched on its own. Returns a response
+        per topic (None on failure) with the definition and its sources.
+        """
+        packer = RequestPacker(
+            lambda messages, max_tokens: self.perplexity.stream(
+                {"messages": messages, "max_tokens": max_tokens}
+            ),
+            PROMPT.prefix,
+            self._define_one,
+            item_schema=PACKED_SCHEMA,
+            answer_format=(
+                'an object {"definition": "<markdown answer>", '
+                '"sources": ["<url>", ...]}'
+            ),
+            max_items=5,
+            answer_tokens=800,
+        )
+        print(f"\n🔍 Analyzing definitions for {len(topics)} topics")
+        answers = await asyncio.gather(
+            *(packer.submit(f"Topic: {topic}") for topic in topics),
+            return_exceptions=True,
+        )
+        print(
+            f"📦 {packer.stats['packed']} answered in {packer.stats['packs']} "
+            f"packed calls ({packer.stats['failed_packs']} failed), "
+            f"{packer.stats['reissued']} re-issued"
+        )
+
+        results = {}
+        for topic, answer in zip(topics, answers):
+            if isinstance(answer, Exception):
+                print(f"\n❌ Error for {topic}: {str(answer)}")
+                results[topic] = None
+                continue
+            response = {
+                "choices": [
+                    {
+                        "message": {
+                            "role": "assistant",
+                            "content": answer["definition"],
+                        }
+                    }
+                ],
+                "citations": answer.get("sources", []),
+            }
+            self.save_to_file(response, topic)
+            results[topic] = response
+        return results
+
+    async def _define_one(self, item: str) -> Dict[str, Any]:
+        """Unpacked call for one topic, in the packed answer's shape"""
+        response = await self.perplexity.execute({"messages": PROMPT.build(item)})
+        return {
+            "definition": response["choices"][0]["message"]["content"],
+            "sources": response.get("citations", []),
+        }
+
 
 # Test
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
 # ANSI Color codes
@@ -16,6 +17,11 @@ CYAN = "\033[96m"
 BOLD = "\033[1m"
 
 
+PROMPT = PromptBuilder(
+    "What are the main features of the company given below? List them in detail with sources.",
+)
+
+
 class PerplexityFeaturesWorker(Worker):
     """Worker for extracting feature information from a website using Perplexity AI"""
 
@@ -53,14 +59,7 @@ class PerplexityFeaturesWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": f"What are the main features of {domain}? List them in detail with sources.",
-                        }
-                    ]
-                }
+                {"messages": PROMPT.build(f"Company: {domain}")}
             )
 
             if response:
@@ -4,8 +4,13 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    "What integrations and API capabilities does the company given below offer? List all available integrations, API features, and webhook capabilities. Only use official sources.",
+)
+
 
 class PerplexityIntegrationsWorker(Worker):
     """Worker for extracting integration information from a website using Perplexity AI"""
@@ -44,14 +49,7 @@ class PerplexityIntegrationsWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": f"What integrations and API capabilities does {domain} offer? List all available integrations, API features, and webhook capabilities. Only use official sources.",
-                        }
-                    ]
-                }
+                {"messages": PROMPT.build(f"Company: {domain}")}
             )
 
             if response:
@@ -4,8 +4,29 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a process and methodology expert. Your task is to:
+1. Break down complex processes into clear steps
+2. Explain how systems and methods work
+3. Identify key principles and mechanisms
+4. Note any variations in methodology
+5. Only use reliable, technical sources
+6. Include real-world examples where relevant
+7. Highlight critical dependencies and requirements""",
+    """Explain how the topic given below works. Focus on:
+1. What are the core mechanisms/processes involved?
+2. What are the step-by-step procedures?
+3. What are the key principles behind it?
+4. What are the requirements and dependencies?
+5. Are there different methodologies or approaches?
+6. What are common implementation methods?
+
+Only use technical documentation, academic sources, and industry standards. Include specific examples where helpful.""",
+)
+
 
 class PerplexityMethodologyWorker(Worker):
     """Worker for explaining how things work and their processes using Perplexity AI"""
@@ -44,33 +65,7 @@ class PerplexityMethodologyWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a process and methodology expert. Your task is to:
-1. Break down complex processes into clear steps
-2. Explain how systems and methods work
-3. Identify key principles and mechanisms
-4. Note any variations in methodology
-5. Only use reliable, technical sources
-6. Include real-world examples where relevant
-7. Highlight critical dependencies and requirements""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Explain how '{topic}' works. Focus on:
-1. What are the core mechanisms/processes involved?
-2. What are the step-by-step procedures?
-3. What are the key principles behind it?
-4. What are the requirements and dependencies?
-5. Are there different methodologies or approaches?
-6. What are common implementation methods?
-
-Only use technical documentation, academic sources, and industry standards. Include specific examples where helpful.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
@@ -6,6 +6,8 @@ import sys
 from typing import Dict, Any, Optional
 from datetime import datetime
 from pynions import Worker
+from pynions.core.jsonstream import JSONStreamError, parse_stream
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
 # ANSI Color codes
@@ -50,6 +52,112 @@ class Spinner:
         sys.stdout.flush()
 
 
+_SOURCED = ["source_url", "source_quote"]
+_CHECKED = ["url", "last_checked", "content_hash"]
+
+# Structure checked while the answer streams; validate_pricing_data then
+# checks what needs the whole answer, like every plan having pricing
+PRICING_SCHEMA = {
+    "type": "object",
+    "required": ["plans", "pricing", "currency", "sources"],
+    "properties": {
+        "plans": {"type": "array", "items": {"type": "string"}},
+        "pricing": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "properties": {
+                    "features": {
+                        "type": "array",
+                        "items": {"type": "object", "required": ["name", *_SOURCED]},
+                    },
+                    "limits": {
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": "object",
+                            "required": ["value", *_SOURCED],
+                        },
+                    },
+                },
+            },
+        },
+        "currency": {"type": "string"},
+        "sources": {
+            "type": "object",
+            "required": ["primary"],
+            "properties": {
+                "primary": {"type": "object", "required": _CHECKED},
+                "additional": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "required": [*_CHECKED, "type", "section"],
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+PROMPT = PromptBuilder(
+    """Extract pricing information from the company's website with strict first-party verification.
+
+Requirements:
+1. ONLY use official company sources (help center, docs, pricing pages)
+2. For each fact or number, include the exact source URL and relevant quote
+3. Cross-reference all information within official documentation
+4. Note any conditions or exceptions that apply to limits/features
+5. Include full context for any limitations or restrictions
+6. Maintain precise wording from source material
+
+Output Format:
+{
+    "plans": ["plan names"],
+    "pricing": {
+        "plan_name": {
+            "monthly_price": number_or_string,
+            "annual_price": number_or_string,
+            "features": [
+                {
+                    "name": "feature name",
+                    "description": "exact feature description from source",
+                    "source_url": "direct link to feature documentation",
+                    "source_quote": "exact quote from documentation"
+                }
+            ],
+            "limits": {
+                "limit_name": {
+                    "value": "exact limit value",
+                    "conditions": ["any conditions that apply"],
+                    "source_url": "direct link to limit documentation",
+                    "source_quote": "exact quote describing the limit"
+                }
+            }
+        }
+    },
+    "currency": "USD",
+    "sources": {
+        "primary": {
+            "url": "direct link to official pricing page",
+            "last_checked": "YYYY-MM-DD",
+            "content_hash": "hash of page content for verification"
+        },
+        "additional": [
+            {
+                "url": "link to official documentation page",
+                "type": "official",
+                "section": "specific section or heading",
+                "last_checked": "YYYY-MM-DD",
+                "content_hash": "hash of page content"
+            }
+        ]
+    }
+}""",
+    "Research and analyze the current pricing structure for the company given below. ONLY use official company sources (pricing pages, help center, documentation). For each fact, feature, or limit, include the exact source URL and quote. Return the data in the specified JSON format.",
+)
+
+
 class PerplexityPricingWorker(Worker):
     """Worker for extracting pricing data from a website using Perplexity AI"""
 
@@ -199,69 +307,7 @@ class PerplexityPricingWorker(Worker):
             # Start spinner for the research phase
             self.spinner.start("2. 🔎 Researching pricing information...")
 
-            # Setup the request payload
-            messages = [
-                {
-                    "role": "system",
-                    "content": """Extract pricing information from the company's website with strict first-party verification.
-
-Requirements:
-1. ONLY use official company sources (help center, docs, pricing pages)
-2. For each fact or number, include the exact source URL and relevant quote
-3. Cross-reference all information within official documentation
-4. Note any conditions or exceptions that apply to limits/features
-5. Include full context for any limitations or restrictions
-6. Maintain precise wording from source material
-
-Output Format:
-{
-    "plans": ["plan names"],
-    "pricing": {
-        "plan_name": {
-            "monthly_price": number_or_string,
-            "annual_price": number_or_string,
-            "features": [
-                {
-                    "name": "feature name",
-                    "description": "exact feature description from source",
-                    "source_url": "direct link to feature documentation",
-                    "source_quote": "exact quote from documentation"
-                }
-            ],
-            "limits": {
-                "limit_name": {
-                    "value": "exact limit value",
-                    "conditions": ["any conditions that apply"],
-                    "source_url": "direct link to limit documentation",
-                    "source_quote": "exact quote describing the limit"
-                }
-            }
-        }
-    },
-    "currency": "USD",
-    "sources": {
-        "primary": {
-            "url": "direct link to official pricing page",
-            "last_checked": "YYYY-MM-DD",
-            "content_hash": "hash of page content for verification"
-        },
-        "additional": [
-            {
-                "url": "link to official documentation page",
-                "type": "official",
-                "section": "specific section or heading",
-                "last_checked": "YYYY-MM-DD",
-                "content_hash": "hash of page content"
-            }
-        ]
-    }
-}""",
-                },
-                {
-                    "role": "user",
-                    "content": f"Research and analyze the current pricing structure for {domain}. ONLY use official company sources (pricing pages, help center, documentation). For each fact, feature, or limit, include the exact source URL and quote. Return the data in the specified JSON format.",
-                },
-            ]
+            messages = PROMPT.build(f"Company: {domain}")
 
             # Make the API request with progress updates
             last_update = time.time()
@@ -280,36 +326,25 @@ Output Format:
             # Start progress update task
             progress_task = asyncio.create_task(update_spinner())
 
-            # Make the actual API request
-            response = await self.perplexity.execute({"messages": messages})
+            # Stream the answer, checking it against the schema as it arrives;
+            # a malformed answer is abandoned and retried straight away
+            pricing_data, stream = await parse_stream(
+                lambda: self.perplexity.stream({"messages": messages}), PRICING_SCHEMA
+            )
+            response = {
+                "citations": stream.citations,
+                "model": stream.model,
+                "usage": stream.usage or {},
+            }
 
             # Stop spinner
             self.spinner.stop()
 
             elapsed_time = time.time() - start_time
             print(f"\n{GREEN}✨ Response received in {elapsed_time:.1f} seconds{RESET}")
-            print(f"{BLUE}📚 Found {len(response.get('citations', []))} sources{RESET}")
-
-            # Parse and validate response
-            if not response.get("choices"):
-                raise ValueError("No choices in response")
-
-            content = response["choices"][0]["message"]["content"].strip()
+            print(f"{BLUE}📚 Found {len(response['citations'])} sources{RESET}")
             print(f"\n{CYAN}🔄 Processing response...{RESET}")
 
-            # Clean and parse JSON
-            if not content.startswith("{"):
-                print(f"{YELLOW}🔧 Cleaning response format...{RESET}")
-                start = content.find("{")
-                end = content.rfind("}") + 1
-                if start >= 0 and end > start:
-                    content = content[start:end]
-
-            content = (
-                content.replace("'", '"').replace("```json\n", "").replace("\n```", "")
-            )
-            pricing_data = json.loads(content)
-
             # Validate the data
             if not self.validate_pricing_data(pricing_data):
                 raise ValueError("Invalid pricing data structure")
@@ -323,7 +358,7 @@ Output Format:
                 "sources": response.get("citations", []),
                 "pricing": pricing_data,
                 "metadata": {
-                    "timestamp": response.get("created"),
+                    "timestamp": datetime.now().isoformat(),
                     "model": response.get("model"),
                     "token_usage": response.get("usage", {}),
                 },
@@ -334,7 +369,7 @@ Output Format:
             )
             return result
 
-        except json.JSONDecodeError as e:
+        except JSONStreamError as e:
             self.spinner.stop()
             print(f"\n{RED}❌ JSON parsing error:{RESET}")
             print(f"{RED}Error message: {str(e)}{RESET}")
@@ -4,8 +4,32 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a trends and future developments expert. Your task is to:
+1. Identify emerging trends and patterns
+2. Analyze future developments and predictions
+3. Evaluate technology impacts and innovations
+4. Consider market and industry shifts
+5. Assess regulatory and policy changes
+6. Note demographic and social influences
+7. Examine competitive landscape changes
+8. Consider global and regional variations""",
+    """Research future trends and developments in the topic given below. Focus on:
+1. What are the emerging trends and patterns?
+2. What technological developments are expected?
+3. How is the market/industry evolving?
+4. What innovations are on the horizon?
+5. What regulatory changes are expected?
+6. How are user/customer needs changing?
+7. What competitive shifts are occurring?
+8. What are the long-term predictions?
+
+Use authoritative sources (industry reports, research papers, expert predictions, market analyses). Include specific examples, timelines, and data points where available. Organize trends by timeframe (near-term, mid-term, long-term) and impact level.""",
+)
+
 
 class PerplexityTrendsWorker(Worker):
     """Worker for identifying future trends and developments using Perplexity AI"""
@@ -44,36 +68,7 @@ class PerplexityTrendsWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a trends and future developments expert. Your task is to:
-1. Identify emerging trends and patterns
-2. Analyze future developments and predictions
-3. Evaluate technology impacts and innovations
-4. Consider market and industry shifts
-5. Assess regulatory and policy changes
-6. Note demographic and social influences
-7. Examine competitive landscape changes
-8. Consider global and regional variations""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Research future trends and developments in '{topic}'. Focus on:
-1. What are the emerging trends and patterns?
-2. What technological developments are expected?
-3. How is the market/industry evolving?
-4. What innovations are on the horizon?
-5. What regulatory changes are expected?
-6. How are user/customer needs changing?
-7. What competitive shifts are occurring?
-8. What are the long-term predictions?
-
-Use authoritative sources (industry reports, research papers, expert predictions, market analyses). Include specific examples, timelines, and data points where available. Organize trends by timeframe (near-term, mid-term, long-term) and impact level.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
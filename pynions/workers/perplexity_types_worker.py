@@ -4,8 +4,30 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Worker
+from pynions.core.prompt import PromptBuilder
 from pynions.plugins.perplexity import PerplexityAPI
 
+PROMPT = PromptBuilder(
+    """You are a classification and categorization expert. Your task is to:
+1. Identify all distinct types and variations
+2. Create clear, logical categorization systems
+3. Compare and contrast different types
+4. Note industry-standard classifications
+5. Highlight key characteristics of each type
+6. Provide real-world examples of each type
+7. Use authoritative sources for categorization""",
+    """Identify and categorize all types and variations of the topic given below. Focus on:
+1. What are the main categories or types?
+2. How are they typically classified in the industry?
+3. What are the key characteristics of each type?
+4. What are real-world examples of each type?
+5. How do different types compare to each other?
+6. Are there any hybrid or emerging types?
+7. What are the standard industry classifications?
+
+Use authoritative sources (industry standards, academic papers, professional organizations). Structure the response with clear categories and comparisons.""",
+)
+
 
 class PerplexityTypesWorker(Worker):
     """Worker for identifying and categorizing different types and variations of a topic using Perplexity AI"""
@@ -44,34 +66,7 @@ class PerplexityTypesWorker(Worker):
         try:
             # Make the API request
             response = await self.perplexity.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a classification and categorization expert. Your task is to:
-1. Identify all distinct types and variations
-2. Create clear, logical categorization systems
-3. Compare and contrast different types
-4. Note industry-standard classifications
-5. Highlight key characteristics of each type
-6. Provide real-world examples of each type
-7. Use authoritative sources for categorization""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"""Identify and categorize all types and variations of '{topic}'. Focus on:
-1. What are the main categories or types?
-2. How are they typically classified in the industry?
-3. What are the key characteristics of each type?
-4. What are real-world examples of each type?
-5. How do different types compare to each other?
-6. Are there any hybrid or emerging types?
-7. What are the standard industry classifications?
-
-Use authoritative sources (industry standards, academic papers, professional organizations). Structure the response with clear categories and comparisons.""",
-                        },
-                    ]
-                }
+                {"messages": PROMPT.build(f"Topic: {topic}")}
             )
 
             if response:
@@ -2,10 +2,21 @@ import asyncio
 import json
 from typing import Dict, Any
 from pynions import Worker
+from pynions.core.jsonstream import parse_stream
 from pynions.plugins.serper import SerperWebSearch
 from pynions.plugins.jina import JinaAIReader
 from pynions.plugins.litellm_plugin import LiteLLM
 
+PRICING_SCHEMA = {
+    "type": "object",
+    "required": ["plans", "pricing"],
+    "properties": {
+        "plans": {"type": "array", "items": {"type": "string"}},
+        "pricing": {"type": "object"},
+        "currency": {"type": "string"},
+    },
+}
+
 
 class PricingResearchWorker(Worker):
     """Worker for extracting pricing data from a website"""
@@ -44,13 +55,13 @@ class PricingResearchWorker(Worker):
 
             print(f"✅ Extracted {len(content['content'])} characters")
 
-            # Analyze with LLM - using full content
-            response = await self.llm.execute(
-                {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": """You are a precise pricing data extractor. Your task is to extract EXACT pricing information from websites.
+            # Analyze with LLM - using full content; the answer is validated
+            # as it streams and the call is retried as soon as it goes wrong
+            request = {
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": """You are a precise pricing data extractor. Your task is to extract EXACT pricing information from websites.
                             Instructions:
                             1. Only include information that is explicitly stated in the content
                             2. Use exact prices, features, and limits as shown
@@ -70,17 +81,16 @@ class PricingResearchWorker(Worker):
                             },
                             "currency": "exact currency code found"
                             }""",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"Extract the pricing structure from this content. Only include explicitly stated information:\n\n{content['content']}",
-                        },
-                    ]
-                }
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Extract the pricing structure from this content. Only include explicitly stated information:\n\n{content['content']}",
+                    },
+                ]
+            }
+            pricing_data, _ = await parse_stream(
+                lambda: self.llm.stream(request), PRICING_SCHEMA
             )
-
-            # Parse response
-            pricing_data = json.loads(response["content"])
             return {"domain": domain, "source": url, "pricing": pricing_data}
 
         except Exception as e:
@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pynions import Workflow
+from pynions.core.cache import CompletionCache
+from pynions.core.ledger import workflow_scope
 from pynions.workers.perplexity_definition_worker import PerplexityDefinitionWorker
 from pynions.workers.perplexity_methodology_worker import PerplexityMethodologyWorker
 from pynions.workers.perplexity_types_worker import PerplexityTypesWorker
@@ -22,7 +24,13 @@ from pynions.workers.perplexity_article_writer_worker import (
 class WhatIsWorkflow(Workflow):
     """Workflow for generating comprehensive 'What is [X]?' articles using specialized Perplexity workers"""
 
-    def __init__(self):
+    def __init__(self, cache: bool = False):
+        """Set cache=True to reuse earlier research and article completions
+
+        Reruns after a failure, e.g. in the writing phase, then only pay for
+        the steps that did not complete. The workers sample at temperatures
+        above zero, so this opts in to reusing those samples.
+        """
         # Initialize all workers
         self.definition_worker = PerplexityDefinitionWorker()
         self.methodology_worker = PerplexityMethodologyWorker()
@@ -32,7 +40,29 @@ class WhatIsWorkflow(Workflow):
         self.best_practices_worker = PerplexityBestPracticesWorker()
         self.trends_worker = PerplexityTrendsWorker()
         self.qa_worker = PerplexityQAWorker()
-        self.article_writer = PerplexityArticleWriterWorker()
+        self.article_writer = PerplexityArticleWriterWorker({"mode": "sectioned"})
+        if cache:
+            research_cache = CompletionCache(
+                "perplexity", ttl=24 * 60 * 60, nondeterministic=True
+            )
+            for worker in self.research_workers:
+                worker.perplexity.cache = research_cache
+            self.article_writer.llm.cache = CompletionCache(
+                "litellm", nondeterministic=True
+            )
+
+    @property
+    def research_workers(self):
+        return [
+            self.definition_worker,
+            self.methodology_worker,
+            self.types_worker,
+            self.benefits_worker,
+            self.challenges_worker,
+            self.best_practices_worker,
+            self.trends_worker,
+            self.qa_worker,
+        ]
 
     def save_results(self, data: Dict, topic: str) -> str:
         """Save the complete article data to a JSON file"""
@@ -51,6 +81,10 @@ class WhatIsWorkflow(Workflow):
 
     async def execute(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Execute the complete workflow to generate a 'What is [X]?' article"""
+        with workflow_scope("what_is"):
+            return await self._execute(input_data)
+
+    async def _execute(self, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         topic = input_data["topic"]
         audience = input_data.get("audience", "general readers")
         print(f"\n🔍 Generating comprehensive article about: {topic}")
@@ -0,0 +1,107 @@
+"""Shared fixtures for the test suite."""
+
+import asyncio
+import gzip
+import os
+from types import SimpleNamespace
+import pytest
+from aiohttp import web
+
+# Tests run offline; don't let litellm fetch its model price list on import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+from pynions.core import health, keypool
+from pynions.plugins import litellm_plugin, router
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    """Keep persistent caches, URL health, key pools and model stats per test."""
+    monkeypatch.setenv("PYNIONS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("PYNIONS_HOST_INTERVAL", "0")
+    monkeypatch.setattr(health, "_default", None)
+    monkeypatch.setattr(keypool, "_pools", {})
+    monkeypatch.setattr(router, "_stats", {})
+    monkeypatch.setattr(router, "_cooldowns", {})
+
+
+@pytest.fixture
+def fake_acompletion(monkeypatch):
+    """Replace litellm.acompletion with a slow in-memory model.
+
+    The returned state counts running calls, their peak and each call's
+    stream flag.
+    """
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    state = {"running": 0, "peak": 0, "calls": []}
+
+    async def acompletion(model, messages, stream=False, **kwargs):
+        state["calls"].append(stream)
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            state["running"] -= 1
+        usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+        if not stream:
+            return SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(message=SimpleNamespace(content="ok go"))],
+                usage=usage,
+            )
+
+        async def chunks():
+            for word in ["ok", " go"]:
+                delta = SimpleNamespace(content=word)
+                yield SimpleNamespace(
+                    model=model, choices=[SimpleNamespace(delta=delta)], usage=None
+                )
+            yield SimpleNamespace(model=model, choices=[], usage=usage)
+
+        return chunks()
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    return state
+
+
+JINA_TEXT = (
+    "Title: Pricing\n\nURL Source: https://example.com/pricing\n\n"
+    "Markdown Content:\n" + "Plan details. " * 2000
+)
+
+
+@pytest.fixture
+async def jina_server(monkeypatch):
+    """Local stand-in for the Jina reader API; yields (base_url, requests).
+
+    Paths containing "missing" are 404s, If-None-Match "v1" gets a 304,
+    Accept: text/plain gets gzipped text and anything else gets JSON.
+    """
+    monkeypatch.setenv("JINA_API_KEY", "test-key")
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        if "missing" in request.path:
+            return web.Response(status=404, text="Not found")
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        if request.headers.get("Accept") == "text/plain":
+            return web.Response(
+                body=gzip.compress(JINA_TEXT.encode()),
+                headers={"Content-Encoding": "gzip", "Content-Type": "text/plain"},
+            )
+        return web.json_response(
+            {"data": {"title": "Pricing", "content": "Plan details."}},
+            headers={"ETag": '"v1"'},
+        )
+
+    app = web.Application()
+    app.router.add_get("/{url:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", requests
+    await runner.cleanup()
@@ -0,0 +1,140 @@
+"""Tests for PerplexityArticleWriterWorker's single and sectioned modes."""
+
+import asyncio
+import json
+import pytest
+from litellm import RateLimitError
+from pynions.core.completion_stream import CompletionStream
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+from pynions.workers.perplexity_article_writer_worker import (
+    ARTICLE_SECTIONS,
+    RESEARCH_SECTIONS,
+    PerplexityArticleWriterWorker,
+)
+
+SHARED = "This paragraph about customer data platforms appears in two sections."
+
+
+class FakeLLM(LiteLLM):
+    """Streams an outline or a section after a delay, tracking overlap.
+
+    Calls whose prompt contains a key of fail raise that error instead.
+    """
+
+    def __init__(self, fail=None):
+        super().__init__({"model": "anthropic/claude-3-5-sonnet-20240620"})
+        self.fail = fail or {}
+        self.calls = []
+        self.running = self.peak = 0
+
+    def stream(self, input_data):
+        return CompletionStream(self._events(input_data))
+
+    async def _events(self, input_data):
+        prompt = input_data["messages"][-1]["content"]
+        self.calls.append(input_data)
+        for marker, errors in self.fail.items():
+            if marker in prompt and errors:
+                raise errors.pop(0)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+        if 'Write the section "' not in prompt:  # Outline call
+            points = {name: [f"{name} point"] for name in ARTICLE_SECTIONS}
+            text = json.dumps({"title": "What Is CDP", "sections": points})
+        else:
+            name = prompt.split('Write the section "')[1].split('"')[0]
+            text = f"## {name}\n\nAbout {name}.\n\n{SHARED}\n\n# Detail\n\nMore."
+        for i in range(0, len(text), 16):
+            yield {"delta": text[i : i + 16]}
+
+
+@pytest.fixture
+def research_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    sections = {
+        name: {
+            "choices": [{"message": {"content": f"<think>x</think>{name} facts"}}],
+            "citations": [f"https://example.com/{name}"],
+        }
+        for name in RESEARCH_SECTIONS
+    }
+    (tmp_path / "data/articles").mkdir(parents=True)
+    research = {"topic": "CDP", "audience": "marketers", "sections": sections}
+    (tmp_path / "data/articles/cdp.json").write_text(json.dumps(research))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_sections_are_written_concurrently(research_dir):
+    """Test that sections run in parallel and are joined in outline order."""
+    writer = PerplexityArticleWriterWorker({"mode": "sectioned"})
+    writer.llm = FakeLLM()
+
+    result = await writer.execute({})
+
+    assert writer.llm.peak == len(ARTICLE_SECTIONS)
+    assert len(writer.llm.calls) == len(ARTICLE_SECTIONS) + 1
+    article = (research_dir / result["file_path"]).read_text()
+    assert article.startswith("# What Is CDP\n\nAbout Introduction.")
+    headings = [line[3:] for line in article.splitlines() if line.startswith("## ")]
+    assert headings == [n for n in ARTICLE_SECTIONS if n != "Introduction"]
+    assert article.count(SHARED) == 1  # Repeated paragraph removed
+    assert "### Detail" in article
+
+    section_call = writer.llm.calls[2]  # Core Principles
+    prompt = section_call["messages"][-1]["content"]
+    assert "methodology facts" in prompt and "benefits facts" not in prompt
+    assert section_call["max_tokens"] < 8192  # Own budget, not the whole article's
+
+
+def overloaded():
+    return RateLimitError("Overloaded", "anthropic", "claude-3-5-sonnet")
+
+
+@pytest.mark.asyncio
+async def test_single_article_is_retried_after_a_rate_limit(research_dir, monkeypatch):
+    """Test that a rate-limited article stream starts again instead of failing."""
+    monkeypatch.setattr(litellm_plugin, "RETRY_DELAY", 0)
+    writer = PerplexityArticleWriterWorker()
+    writer.llm = FakeLLM(fail={"": [overloaded()]})
+
+    result = await writer.execute({})
+
+    assert len(writer.llm.calls) == 2
+    path = research_dir / result["file_path"]
+    assert path.read_text()
+    assert not path.with_name(path.name + ".partial").exists()
+
+
+@pytest.mark.asyncio
+async def test_overloaded_section_is_retried(research_dir, monkeypatch):
+    """Test that a rate-limited section is written again on its own."""
+    monkeypatch.setattr(litellm_plugin, "RETRY_DELAY", 0)
+    writer = PerplexityArticleWriterWorker({"mode": "sectioned"})
+    writer.llm = FakeLLM(fail={'Write the section "Benefits': [overloaded()]})
+
+    result = await writer.execute({})
+
+    assert len(writer.llm.calls) == len(ARTICLE_SECTIONS) + 2
+    article = (research_dir / result["file_path"]).read_text()
+    assert "## Benefits & ROI" in article
+
+
+@pytest.mark.asyncio
+async def test_failed_section_keeps_the_others(research_dir, monkeypatch):
+    """Test that one failing section leaves the written sections in place."""
+    writer = PerplexityArticleWriterWorker({"mode": "sectioned"})
+    writer.llm = FakeLLM(fail={'Write the section "Benefits': [ValueError("bad")]})
+    topic, audience = "CDP", "marketers"
+    research = json.loads((research_dir / "data/articles/cdp.json").read_text())
+
+    article, stats = await writer._write_sectioned(topic, audience, research)
+
+    assert stats["failed"] == ["Benefits & ROI"]
+    assert len(stats["sections"]) == len(ARTICLE_SECTIONS) - 1
+    assert "## Benefits & ROI" not in article
+    assert "## Getting Started" in article
@@ -0,0 +1,201 @@
+"""Tests for batch completions against a local stand-in batch server."""
+
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from pynions.core.batch import BatchError, BatchQueue, OpenAIBatchBackend
+from pynions.core.ledger import estimate_cost, get_ledger
+from pynions.core.transport import HTTPStatusError
+from pynions.plugins.litellm_plugin import LiteLLM
+
+
+def completion(body):
+    """Answer a chat request the way the stand-in model does."""
+    prompt = body["messages"][-1]["content"]
+    return {
+        "model": body["model"],
+        "choices": [{"message": {"role": "assistant", "content": f"echo: {prompt}"}}],
+        "usage": {"prompt_tokens": 2, "completion_tokens": 3, "total_tokens": 5},
+    }
+
+
+@pytest.fixture
+async def batch_server():
+    """OpenAI-style Files and Batches API; batches finish on the second poll."""
+    state = {"files": {}, "batches": {}, "polls": {}, "creates": 0, "fail": 0}
+
+    async def upload(request):
+        form = await request.post()
+        assert form["purpose"] == "batch"
+        file_id = f"file-{len(state['files'])}"
+        state["files"][file_id] = form["file"].file.read().decode()
+        return web.json_response({"id": file_id})
+
+    async def create(request):
+        state["creates"] += 1
+        if state["fail"]:
+            state["fail"] -= 1
+            return web.json_response({"error": "unavailable"}, status=503)
+        data = await request.json()
+        batch_id = f"batch-{len(state['batches'])}"
+        state["batches"][batch_id] = data["input_file_id"]
+        state["polls"][batch_id] = 0
+        return web.json_response({"id": batch_id, "status": "validating"})
+
+    async def retrieve(request):
+        batch_id = request.match_info["id"]
+        state["polls"][batch_id] += 1
+        if state["polls"][batch_id] < 2:
+            return web.json_response({"id": batch_id, "status": "in_progress"})
+        lines = []
+        for line in state["files"][state["batches"][batch_id]].splitlines():
+            item = json.loads(line)
+            if item["body"]["messages"][-1]["content"] == "fail":
+                reply = {"status_code": 400, "body": {"error": {"message": "bad"}}}
+            else:
+                reply = {"status_code": 200, "body": completion(item["body"])}
+            lines.append(
+                json.dumps({"custom_id": item["custom_id"], "response": reply})
+            )
+        output_id = f"file-out-{batch_id}"
+        state["files"][output_id] = "\n".join(lines)
+        return web.json_response(
+            {"id": batch_id, "status": "completed", "output_file_id": output_id}
+        )
+
+    async def content(request):
+        return web.Response(text=state["files"][request.match_info["id"]])
+
+    app = web.Application()
+    app.router.add_post("/v1/files", upload)
+    app.router.add_post("/v1/batches", create)
+    app.router.add_get("/v1/batches/{id}", retrieve)
+    app.router.add_get("/v1/files/{id}/content", content)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    state["url"] = f"http://127.0.0.1:{port}/v1"
+    yield state
+    await runner.cleanup()
+
+
+def chat(prompt):
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": prompt}]}
+
+
+def make_queue(server, tmp_path):
+    return BatchQueue(
+        OpenAIBatchBackend("test-key", base_url=server["url"]),
+        state_path=tmp_path / "batches.json",
+        flush_interval=0.02,
+        poll_interval=0.02,
+    )
+
+
+@pytest.mark.asyncio
+async def test_requests_are_batched_and_mapped_back(batch_server, tmp_path):
+    """Test that concurrent callers share one batch and get their own answers."""
+    queue = make_queue(batch_server, tmp_path)
+    prompts = ["a", "b", "c", "a"]
+
+    results = await asyncio.gather(
+        *(queue.submit(chat(p)) for p in prompts), return_exceptions=True
+    )
+
+    answers = [r["choices"][0]["message"]["content"] for r in results]
+    assert answers == ["echo: a", "echo: b", "echo: c", "echo: a"]
+    assert len(batch_server["batches"]) == 1
+    assert len(batch_server["files"]["file-0"].splitlines()) == 3  # "a" sent once
+
+    with pytest.raises(BatchError, match="bad"):
+        await queue.submit(chat("fail"))
+
+
+@pytest.mark.asyncio
+async def test_flush_timer_restarts_on_each_new_request(batch_server, tmp_path):
+    """Test that the batch waits flush_interval after its newest request."""
+    queue = make_queue(batch_server, tmp_path)
+    queue.flush_interval = 60
+    first = asyncio.ensure_future(queue.submit(chat("a")))
+    await asyncio.sleep(0.01)
+    deadline = queue._flush_timer.when()
+
+    second = asyncio.ensure_future(queue.submit(chat("b")))
+    await asyncio.sleep(0.01)
+    assert queue._flush_timer.when() > deadline
+
+    await queue.flush()
+    await asyncio.gather(first, second)
+    assert len(batch_server["batches"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_open_batches_survive_a_restart(batch_server, tmp_path):
+    """Test that a restarted process collects results without resubmitting."""
+    first = make_queue(batch_server, tmp_path)
+    caller = asyncio.ensure_future(first.submit(chat("hello")))
+    while not first.stats()["open_batches"]:  # Submitted and saved
+        await asyncio.sleep(0.01)
+    caller.cancel()  # The process dies while the batch is running
+    first._poller.cancel()
+
+    second = make_queue(batch_server, tmp_path)
+    assert second.stats()["open_batches"] == 1
+    await second.resume()
+    result = await second.submit(chat("hello"))
+
+    assert result["choices"][0]["message"]["content"] == "echo: hello"
+    assert len(batch_server["batches"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_submit_is_not_retried(batch_server):
+    """Test that a failed batch create is not sent again behind our back."""
+    backend = OpenAIBatchBackend("test-key", base_url=batch_server["url"])
+    batch_server["fail"] = 1
+
+    with pytest.raises(HTTPStatusError):
+        await backend.submit({"a": chat("x")})
+
+    assert batch_server["creates"] == 1
+
+
+def test_each_api_key_has_its_own_state_file():
+    """Test that queues for different keys don't share one state file."""
+    paths = [
+        BatchQueue(OpenAIBatchBackend(key)).state_path
+        for key in ("key-a", "key-b", "key-a")
+    ]
+
+    assert paths[0] != paths[1]
+    assert paths[0] == paths[2]  # Found again after a restart
+    assert "key-a" not in str(paths[0])
+
+
+async def test_litellm_batch_mode(batch_server, monkeypatch):
+    """Test that LiteLLM's batch option goes through the batch queue."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BATCH_BASE_URL", batch_server["url"])
+    monkeypatch.setenv("PYNIONS_BATCH_FLUSH_INTERVAL", "0.02")
+    monkeypatch.setenv("PYNIONS_BATCH_POLL_INTERVAL", "0.02")
+    llm = LiteLLM({"batch": True, "temperature": 0})
+
+    results = await asyncio.gather(
+        *(llm.execute({"messages": [{"role": "user", "content": p}]}) for p in "xy")
+    )
+
+    assert [r["choices"][0]["message"]["content"] for r in results] == [
+        "echo: x",
+        "echo: y",
+    ]
+    assert results[0]["usage"]["total_tokens"] == 5
+    assert len(batch_server["batches"]) == 1
+
+    (row,) = get_ledger().summary(by="kind")
+    assert row["kind"] == "batch" and row["calls"] == 2
+    usage = results[0]["usage"]
+    batch_cost = estimate_cost("openai", "gpt-4o-mini", usage, batch=True)
+    assert 0 < batch_cost < estimate_cost("openai", "gpt-4o-mini", usage)
@@ -0,0 +1,81 @@
+"""Tests for token estimation and prompt budgeting."""
+
+from types import SimpleNamespace
+import pytest
+from pynions.core.budget import (
+    TRUNCATION_MARKER,
+    TokenBudget,
+    TokenBudgetError,
+    truncate,
+)
+from pynions.core.tokens import context_window, estimate_tokens
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+
+
+def test_estimates_and_context_windows():
+    """Test the local estimate and longest-prefix window lookup."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcde") == 2
+    assert context_window("gpt-4o-mini") == 128000
+    assert context_window("gpt-4") == 8192
+    assert context_window("anthropic/claude-3-5-sonnet-20240620") == 200000
+    assert context_window("some-new-model") == 128000
+
+
+def test_allocate_gives_short_texts_everything():
+    """Test that short inputs stay whole and long ones share the rest."""
+    budget = TokenBudget("gpt-4o-mini")
+    texts = {"short": "a" * 40, "long": "b" * 4000, "longer": "c" * 8000}
+
+    fitted = budget.allocate(texts, 510)
+
+    assert fitted["short"] == texts["short"]
+    assert fitted["long"].endswith(TRUNCATION_MARKER)
+    assert fitted["longer"].endswith(TRUNCATION_MARKER)
+    assert sum(estimate_tokens(t) for t in fitted.values()) <= 510
+    assert abs(len(fitted["long"]) - len(fitted["longer"])) < 10
+
+
+def test_truncate_prefers_boundaries_and_can_keep_tail():
+    """Test that cuts land on paragraph ends and keep closing text."""
+    text = "First paragraph here.\n\n" + "x" * 400 + "\n\nWrite it now."
+    assert truncate(text, 10) == "First paragraph here." + TRUNCATION_MARKER
+    kept = truncate(text, 40, keep_tail=True)
+    assert kept.startswith("First paragraph here.")
+    assert kept.endswith("Write it now.")
+    assert estimate_tokens(kept) <= 40
+
+
+def test_fit_messages_reserves_room_for_the_answer():
+    """Test that max_tokens is reserved and the longest message is trimmed."""
+    budget = TokenBudget("gpt-4", max_tokens=4000, reserve=0)
+    messages = [
+        {"role": "system", "content": "Be precise."},
+        {"role": "user", "content": "y" * 40000},
+    ]
+    fitted = budget.fit_messages(messages)
+    assert fitted[0] == messages[0]
+    assert budget.fits(fitted)
+    assert messages[1]["content"] == "y" * 40000  # Input left untouched
+
+    with pytest.raises(TokenBudgetError):
+        TokenBudget("gpt-4", max_tokens=8190, reserve=0).fit_messages(messages)
+
+
+@pytest.mark.asyncio
+async def test_litellm_fails_fast_when_prompt_cannot_fit(monkeypatch):
+    """Test that an impossible prompt is rejected without calling the API."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    calls = []
+
+    async def acompletion(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace()
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    llm = LiteLLM({"model": "gpt-4", "max_tokens": 8192})
+
+    with pytest.raises(TokenBudgetError):
+        await llm.execute({"messages": [{"role": "user", "content": "Hi"}]})
+    assert calls == []
@@ -0,0 +1,219 @@
+"""Tests for the persistent SQLite caches."""
+
+import asyncio
+import gzip
+import json
+import multiprocessing
+import time
+from types import SimpleNamespace
+import pytest
+from aiohttp import web
+from pynions.core import cache as cache_module
+from pynions.core.cache import ResponseCache, SQLiteCache, StaleWhileRevalidateCache
+from pynions.plugins.frase import Frase
+from pynions.plugins.jina import JinaAIReader
+from pynions.plugins.serper import DAY, HOUR, SerperWebSearch
+
+
+def test_set_get_and_expiry(tmp_path):
+    """Test that entries round-trip and report freshness."""
+    cache = SQLiteCache("test", path=tmp_path / "cache.db")
+    cache.set("a", b"value", ttl=60, meta={"etag": "x"})
+    cache.set("b", b"old", ttl=-1)
+
+    entry = cache.get("a")
+    assert entry.value == b"value"
+    assert entry.meta == {"etag": "x"}
+    assert entry.fresh
+    assert not cache.get("b").fresh
+    assert cache.get("missing") is None
+
+
+def test_lru_eviction_by_total_bytes(tmp_path):
+    """Test that the least recently used entries are evicted first."""
+    cache = SQLiteCache("test", path=tmp_path / "cache.db", max_bytes=250)
+    cache.set("a", b"x" * 100)
+    time.sleep(0.01)
+    cache.set("b", b"x" * 100)
+    time.sleep(0.01)
+    cache.get("a")  # "a" is now more recently used than "b"
+    time.sleep(0.01)
+    cache.set("c", b"x" * 100)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 200
+
+
+def test_namespaces_are_isolated(tmp_path):
+    """Test that namespaces share a file but not entries."""
+    first = SQLiteCache("one", path=tmp_path / "cache.db")
+    second = SQLiteCache("two", path=tmp_path / "cache.db")
+    first.set("k", b"1")
+    assert second.get("k") is None
+
+
+def _write_entries(path, worker):
+    cache = SQLiteCache("shared", path=path)
+    for i in range(25):
+        cache.set(f"{worker}-{i}", b"x" * 10)
+        cache.incr("writes")
+
+
+def test_concurrent_writers_across_processes(tmp_path):
+    """Test that several processes can write to the same cache file."""
+    path = tmp_path / "cache.db"
+    SQLiteCache("shared", path=path)
+    processes = [
+        multiprocessing.Process(target=_write_entries, args=(path, worker))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert all(process.exitcode == 0 for process in processes)
+    stats = SQLiteCache("shared", path=path).stats()
+    assert stats["entries"] == 100
+    assert stats["writes"] == 100
+
+
+def test_response_cache_key_normalizes_urls(tmp_path):
+    """Test that equivalent URLs and options share a key."""
+    cache = ResponseCache("jina", ttl=60, path=tmp_path / "cache.db")
+    assert cache.key("https://Example.com/pricing/", {"a": 1}) == cache.key(
+        "https://example.com/pricing", {"a": 1}
+    )
+    assert cache.key("https://example.com/", {"a": 1}) != cache.key(
+        "https://example.com/", {"a": 2}
+    )
+
+
+@pytest.mark.asyncio
+async def test_jina_cache_hit_and_revalidation(jina_server):
+    """Test fresh hits, then a 304 revalidation once the entry is stale."""
+    base_url, requests = jina_server
+    reader = JinaAIReader({"cache": True, "cache_ttl": 0.2, "coalesce": False})
+    reader.base_url = base_url
+
+    first = await reader.execute({"url": "https://example.com/pricing"})
+    second = await reader.execute({"url": "https://example.com/pricing"})
+    assert first["content"] == second["content"] == "Plan details."
+    assert len(requests) == 1
+
+    await asyncio.sleep(0.3)
+    third = await reader.execute({"url": "https://example.com/pricing"})
+
+    assert third["content"] == "Plan details."
+    assert len(requests) == 2
+    assert requests[-1].headers["If-None-Match"] == '"v1"'
+    stats = reader.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["revalidated"] == 1
+    assert stats["bytes_saved"] > 0
+
+
+@pytest.mark.asyncio
+async def test_frase_cache_hit_and_miss(monkeypatch):
+    """Test that a repeated Frase request is served from the cache."""
+    monkeypatch.setenv("FRASE_API_KEY", "test-key")
+    body = gzip.compress(json.dumps({"items": [{"title": "CRM"}] * 50}).encode())
+    requests = []
+
+    async def handler(request):
+        requests.append(await request.json())
+        return web.Response(
+            body=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+
+    app = web.Application()
+    app.router.add_post("/process_serp", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    frase = Frase({"cache": True})
+    frase.base_url = f"http://127.0.0.1:{port}/process_serp"
+    try:
+        params = {"serp_urls": ["https://example.com/crm"]}
+        first = await frase.execute(params)
+        second = await frase.execute(params)
+        other = await frase.execute({"serp_urls": ["https://example.com/seo"]})
+    finally:
+        await runner.cleanup()
+
+    assert first == second == other
+    assert first["items"][0]["title"] == "CRM"
+    assert len(requests) == 2
+    stats = frase.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["bytes_saved"] == len(body)  # Compressed size, as sent
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(tmp_path, monkeypatch):
+    """Test fresh hits, stale hits with background refresh, and misses."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: clock.now))
+    cache = StaleWhileRevalidateCache("serp", path=tmp_path / "cache.db")
+    release = asyncio.Event()
+    release.set()
+    calls = []
+
+    async def fetch():
+        calls.append(clock.now)
+        await release.wait()
+        return {"version": len(calls)}
+
+    assert await cache.get("q", fetch, 0.1, 0.3) == ({"version": 1}, "miss")
+    assert await cache.get("q", fetch, 0.1, 0.3) == ({"version": 1}, "fresh")
+
+    clock.now += 0.15
+    release.clear()  # Keep the background refresh in flight
+    # Stale: served immediately, with exactly one refresh behind the scenes
+    assert await cache.get("q", fetch, 0.1, 0.3) == ({"version": 1}, "stale")
+    assert await cache.get("q", fetch, 0.1, 0.3) == ({"version": 1}, "stale")
+    release.set()
+    await cache.drain()
+    assert len(calls) == 2
+    assert await cache.get("q", fetch, 0.1, 0.3) == ({"version": 2}, "fresh")
+
+    clock.now += 0.45
+    assert await cache.get("q", fetch, 0.1, 0.3) == ({"version": 3}, "miss")
+    assert cache.stats()["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_is_not_cached(tmp_path):
+    """Test that a None result is returned but never stored."""
+    cache = StaleWhileRevalidateCache("serp", path=tmp_path / "cache.db")
+
+    async def fetch():
+        return None
+
+    assert await cache.get("q", fetch, 60) == (None, "miss")
+    assert cache.store.get("q") is None
+
+
+def test_serper_freshness_policies(monkeypatch, tmp_path):
+    """Test that query patterns pick the right freshness windows."""
+    monkeypatch.setenv("SERPER_API_KEY", "test-key")
+    monkeypatch.setenv("PYNIONS_CACHE_DIR", str(tmp_path))
+    searcher = SerperWebSearch({"cache": True})
+
+    assert searcher._freshness("site:notion.so pricing") == (7 * DAY, 30 * DAY)
+    assert searcher._freshness("ai marketing news") == (HOUR / 2, 2 * HOUR)
+    assert searcher._freshness("best crm software") == (DAY, 7 * DAY)
+
+    custom = SerperWebSearch(
+        {"cache": True, "cache_policies": [{"pattern": "crm", "fresh": 5}]}
+    )
+    assert custom._freshness("best crm software") == (5, 0)
+    assert custom._freshness("best email tools") == (0, 0)
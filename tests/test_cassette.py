@@ -0,0 +1,30 @@
+"""Tests for the record/replay cassette layer."""
+
+import asyncio
+import time
+import pytest
+from pynions.core.cassette import Cassette
+
+
+@pytest.mark.asyncio
+async def test_replay_latency(tmp_path):
+    """Test that replay can reproduce the recorded latency."""
+    path = tmp_path / "cassette.jsonl"
+    recorder = Cassette(path, mode="record")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    await recorder.intercept({"kind": "test"}, slow)
+
+    player = Cassette(path, mode="replay", replay_latency=True)
+    start = time.perf_counter()
+    assert await player.intercept({"kind": "test"}, slow) == {"ok": True}
+    assert time.perf_counter() - start >= 0.04
+
+
+def test_invalid_mode(tmp_path):
+    """Test that unknown modes are rejected."""
+    with pytest.raises(ValueError, match="Invalid cassette mode"):
+        Cassette(tmp_path / "c.jsonl", mode="rewind")
@@ -0,0 +1,111 @@
+"""Tests for CompanyDataWorker's single-call and map-reduce extraction."""
+
+import asyncio
+import json
+import pytest
+from litellm import RateLimitError
+from pynions.core.completion_stream import CompletionStream
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+from pynions.workers.company_data_worker import CompanyDataWorker
+
+PAGES = {
+    "https://acme.com/pricing": "Starter: $10/month. " * 50,
+    "https://acme.com/plans": "Pro: $30/month. " * 50,
+    "https://acme.com/enterprise": "Enterprise: contact sales. " * 50,
+}
+
+
+class FakeSerper:
+    async def execute(self, input_data):
+        organic = [{"link": url, "title": url} for url in PAGES]
+        return {"organic": organic, "credits": 1}
+
+
+class FakeJina:
+    async def execute(self, input_data):
+        return {"content": PAGES[input_data["url"]]}
+
+
+class FakeLLM(LiteLLM):
+    """Answers extraction calls with JSON after a delay, tracking overlap.
+
+    Errors queued in fail are raised by the next calls instead.
+    """
+
+    def __init__(self):
+        super().__init__({"model": "gpt-4o-mini", "max_tokens": 1000})
+        self.fail = []
+        self.prompts = []
+        self.running = self.peak = 0
+
+    def stream(self, input_data):
+        return CompletionStream(self._events(input_data["messages"][-1]["content"]))
+
+    async def _events(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise self.fail.pop(0)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+        if prompt.startswith("["):  # Merge call
+            plans = [p for item in json.loads(prompt) for p in item["data"]["plans"]]
+            answer = {"plans": sorted(set(plans))}
+        else:
+            answer = {"plans": [p for p in ("Starter", "Pro") if p in prompt]}
+        content = f"```json\n{json.dumps(answer)}\n```"
+        for i in range(0, len(content), 8):
+            yield {"delta": content[i : i + 8]}
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    def build(mode):
+        monkeypatch.setenv("SERPER_API_KEY", "test")
+        monkeypatch.setenv("JINA_API_KEY", "test")
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        worker = CompanyDataWorker({"mode": mode})
+        worker.serper, worker.jina, worker.llm = FakeSerper(), FakeJina(), FakeLLM()
+        return worker
+
+    return build
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_extracts_pages_concurrently(worker):
+    """Test that pages are analyzed in parallel and merged in a small call."""
+    w = worker("map_reduce")
+
+    result = await w.execute({"domain": "acme.com", "data_type": "pricing"})
+
+    assert result["analyzed_data"] == {"plans": ["Pro", "Starter"]}
+    assert w.llm.peak == 3  # One concurrent call per page
+    assert len(w.llm.prompts) == 4
+    assert len(w.llm.prompts[-1]) < 500  # Merge sees results, not pages
+    assert result["sources"][0]["extracted"] == {"plans": ["Starter"]}
+
+
+@pytest.mark.asyncio
+async def test_single_mode_sends_one_call(worker):
+    """Test the default mode combines pages into one extraction call."""
+    w = worker("single")
+
+    result = await w.execute({"domain": "acme.com", "data_type": "pricing"})
+
+    assert result["analyzed_data"] == {"plans": ["Starter", "Pro"]}
+    assert len(w.llm.prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_extraction_is_retried(worker, monkeypatch):
+    """Test that an overloaded extraction call is made again, not dropped."""
+    monkeypatch.setattr(litellm_plugin, "RETRY_DELAY", 0)
+    w = worker("single")
+    w.llm.fail = [RateLimitError("Overloaded", "openai", "gpt-4o-mini")]
+
+    result = await w.execute({"domain": "acme.com", "data_type": "pricing"})
+
+    assert result["analyzed_data"] == {"plans": ["Starter", "Pro"]}
+    assert len(w.llm.prompts) == 2
@@ -0,0 +1,89 @@
+"""Tests for the exact-match LLM completion cache."""
+
+import asyncio
+import pytest
+from pynions.core.cache import CompletionCache
+from pynions.plugins.litellm_plugin import LiteLLM
+from pynions.plugins.perplexity import PerplexityAPI
+
+MESSAGES = {"messages": [{"role": "user", "content": "Hi"}]}
+
+
+@pytest.mark.asyncio
+async def test_deterministic_requests_are_cached(fake_acompletion):
+    """Test that a repeat at temperature 0 costs nothing upstream."""
+    llm = LiteLLM({"cache": True, "temperature": 0})
+
+    first = await llm.execute(MESSAGES)
+    second = await llm.execute(MESSAGES)
+
+    assert second == first
+    assert len(fake_acompletion["calls"]) == 1
+    stats = llm.cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["tokens_saved"] == 5
+
+
+@pytest.mark.asyncio
+async def test_nondeterministic_requests_need_opt_in(fake_acompletion):
+    """Test that sampled completions are only reused when asked for."""
+    llm = LiteLLM({"cache": True, "temperature": 0.7})
+    await llm.execute(MESSAGES)
+    await llm.execute(MESSAGES)
+    assert len(fake_acompletion["calls"]) == 2
+    assert llm.cache.stats()["skipped"] == 2
+
+    llm = LiteLLM({"cache": True, "temperature": 0.7, "cache_nondeterministic": True})
+    await llm.execute(MESSAGES)
+    await llm.execute(MESSAGES)
+    assert len(fake_acompletion["calls"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_is_stored_and_replayed(fake_acompletion):
+    """Test that streamed and regular calls share entries."""
+    llm = LiteLLM({"cache": True, "temperature": 0})
+
+    async with llm.stream(MESSAGES) as stream:
+        assert [delta async for delta in stream] == ["ok", " go"]
+    async with llm.stream(MESSAGES) as replay:
+        assert [delta async for delta in replay] == ["ok go"]
+    result = await llm.execute(MESSAGES)
+
+    assert fake_acompletion["calls"] == [True]
+    assert replay.usage["total_tokens"] == 5
+    assert result["choices"][0]["message"]["content"] == "ok go"
+
+
+@pytest.mark.asyncio
+async def test_keys_ttl_and_incomplete_streams(tmp_path):
+    """Test canonical keys, expiry and that abandoned streams aren't cached."""
+    cache = CompletionCache("test", ttl=0.05, path=tmp_path / "c.sqlite3")
+    a = {"model": "m", "temperature": 0, "messages": [{"role": "user"}]}
+    b = {"messages": [{"role": "user"}], "temperature": 0, "model": "m"}
+    assert cache.key(a) == cache.key({**b, "stream": True})
+    assert cache.key(a) != cache.key({**a, "max_tokens": 10})
+
+    response = {"choices": [{"message": {"content": "hi"}}], "usage": None}
+    await cache.put(a, response)
+    assert await cache.get(b) == response
+    await asyncio.sleep(0.06)
+    assert await cache.get(a) is None
+
+    async def events():
+        yield {"delta": "partial"}
+        yield {"delta": " answer"}
+
+    stream = cache.stream(a, events)
+    assert await stream.__anext__() == {"delta": "partial"}
+    await stream.aclose()
+    assert await cache.get(a) is None
+
+
+def test_perplexity_cache_options_stay_out_of_payload(monkeypatch):
+    """Test that cache settings configure the client, not the API request."""
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "pplx-test")
+    api = PerplexityAPI({"cache": True, "cache_ttl": 60, "temperature": 0})
+    payload = api._payload(MESSAGES)
+    assert api.cache.ttl == 60
+    assert not {"cache", "cache_ttl"} & set(payload)
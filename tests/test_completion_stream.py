@@ -0,0 +1,258 @@
+"""Tests for streamed LiteLLM and Perplexity completions."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from aiohttp import web
+from pynions.core import ratelimit, transport
+from pynions.core.ledger import get_ledger
+from pynions.core.transport import get_metrics
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+from pynions.plugins.perplexity import PerplexityAPI
+
+MESSAGES = {"messages": [{"role": "user", "content": "Hi"}]}
+
+
+def chunk(content=None, usage=None):
+    """Build a LiteLLM-style streaming chunk."""
+    choices = (
+        []
+        if content is None
+        else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+    return SimpleNamespace(model="gpt-4o-mini", choices=choices, usage=usage)
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    """Replace litellm.acompletion with a slow token stream."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    calls = []
+
+    async def acompletion(**kwargs):
+        calls.append(kwargs)
+
+        async def tokens():
+            await asyncio.sleep(0.05)  # Time to first token
+            for word in ["Hello", " world", "!"]:
+                yield chunk(word)
+                await asyncio.sleep(0.01)
+            yield chunk(
+                usage=SimpleNamespace(
+                    prompt_tokens=5, completion_tokens=3, total_tokens=8
+                )
+            )
+
+        return tokens()
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_litellm_stream_yields_deltas_with_metrics(fake_stream):
+    """Test that deltas arrive incrementally and stats are filled in."""
+    llm = LiteLLM()
+
+    async with llm.stream(MESSAGES) as stream:
+        deltas = [delta async for delta in stream]
+
+    assert deltas == ["Hello", " world", "!"]
+    assert stream.text == "Hello world!"
+    assert stream.usage["completion_tokens"] == 3
+    stats = stream.stats.as_dict()
+    assert stats["ttft"] >= 0.045
+    assert stats["tokens_per_second"] > 0
+    assert not stats["estimated_tokens"]
+    assert fake_stream[0]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_litellm_execute_honours_stream_config(fake_stream):
+    """Test that stream=True in the config streams under execute()."""
+    llm = LiteLLM({"stream": True})
+
+    result = await llm.execute(MESSAGES)
+
+    assert result["choices"][0]["message"]["content"] == "Hello world!"
+    assert result["stream"]["chunks"] == 3
+
+
+@pytest.mark.asyncio
+async def test_litellm_stream_frees_its_slot_and_records_one_outcome(monkeypatch):
+    """Test that an open stream doesn't block calls and fails only once."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(transport, "_metrics", {})
+    release = asyncio.Event()
+
+    async def acompletion(**kwargs):
+        async def tokens():
+            yield chunk("Hello")
+            await release.wait()
+            raise ConnectionError("Connection reset")
+
+        return tokens()
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    llm = LiteLLM({"max_concurrency": 1})
+
+    async with llm.stream(MESSAGES) as first, llm.stream(MESSAGES) as second:
+        first_deltas, second_deltas = first.__aiter__(), second.__aiter__()
+        assert await first_deltas.__anext__() == "Hello"
+        # One slot, but the open first stream doesn't hold up the second
+        assert await asyncio.wait_for(second_deltas.__anext__(), 1) == "Hello"
+        release.set()
+        for deltas in (first_deltas, second_deltas):
+            with pytest.raises(ConnectionError):
+                await deltas.__anext__()
+
+    metrics = get_metrics("litellm").as_dict()
+    assert metrics["requests"] == 2 and metrics["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_litellm_stream_stopped_early_is_still_recorded(fake_stream):
+    """Test that an abandoned LiteLLM stream is charged and recorded at once."""
+    llm = LiteLLM({"tpm": 100000})
+
+    async with llm.stream(MESSAGES) as stream:
+        async for delta in stream:
+            break
+
+    totals = get_ledger().totals("run")
+    assert totals["calls"] == 1
+    assert totals["tokens"] > 1  # The prompt plus "Hello", counted locally
+    rate = ratelimit.get_rate_scheduler("openai", llm.model, llm.config)
+    assert rate.usage()["tokens"] == totals["tokens"]
+
+
+@pytest.fixture
+async def perplexity_server(monkeypatch):
+    """Local Perplexity stand-in that sends server-sent events."""
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "pplx-test")
+
+    async def handler(request):
+        payload = await request.json()
+        assert payload["stream"] is True
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, word in enumerate(["Pynions", " is", " fast"]):
+            data = {
+                "model": "sonar",
+                "citations": ["https://example.com"],
+                "choices": [{"delta": {"content": word}}],
+            }
+            if i == 2:
+                data["usage"] = {"completion_tokens": 3}
+            # Split one event across writes to exercise line buffering
+            line = f"data: {json.dumps(data)}\n\n".encode()
+            await response.write(line[:10])
+            await response.write(line[10:])
+            await asyncio.sleep(0.01)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/chat/completions"
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_perplexity_stream_parses_events(perplexity_server):
+    """Test that SSE lines become deltas, citations and usage."""
+    api = PerplexityAPI()
+    api.base_url = perplexity_server
+
+    stream = api.stream(MESSAGES)
+    first = await stream.__aiter__().__anext__()
+    assert first == "Pynions"
+    assert stream.citations == ["https://example.com"]  # Before the answer ends
+
+    result = await stream.collect()
+    assert result["choices"][0]["message"]["content"] == "Pynions is fast"
+    assert result["usage"] == {"completion_tokens": 3}
+    assert result["stream"]["ttft"] is not None
+
+
+@pytest.mark.asyncio
+async def test_stream_stopped_early_is_still_recorded(perplexity_server):
+    """Test that an abandoned stream's tokens reach the ledger, estimated."""
+    api = PerplexityAPI({"tpm": 100000})
+    api.base_url = perplexity_server
+
+    async with api.stream(MESSAGES) as stream:
+        async for delta in stream:
+            break
+
+    totals = get_ledger().totals("run")
+    assert totals["calls"] == 1
+    assert totals["tokens"] > 1  # The prompt plus "Pynions", counted locally
+    rate = ratelimit.get_rate_scheduler("perplexity", api.config["model"], api.config)
+    assert rate.usage()["tokens"] == totals["tokens"]  # Charged, not released
+    assert rate.completion_ratio == 1.0  # Nothing learned from a cut-off stream
+
+
+@pytest.fixture
+async def reasoning_server(monkeypatch):
+    """Perplexity stand-in for a reasoning model, with CRLF line endings."""
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "pplx-test")
+    release = asyncio.Event()
+
+    async def handler(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": ping\r\n\r\n")
+        first = {
+            "model": "sonar-reasoning-pro",
+            "search_results": [{"title": "Docs", "url": "https://example.com/docs"}],
+            "choices": [{"delta": {"content": "<thi"}}],
+        }
+        await response.write(f"data: {json.dumps(first)}\r\n\r\n".encode())
+        await release.wait()  # Hold the answer until citations were used
+        for word in ["nk>Look it up</th", "ink>Pynions", " is fast"]:
+            data = {"choices": [{"delta": {"content": word}}]}
+            await response.write(f"data: {json.dumps(data)}\r\n\r\n".encode())
+        await response.write(b"data: [DONE]\r\n\r\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/chat/completions", release
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_perplexity_stream_splits_reasoning(reasoning_server):
+    """Test that citations arrive early and <think> text is kept apart."""
+    url, release = reasoning_server
+    api = PerplexityAPI()
+    api.base_url = url
+    stream = api.stream(MESSAGES)
+
+    async def read():
+        return [segment async for segment in stream.segments()]
+
+    reader = asyncio.ensure_future(read())
+    citations = await asyncio.wait_for(stream.wait_citations(), 5)
+    assert citations == ["https://example.com/docs"]
+    assert not stream.done
+    release.set()
+    segments = await reader
+
+    assert "".join(t for kind, t in segments if kind == "think") == "Look it up"
+    assert "".join(t for kind, t in segments if kind == "answer") == "Pynions is fast"
+    assert stream.reasoning == "Look it up"
+    assert stream.answer == "Pynions is fast"
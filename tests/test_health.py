@@ -0,0 +1,72 @@
+"""Tests for negative caching and URL health scores."""
+
+import time
+import pytest
+from pynions.core.health import URLHealth, classify_status, get_url_health
+from pynions.plugins.jina import JinaAIReader
+
+
+def test_classify_status():
+    """Test that only URL-specific failures are classified."""
+    assert classify_status(404) == "not_found"
+    assert classify_status(403) == "blocked"
+    assert classify_status(400) == "client_error"
+    assert classify_status(503) == "server_error"
+    assert classify_status(401) is None
+    assert classify_status(429) is None
+    assert classify_status(200) is None
+
+
+def test_failure_is_negatively_cached_until_ttl(monkeypatch, tmp_path):
+    """Test that failures expire after their error-class TTL."""
+    tracker = URLHealth(path=tmp_path / "health.sqlite3")
+    tracker.record_failure("https://Example.com/pricing/", "timeout")
+
+    assert tracker.known_bad("https://example.com/pricing") == "timeout"
+
+    later = time.time() + 11 * 60
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert tracker.known_bad("https://example.com/pricing") is None
+
+
+def test_rank_drops_bad_urls_and_prefers_healthy_domains(tmp_path):
+    """Test that ranking skips known-bad URLs and demotes flaky domains."""
+    tracker = URLHealth(path=tmp_path / "health.sqlite3")
+    tracker.record_failure("https://flaky.com/a", "server_error")
+    tracker.record_failure("https://dead.com/pricing", "not_found")
+    tracker.record_success("https://good.com/a")
+
+    ranked = tracker.rank(
+        [
+            {"link": "https://dead.com/pricing"},
+            {"link": "https://flaky.com/b"},
+            {"link": "https://good.com/b"},
+            {"link": "https://new.com/"},
+        ],
+        key=lambda r: r["link"],
+    )
+
+    links = [r["link"] for r in ranked]
+    assert "https://dead.com/pricing" not in links
+    assert links[-1] == "https://flaky.com/b"
+    assert set(links[:2]) == {"https://good.com/b", "https://new.com/"}
+
+    tracker.record_success("https://flaky.com/a")
+    assert tracker.known_bad("https://flaky.com/a") is None
+
+
+@pytest.mark.asyncio
+async def test_jina_skips_known_bad_url(jina_server):
+    """Test that a failed URL is not fetched again while negatively cached."""
+    base_url, requests = jina_server
+    reader = JinaAIReader({"coalesce": False})
+    reader.base_url = base_url
+
+    assert await reader.execute({"url": "https://example.com/missing"}) is None
+    assert await reader.execute({"url": "https://example.com/missing"}) is None
+    assert len(requests) == 1
+    assert get_url_health().known_bad("https://example.com/missing") == "not_found"
+
+    assert await reader.execute({"url": "https://example.com/ok"})
+    # The page succeeded but still shares a domain with the failed one
+    assert 0.5 < get_url_health().score("https://example.com/ok") < 1.0
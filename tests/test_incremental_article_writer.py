@@ -0,0 +1,83 @@
+"""Tests for pipelined, resumable incremental article writing."""
+
+import asyncio
+import pytest
+from pynions.scripts.incremental_article_writer import (
+    SECTIONS,
+    IncrementalArticleWriter,
+)
+
+
+class FakePerplexity:
+    """Researches and writes with a delay, tracking overlap.
+
+    Fails on the fail_on section once.
+    """
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.log = []
+        self.running = self.peak = 0
+
+    async def execute(self, input_data):
+        prompt = input_data["messages"][-1]["content"]
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.02)
+        self.running -= 1
+        if prompt.startswith("Research "):
+            section = prompt.split()[1]
+            self.log.append(("research", section))
+            content = f"{section} facts"
+        else:
+            section = prompt.split()[2]
+            self.log.append(("write", section))
+            if section == self.fail_on:
+                self.fail_on = None
+                raise ValueError("Connection dropped")
+            content = f"## {section}"
+        return {"choices": [{"message": {"content": content}}], "citations": []}
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "pplx-test")
+    writer = IncrementalArticleWriter()
+    writer.perplexity = FakePerplexity()
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_research_runs_ahead_of_writing(writer):
+    """Test that pipelining overlaps research with writing, in order."""
+    serial = await writer.generate_article("CRM", research_ahead=0, resume=False)
+    assert writer.perplexity.peak == 1
+
+    path = await writer.generate_article("SEO", research_ahead=2, resume=False)
+
+    assert writer.perplexity.peak > 1  # Research overlapped writing
+    with open(path) as f:
+        headings = [line[3:] for line in f if line.startswith("## ")]
+    assert [h.strip() for h in headings] == SECTIONS
+    with open(serial) as f:
+        assert f.read().count("## ") == len(SECTIONS)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_article_resumes(writer):
+    """Test that a rerun continues after the last finished section."""
+    writer.perplexity = FakePerplexity(fail_on="benefits")
+    assert await writer.generate_article("CRM") is None
+
+    writer.perplexity.log.clear()
+    path = await writer.generate_article("CRM")
+
+    written = [s for kind, s in writer.perplexity.log if kind == "write"]
+    assert written == SECTIONS[SECTIONS.index("benefits") :]
+    with open(path) as f:
+        text = f.read()
+    assert text.startswith("# What Is CRM")
+    assert [line[3:] for line in text.splitlines() if line.startswith("## ")] == (
+        SECTIONS
+    )
@@ -0,0 +1,132 @@
+"""Tests for validating streamed JSON answers."""
+
+import json
+import pytest
+from pynions.core.completion_stream import CompletionStream
+from pynions.core.jsonstream import (
+    IncrementalJSONValidator,
+    JSONStreamError,
+    parse_stream,
+)
+
+SCHEMA = {
+    "type": "object",
+    "required": ["plans", "currency"],
+    "properties": {
+        "plans": {"type": "array", "items": {"type": "string"}},
+        "pricing": {
+            "type": "object",
+            "additionalProperties": {"type": "object", "required": ["price"]},
+        },
+        "currency": {"type": "string"},
+    },
+}
+
+
+def feed(text, schema=SCHEMA, size=3):
+    """Feed text in small chunks; returns the validator."""
+    validator = IncrementalJSONValidator(schema)
+    for i in range(0, len(text), size):
+        validator.feed(text[i : i + size])
+    return validator
+
+
+def test_wrapped_answer_is_parsed():
+    """Test that reasoning, lead-in text and code fences are skipped."""
+    answer = {"plans": ["Pro"], "pricing": {"Pro": {"price": 9.5}}, "currency": "€"}
+    text = (
+        "<think>Maybe {plans: Pro}?</think>Here it is:\n```json\n"
+        f"{json.dumps(answer, indent=2)}\n```\nHope that helps!"
+    )
+
+    validator = feed(text)
+
+    assert validator.complete
+    assert validator.finish() == answer
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("{'", "double-quoted property name"),
+        ('{"plans": ["a"] "', "Expected ','"),
+        ('{"plans": "', "Expected array for 'plans'"),
+        ('{"plans": [1', "Expected string"),
+        ('{"pricing": {"Pro": {"cost": 1}', "Missing required keys \\['price'\\]"),
+        ('{"plans": []}', "Missing required keys \\['currency'\\]"),
+        ('{"note": tru3', "Invalid literal"),
+        ('{"currency": "US\n', "Unescaped control character"),
+        ('{"currency": "US\\\'', "Invalid escape"),
+        ('{"price": 1.2.', "Invalid number"),
+        ('{"price": 01', "Invalid number"),
+    ],
+)
+def test_errors_are_caught_where_they_happen(text, message):
+    """Test that the first invalid character raises, before the answer ends."""
+    with pytest.raises(JSONStreamError, match=message) as error:
+        feed(text)
+    assert error.value.position == len(text)
+
+
+def test_numbers_and_escapes_that_json_accepts_are_parsed():
+    """Test that the stricter string and number checks allow valid JSON."""
+    text = '[0, -1, 2.50, 1e5, -0.5E-3, "tab\\t \\u00e9 \\" \\/"]'
+
+    assert feed(text, schema=None).finish() == json.loads(text)
+
+
+def test_truncated_answer_fails_on_finish():
+    """Test that an answer cut off mid-object is not accepted."""
+    validator = feed('{"plans": ["Pro"], "curr')
+    with pytest.raises(JSONStreamError, match="ended before"):
+        validator.finish()
+
+
+def stream_of(text, log):
+    """A stream that yields text in chunks and records how much was read."""
+
+    async def events():
+        for i in range(0, len(text), 4):
+            log.append(i)
+            yield {"delta": text[i : i + 4]}
+
+    return CompletionStream(events())
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_aborts_and_retries():
+    """Test that a bad answer is dropped early and the call retried."""
+    bad = "{'plans': ['Pro']," + " padding" * 500
+    good = '{"plans": ["Pro"], "currency": "USD"}'
+    answers, read = [bad, good], []
+
+    data, stream = await parse_stream(lambda: stream_of(answers.pop(0), read), SCHEMA)
+
+    assert data == {"plans": ["Pro"], "currency": "USD"}
+    assert stream.text == good
+    assert len(read) < len(good)  # The bad answer was dropped after a few chunks
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_retries_invalid_number():
+    """Test that a number json.loads would reject is retried, not raised."""
+    answers = [
+        '{"plans": [], "currency": "USD", "n": 01}',
+        '{"plans": [], "currency": "USD"}',
+    ]
+
+    data, _ = await parse_stream(lambda: stream_of(answers.pop(0), []), SCHEMA)
+
+    assert data == {"plans": [], "currency": "USD"}
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_stops_reading_bad_output():
+    """Test that the abandoned stream is not read to the end."""
+    read = []
+    bad = "{'plans'" + " padding" * 500
+
+    with pytest.raises(JSONStreamError):
+        await parse_stream(lambda: stream_of(bad, read), SCHEMA, attempts=2)
+
+    assert len(read) == 2 * 1  # Each attempt stopped at its first chunk
@@ -0,0 +1,121 @@
+"""Tests for API key pools."""
+
+import asyncio
+import time
+import pytest
+from aiohttp import web
+from pynions.core.keypool import KeyPool, KeyPoolExhaustedError, load_keys
+from pynions.plugins.serper import SerperWebSearch
+
+
+def test_load_keys_prefers_pool_variable(monkeypatch):
+    """Test that NAME_KEYS wins over NAME_KEY and duplicates are dropped."""
+    monkeypatch.setenv("SERPER_API_KEY", "single")
+    assert load_keys("SERPER_API_KEY") == ["single"]
+
+    monkeypatch.setenv("SERPER_API_KEYS", "a, b,a\nc")
+    assert load_keys("SERPER_API_KEY") == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_acquire_round_robins_and_prefers_remaining_quota():
+    """Test that keys rotate and the one with most quota left goes first."""
+    pool = KeyPool("test", ["a", "b"])
+    picked = [(await pool.acquire()).value for _ in range(4)]
+    assert sorted(picked[:2]) == ["a", "b"]
+    assert picked[:2] == picked[2:]
+
+    pool = KeyPool("test", ["a", "b"], quota=10)
+    pool.keys[0].used = 8
+    assert (await pool.acquire()).value == "b"
+
+
+@pytest.mark.asyncio
+async def test_report_removes_bad_keys_from_rotation():
+    """Test that 401 revokes a key and 429 cools it down."""
+    pool = KeyPool("test", ["a", "b"], cooldown=30)
+    a, b = pool.keys
+
+    pool.report(a, 401)
+    pool.report(b, 429, {"Retry-After": "0.05"})
+    assert pool.active == 1
+
+    start = time.monotonic()
+    assert (await pool.acquire()) is b
+    assert time.monotonic() - start >= 0.04
+
+    pool.report(b, 401)
+    with pytest.raises(KeyPoolExhaustedError):
+        await pool.acquire()
+
+
+@pytest.mark.asyncio
+async def test_rpm_limit_and_circuit_breaker():
+    """Test per-key rate limits and the circuit opened by repeated errors."""
+    pool = KeyPool("test", ["a"], rpm=2, failure_threshold=2)
+    key = await pool.acquire()
+    await pool.acquire()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(pool.acquire(), 0.05)
+
+    pool.report(key, 500)
+    pool.report(key, None)
+    assert key.disabled_until > time.monotonic()
+
+
+@pytest.fixture
+async def serper_server(monkeypatch):
+    """Local Serper stand-in that rejects one of the keys."""
+    monkeypatch.setenv("SERPER_API_KEYS", "revoked-key,good-key")
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers["X-API-KEY"])
+        if request.headers["X-API-KEY"] == "revoked-key":
+            return web.json_response({"message": "Unauthorized"}, status=401)
+        return web.json_response({"organic": [], "credits": 1})
+
+    app = web.Application()
+    app.router.add_post("/search", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/search", seen
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_serper_fails_over_to_next_key(serper_server):
+    """Test that a rejected key is retried with the next and then skipped."""
+    base_url, seen = serper_server
+    searcher = SerperWebSearch({"coalesce": False})
+    searcher.base_url = base_url
+
+    for query in ("first", "second", "third"):
+        assert await searcher.execute({"query": query}) == {
+            "organic": [],
+            "credits": 1,
+        }
+
+    assert seen.count("revoked-key") == 1
+    assert seen.count("good-key") == 3
+    assert searcher.keys.stats()["active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_one_request(serper_server):
+    """Test that identical searches in flight coalesce on the transport."""
+    base_url, seen = serper_server
+    searcher = SerperWebSearch()
+    searcher.base_url = base_url
+    coalesced = searcher.transport.metrics.coalesced
+
+    results = await asyncio.gather(
+        *(searcher.execute({"query": query}) for query in ("CRM", "crm ", "CRM"))
+    )
+
+    assert all(result == {"organic": [], "credits": 1} for result in results)
+    assert seen.count("good-key") == 1
+    assert searcher.transport.metrics.coalesced == coalesced + 2
@@ -0,0 +1,78 @@
+"""Tests for the call ledger and its budgets."""
+
+import asyncio
+from types import SimpleNamespace
+import pytest
+from pynions.core.ledger import (
+    Budget,
+    BudgetExceededError,
+    estimate_cost,
+    get_ledger,
+    record_call,
+    workflow_scope,
+)
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+
+USAGE = {"prompt_tokens": 1000, "completion_tokens": 1000}
+
+
+def test_cost_uses_price_list_and_cached_discount():
+    """Test cost estimates, including cheaper cached prompt tokens."""
+    full = estimate_cost("openai", "gpt-4o-mini", USAGE)
+    cached = estimate_cost("openai", "gpt-4o-mini", {**USAGE, "cached_tokens": 800})
+
+    assert full == pytest.approx(0.00075)
+    assert cached < full
+    assert estimate_cost("perplexity", "sonar-reasoning-pro", USAGE) > 0
+    assert estimate_cost("custom", "unknown-model", USAGE) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_calls_are_aggregated_by_scope():
+    """Test totals per run and per workflow, and grouped summaries."""
+    await record_call("openai", "gpt-4o-mini", USAGE, latency=1.0)
+    with workflow_scope("research"):
+        await asyncio.gather(
+            record_call("perplexity", "sonar", USAGE, latency=3.0),
+            record_call("serper", cost=0.001, kind="search"),
+        )
+
+    ledger = get_ledger()
+    run = ledger.totals("run")
+    research = ledger.totals("workflow", workflow="research")
+
+    assert run["calls"] == 3 and run["tokens"] == 4000
+    assert research["calls"] == 2 and research["tokens"] == 2000
+    assert [row["kind"] for row in ledger.summary(by="kind")] == ["llm", "search"]
+
+
+@pytest.mark.asyncio
+async def test_budget_throttles_then_rejects(monkeypatch):
+    """Test that calls slow down near the limit and stop at it."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    calls = []
+
+    async def acompletion(model, messages, **kwargs):
+        calls.append(model)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(
+                prompt_tokens=400, completion_tokens=50, total_tokens=450
+            ),
+        )
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    get_ledger().budgets = [Budget("run", tokens=1000, throttle_delay=0.2)]
+    llm = LiteLLM({"max_retries": 5})
+    request = {"messages": [{"role": "user", "content": "Hi"}]}
+
+    await asyncio.gather(llm.execute(request), llm.execute(request))
+    start = asyncio.get_running_loop().time()
+    await llm.execute(request)  # 900 of 1000 tokens used: waits first
+    assert asyncio.get_running_loop().time() - start >= 0.2
+
+    with pytest.raises(BudgetExceededError, match="run budget"):
+        await llm.execute(request)
+    assert len(calls) == 3  # Rejected without reaching the provider or retrying
@@ -0,0 +1,57 @@
+"""Tests for the non-blocking LiteLLM plugin."""
+
+import asyncio
+import time
+import pytest
+from pynions.plugins.litellm_plugin import LiteLLM
+
+MESSAGES = {"messages": [{"role": "user", "content": "Hi"}]}
+
+
+@pytest.mark.asyncio
+async def test_completions_run_concurrently_within_limit(fake_acompletion):
+    """Test that calls overlap but never exceed max_concurrency."""
+    llm = LiteLLM({"max_concurrency": 3})
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(llm.execute(MESSAGES) for _ in range(6)))
+    elapsed = time.monotonic() - start
+
+    assert all(r["choices"][0]["message"]["content"] == "ok go" for r in results)
+    assert fake_acompletion["peak"] == 3
+    assert elapsed < 0.35  # Two rounds of 0.1s, not six
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive(fake_acompletion):
+    """Test that other coroutines make progress during a completion."""
+    llm = LiteLLM()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    await llm.execute(MESSAGES)
+    task.cancel()
+
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_cancellation_frees_the_slot(fake_acompletion):
+    """Test that a cancelled completion releases its concurrency slot."""
+    llm = LiteLLM({"max_concurrency": 1})
+
+    task = asyncio.create_task(llm.execute(MESSAGES))
+    await asyncio.sleep(0.02)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert fake_acompletion["running"] == 0
+    result = await asyncio.wait_for(llm.execute(MESSAGES), 1)
+    assert result["usage"]["total_tokens"] == 5
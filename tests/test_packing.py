@@ -0,0 +1,119 @@
+"""Tests for packing small tasks into multi-item prompts."""
+
+import asyncio
+import json
+import pytest
+from pynions.core.completion_stream import CompletionStream
+from pynions.core.packing import RequestPacker, matches_schema
+from pynions.workers.alternatives_analysis_worker import AlternativesAnalysisWorker
+
+
+def brand_of(text):
+    return text.split("Brand: ")[1].split("\n")[0]
+
+
+class FakeLLM:
+    """Answers packed prompts (skipping some items) and single prompts."""
+
+    def __init__(self, skip=()):
+        self.skip = skip
+        self.calls = []
+
+    def stream(self, input_data):
+        return CompletionStream(self._events(input_data))
+
+    async def _events(self, input_data):
+        system, user = (m["content"] for m in input_data["messages"])
+        self.calls.append(user)
+        await asyncio.sleep(0)
+        if "numbered items" in system:
+            answer = {}
+            for block in user.split("\n\n["):
+                number = block.lstrip("[").split("]")[0]
+                brand = brand_of(block)
+                if brand in self.skip:
+                    answer[number] = "not a list" if number == "3" else None
+                else:
+                    answer[number] = [f"{brand}-alt.com"]
+            answer = {k: v for k, v in answer.items() if v is not None}
+        else:
+            answer = [f"{brand_of(user)}-alt.com"]
+        text = json.dumps(answer)
+        for i in range(0, len(text), 12):
+            yield {"delta": text[i : i + 12]}
+
+
+@pytest.mark.asyncio
+async def test_packed_answers_are_split_and_failures_reissued(monkeypatch):
+    """Test that one call answers many brands and bad items go alone."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    worker = AlternativesAnalysisWorker()
+    worker.llm = FakeLLM(skip={"b", "c"})
+    inputs = [
+        {"brand": brand, "number_of_items": 3, "search_results": {"organic": []}}
+        for brand in "abcd"
+    ]
+
+    results = await worker.execute_many(inputs)
+
+    assert [r["alternatives"] for r in results] == [
+        [f"{brand}-alt.com"] for brand in "abcd"
+    ]
+    assert len(worker.llm.calls) == 3  # One packed call, then b and c alone
+    assert worker.llm.calls[0].count("Brand: ") == 4
+
+
+@pytest.mark.asyncio
+async def test_packs_respect_the_token_budget():
+    """Test that items beyond the prompt budget go into another pack."""
+    sizes = []
+
+    def stream(messages, max_tokens):
+        sizes.append(messages[-1]["content"].count("Item"))
+
+        async def events():
+            yield {"delta": json.dumps({str(i): "ok" for i in range(1, 11)})}
+
+        return CompletionStream(events())
+
+    async def single(text):
+        return "alone"
+
+    packer = RequestPacker(
+        stream,
+        "Answer each item.",
+        single,
+        max_prompt_tokens=250,
+        max_items=4,
+        flush_interval=60,
+    )
+    answers = await asyncio.gather(
+        *(packer.submit(f"Item {i} " + "word " * 50) for i in range(8))
+    )
+
+    assert answers == ["ok"] * 8
+    assert sizes == [4, 4]
+    assert packer.stats == {"packs": 2, "failed_packs": 0, "packed": 8, "reissued": 0}
+    assert not matches_schema([], {"type": "array"})
+    assert not matches_schema("x", {"type": "array"})
+
+
+@pytest.mark.asyncio
+async def test_failed_pack_is_counted_and_its_items_reissued():
+    """Test that a packed call that raises is not counted as a pack."""
+
+    def stream(messages, max_tokens):
+        async def events():
+            raise ConnectionError("Connection reset")
+            yield
+
+        return CompletionStream(events())
+
+    async def single(text):
+        return f"alone: {text}"
+
+    packer = RequestPacker(stream, "Answer each item.", single, max_items=3)
+    answers = await asyncio.gather(*(packer.submit(f"Item {i}") for i in range(3)))
+
+    assert answers == [f"alone: Item {i}" for i in range(3)]
+    assert packer.stats == {"packs": 0, "failed_packs": 1, "packed": 0, "reissued": 3}
@@ -0,0 +1,101 @@
+"""Tests for prompt prefix layout and prompt cache accounting."""
+
+from types import SimpleNamespace
+import pytest
+from pynions.core.prompt import (
+    PromptBuilder,
+    cached_tokens,
+    prompt_cache_stats,
+    record_prompt_usage,
+)
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+from pynions.workers.perplexity_article_writer_worker import (
+    PerplexityArticleWriterWorker,
+    RESEARCH_SECTIONS,
+)
+
+
+def test_calls_share_the_static_prefix():
+    """Test that only the trailing data differs between calls."""
+    prompt = PromptBuilder("You are an expert.", "Research the topic below.")
+
+    first = prompt.build("Topic: CRM")
+    second = prompt.build("Topic: SEO")
+
+    assert first[0] == second[0]
+    assert first[0]["content"] == "You are an expert.\n\nResearch the topic below."
+    assert first[1] == {"role": "user", "content": "Topic: CRM"}
+    assert "cache_control" in prompt.build("x", cache_control=True)[0]
+
+
+@pytest.mark.parametrize(
+    "usage",
+    [
+        {"prompt_tokens_details": {"cached_tokens": 1200}},
+        {"cache_read_input_tokens": 1200},
+        {"prompt_cache_hit_tokens": 1200},
+        {"cached_tokens": 1200},
+    ],
+)
+def test_cached_tokens_from_each_provider(usage):
+    """Test that each provider's usage field is understood."""
+    assert cached_tokens(usage) == 1200
+
+
+@pytest.mark.asyncio
+async def test_hits_and_misses_are_recorded():
+    """Test that cached tokens and hit/miss latency are counted per provider."""
+    await record_prompt_usage("openai", {"prompt_tokens": 2000}, 2.0)
+    await record_prompt_usage(
+        "openai", {"prompt_tokens": 2000, "cached_tokens": 1500}, 1.0
+    )
+
+    stats = prompt_cache_stats("openai")
+
+    assert stats["calls"] == 2 and stats["hits"] == 1
+    assert stats["cached_share"] == 0.375
+    assert stats["hit_latency"] == 1.0 and stats["miss_latency"] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_litellm_records_cached_tokens(monkeypatch):
+    """Test that LiteLLM reports and records the provider's cached tokens."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    async def acompletion(model, messages, **kwargs):
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(
+                prompt_tokens=1500,
+                completion_tokens=1,
+                total_tokens=1501,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+            ),
+        )
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+
+    result = await LiteLLM().execute({"messages": [{"role": "user", "content": "Hi"}]})
+
+    assert result["usage"]["cached_tokens"] == 1024
+    assert prompt_cache_stats("openai")["cached_tokens"] == 1024
+
+
+def test_article_prompt_puts_research_last(monkeypatch):
+    """Test that articles on different topics share the instruction prefix."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    writer = PerplexityArticleWriterWorker()
+
+    def research(topic):
+        answer = {"choices": [{"message": {"content": f"About {topic}"}}]}
+        sections = {name: {**answer, "citations": []} for name in RESEARCH_SECTIONS}
+        return {"sections": sections}
+
+    first = writer._create_article_prompt("CRM", "marketers", research("CRM"))
+    second = writer._create_article_prompt("SEO", "founders", research("SEO"))
+
+    assert first[0] == second[0]
+    assert first[0]["cache_control"] == {"type": "ephemeral"}
+    assert first[1]["content"].startswith("Topic: CRM\nAudience: marketers")
@@ -0,0 +1,182 @@
+"""Tests for TPM/RPM-aware admission of LLM calls."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from aiohttp import web
+from litellm import RateLimitError
+from pynions.core import ratelimit
+from pynions.core.ratelimit import RateScheduler
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM
+from pynions.plugins.perplexity import PerplexityAPI
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+async def timed_acquires(rate, count, max_tokens):
+    rate.estimate(MESSAGES, max_tokens)  # Load the tokenizer before timing
+    start = time.monotonic()
+    starts = []
+
+    async def call():
+        reservation = await rate.acquire(MESSAGES, max_tokens)
+        starts.append(time.monotonic() - start)
+        return reservation
+
+    reservations = await asyncio.gather(*(call() for _ in range(count)))
+    return sorted(starts), reservations
+
+
+@pytest.mark.asyncio
+async def test_tpm_window_holds_calls_that_do_not_fit():
+    """Test that a call waits for the window when the token limit is used."""
+    rate = RateScheduler("test", tpm=100, window=0.2)
+
+    starts, _ = await timed_acquires(rate, 3, max_tokens=40)
+
+    assert starts[1] < 0.05
+    assert starts[2] >= 0.18  # Third 40+ token call waited for the window
+    assert rate.stats["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_rpm_limit_applies_to_small_calls():
+    """Test that tiny calls are still capped by requests per minute."""
+    rate = RateScheduler("test", tpm=100000, rpm=2, window=0.2)
+
+    starts, _ = await timed_acquires(rate, 3, max_tokens=1)
+
+    assert starts[1] < 0.05
+    assert starts[2] >= 0.18
+
+
+@pytest.mark.asyncio
+async def test_settled_usage_frees_tokens_and_corrects_estimates():
+    """Test that actual usage replaces the estimate and lowers later ones."""
+    rate = RateScheduler("test", tpm=100, window=10)
+    first = await rate.acquire(MESSAGES, 80)
+    assert rate.usage()["tokens"] > 80
+
+    waiting = asyncio.ensure_future(rate.acquire(MESSAGES, 80))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    first.settle({"prompt_tokens": first.prompt_tokens, "completion_tokens": 8})
+    second = await asyncio.wait_for(waiting, 0.1)
+
+    assert rate.completion_ratio < 1.0
+    assert rate.estimate(MESSAGES, 80).tokens < second.tokens
+
+    rate.pause(0.05)  # A 429 pauses admission and restores full estimates
+    assert rate.completion_ratio == 1.0
+    second.settle({"prompt_tokens": 1, "completion_tokens": 1})
+    start = time.monotonic()
+    await rate.acquire(MESSAGES, 1)
+    assert time.monotonic() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_block_the_queue():
+    """Test that a cancelled call leaves the queue to the ones behind it."""
+    rate = RateScheduler("test", rpm=1, window=0.1)
+    await rate.acquire(MESSAGES, 1)
+    cancelled = asyncio.ensure_future(rate.acquire(MESSAGES, 1))
+    behind = asyncio.ensure_future(rate.acquire(MESSAGES, 1))
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+
+    await asyncio.wait_for(behind, 0.5)
+    assert rate.usage()["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_litellm_waits_out_a_rate_limit(monkeypatch):
+    """Test that a 429 pauses the model's calls and the call is retried."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(ratelimit, "DEFAULT_RATE_COOLDOWN", 0.1)
+    calls = []
+
+    async def acompletion(model, messages, **kwargs):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RateLimitError("Rate limit reached", "openai", model)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(
+                prompt_tokens=9, completion_tokens=20, total_tokens=29
+            ),
+        )
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    llm = LiteLLM({"tpm": 100000, "max_tokens": 200})
+
+    result = await llm.execute({"messages": MESSAGES})
+
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert calls[1] - calls[0] >= 0.09
+    rate = ratelimit.get_rate_scheduler("openai", llm.model, llm.config)
+    assert rate.stats["rate_limited"] == 1
+    assert rate.stats["settled"] == 1
+    assert rate.usage()["tokens"] < 2 * 200  # The settled call counts 29 tokens
+
+
+@pytest.mark.asyncio
+async def test_failed_litellm_attempts_release_their_tokens(monkeypatch):
+    """Test that calls which raise leave no reserved tokens behind."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    async def acompletion(model, messages, **kwargs):
+        raise ConnectionError("Connection reset")
+
+    monkeypatch.setattr(litellm_plugin, "acompletion", acompletion)
+    llm = LiteLLM({"tpm": 100000, "max_tokens": 200, "max_retries": 2})
+
+    with pytest.raises(ConnectionError):
+        await llm.execute({"messages": MESSAGES})
+
+    rate = ratelimit.get_rate_scheduler("openai", llm.model, llm.config)
+    assert rate.usage() == {"tokens": 0, "requests": 2, "waiting": 0}
+
+
+@pytest.fixture
+async def limited_perplexity(monkeypatch):
+    """Local Perplexity stand-in that rate limits its first request."""
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "pplx-test")
+    requests = []
+
+    async def handler(request):
+        requests.append(await request.json())
+        if len(requests) == 1:
+            return web.json_response({}, status=429, headers={"Retry-After": "0.05"})
+        return web.json_response(
+            {
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+            }
+        )
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/chat/completions"
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_perplexity_retry_does_not_leak_reservations(limited_perplexity):
+    """Test that only the answered request's usage stays in the window."""
+    api = PerplexityAPI({"tpm": 100000, "max_tokens": 500})
+    api.base_url = limited_perplexity
+
+    result = await api.execute({"messages": MESSAGES})
+
+    assert result["choices"][0]["message"]["content"] == "ok"
+    rate = ratelimit.get_rate_scheduler("perplexity", api.config["model"], api.config)
+    assert rate.usage() == {"tokens": 15, "requests": 2, "waiting": 0}
+    assert rate.stats["rate_limited"] == 1
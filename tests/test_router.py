@@ -0,0 +1,99 @@
+"""Tests for the model router."""
+
+import pytest
+from litellm import RateLimitError
+from pynions.core.budget import TokenBudgetError
+from pynions.plugins import litellm_plugin
+from pynions.plugins.litellm_plugin import LiteLLM, model_provider
+from pynions.plugins.router import ModelRouter, model_stats
+
+MESSAGES = {"messages": [{"role": "user", "content": "Hi"}]}
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Fake acompletion whose behaviour per model is set by the test."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    behaviour, calls = {}, []
+
+    async def execute(self, input_data):
+        calls.append(self.model)
+        outcome = behaviour.get(self.model, "ok")
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"choices": [{"message": {"content": outcome}}], "usage": None}
+
+    monkeypatch.setattr(LiteLLM, "execute", execute)
+    return behaviour, calls
+
+
+def test_model_provider_and_key_selection(monkeypatch):
+    """Test that keys follow the provider, not a substring of the name."""
+    assert model_provider("anthropic/claude-3-5-sonnet-20240620") == "anthropic"
+    assert model_provider("claude-3-5-haiku") == "anthropic"
+    assert model_provider("openai/my-anthropic-finetune") == "openai"
+    assert model_provider("gpt-4o-mini") == "openai"
+
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "a-key")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert LiteLLM({"model": "claude-3-5-haiku"}).api_key == "a-key"
+    with pytest.raises(ValueError, match="OpenAI"):
+        LiteLLM({"model": "openai/my-anthropic-finetune"})
+
+
+@pytest.mark.asyncio
+async def test_overload_falls_back_and_pauses_provider(providers):
+    """Test that an overloaded provider is skipped without sleeping."""
+    behaviour, calls = providers
+    behaviour["gpt-4o-mini"] = RateLimitError("Overloaded", "openai", "gpt-4o-mini")
+    router = ModelRouter({"models": ["gpt-4o-mini", "claude-3-5-haiku"]})
+
+    first = await router.execute(MESSAGES)
+    second = await router.execute(MESSAGES)
+
+    assert first["router"] == {"model": "claude-3-5-haiku", "fallbacks": 1}
+    assert second["router"]["fallbacks"] == 0  # Paused provider is not retried
+    assert calls == ["gpt-4o-mini", "claude-3-5-haiku", "claude-3-5-haiku"]
+    assert router.stats()["gpt-4o-mini"]["cooling"] is True
+
+
+@pytest.mark.asyncio
+async def test_error_text_with_status_digits_is_not_overload(providers):
+    """Test that a bad request mentioning 429 does not pause the provider."""
+    behaviour, calls = providers
+    behaviour["gpt-4o-mini"] = ValueError("Invalid value 429 for max_tokens")
+    router = ModelRouter({"models": ["gpt-4o-mini", "claude-3-5-haiku"]})
+
+    result = await router.execute(MESSAGES)
+
+    assert result["router"]["fallbacks"] == 1
+    assert router.stats()["gpt-4o-mini"]["cooling"] is False
+
+
+@pytest.mark.asyncio
+async def test_prompt_too_large_moves_on_to_next_model(providers):
+    """Test that a token budget error tries a model with a larger window."""
+    behaviour, calls = providers
+    behaviour["gpt-4"] = TokenBudgetError("Prompt needs 9000 tokens, 8192 fit")
+    router = ModelRouter({"models": ["gpt-4", "gpt-4o"]})
+
+    result = await router.execute(MESSAGES)
+
+    assert result["router"] == {"model": "gpt-4o", "fallbacks": 1}
+    assert calls == ["gpt-4", "gpt-4o"]
+    assert router.stats()["gpt-4"]["failures"] == 0  # Not held against gpt-4
+
+
+@pytest.mark.asyncio
+async def test_choice_uses_prompt_size_and_latency_slo(providers):
+    """Test that small windows and slow models are passed over."""
+    router = ModelRouter(
+        {"models": ["gpt-4", "gpt-4o-mini", "gpt-4o"], "latency_slo": 5}
+    )
+    big = [{"role": "user", "content": "word " * 10000}]  # About 10k tokens
+    assert router.choose(big)[0] == "gpt-4o-mini"  # 8k window too small
+
+    model_stats("gpt-4o-mini").success(12.0)
+    assert router.choose(big)[:2] == ["gpt-4o", "gpt-4o-mini"]
+    assert router.choose(big)[-1] == "gpt-4"
@@ -0,0 +1,80 @@
+"""Tests for the per-host extraction scheduler."""
+
+import asyncio
+from types import SimpleNamespace
+import pytest
+from pynions.core import scheduler as scheduler_module
+from pynions.core.scheduler import HostScheduler
+
+
+@pytest.mark.asyncio
+async def test_per_host_and_global_limits():
+    """Test that no host exceeds its cap while other hosts keep running."""
+    scheduler = HostScheduler(max_concurrency=3, per_host=1, min_interval=0)
+    running = {"a.com": 0, "b.com": 0}
+    peak = {"a.com": 0, "b.com": 0, "total": 0}
+
+    async def fetch(url):
+        host = url.split("/")[2]
+        running[host] += 1
+        peak[host] = max(peak[host], running[host])
+        peak["total"] = max(peak["total"], sum(running.values()))
+        for _ in range(3):
+            await asyncio.sleep(0)  # Yield so other jobs can start meanwhile
+        running[host] -= 1
+        return url
+
+    urls = [f"https://a.com/{i}" for i in range(4)] + ["https://b.com/1"]
+    results = await asyncio.gather(
+        *(scheduler.run(url, lambda url=url: fetch(url)) for url in urls)
+    )
+
+    assert results == urls
+    assert peak["a.com"] == 1
+    assert peak["total"] == 2  # b.com ran alongside a.com instead of after it
+
+
+@pytest.mark.asyncio
+async def test_min_interval_spaces_starts_on_one_host(monkeypatch):
+    """Test that requests to one host start at least min_interval apart."""
+    real_sleep = asyncio.sleep
+    waits = {}
+
+    async def sleep(delay):
+        waits[asyncio.current_task().get_name()] = delay
+        await real_sleep(0)
+
+    # Freeze the clock, so each wait is exactly its offset from the first start
+    monkeypatch.setattr(
+        scheduler_module, "time", SimpleNamespace(monotonic=lambda: 100.0)
+    )
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    scheduler = HostScheduler(per_host=3, min_interval=0.5)
+
+    async def fetch(url):
+        return url
+
+    urls = ["https://a.com/1", "https://a.com/2", "https://a.com/3", "https://b.com/1"]
+    jobs = [
+        asyncio.create_task(scheduler.run(url, lambda url=url: fetch(url)), name=url)
+        for url in urls
+    ]
+    assert await asyncio.gather(*jobs) == urls
+
+    assert waits == {"https://a.com/2": 0.5, "https://a.com/3": 1.0}
+    assert set(scheduler._hosts) == {"a.com", "b.com"}  # Kept while spacing applies
+
+
+@pytest.mark.asyncio
+async def test_idle_hosts_are_forgotten():
+    """Test that hosts leave the scheduler once their spacing has passed."""
+    scheduler = HostScheduler(min_interval=0)
+
+    async def fetch():
+        return None
+
+    for i in range(100):
+        await scheduler.run(f"https://site{i}.com/", fetch)
+
+    assert scheduler._hosts == {}
+    assert scheduler.stats["jobs"] == 100
@@ -0,0 +1,119 @@
+"""Tests for in-flight request coalescing."""
+
+import asyncio
+import pytest
+from pynions.core.singleflight import SingleFlight
+from pynions.core.utils import normalize_url, normalize_query
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_request():
+    """Test that identical concurrent calls run the function once."""
+    group = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"items": [1, 2, 3]}
+
+    waiters = asyncio.gather(*[group.do("key", fetch) for _ in range(5)])
+    await asyncio.sleep(0)
+    release.set()
+    results = await waiters
+
+    assert calls == 1
+    assert all(result == {"items": [1, 2, 3]} for result in results)
+    assert group.stats == {"calls": 1, "coalesced": 4}
+    assert not group.in_flight("key")
+
+
+@pytest.mark.asyncio
+async def test_followers_get_independent_copies():
+    """Test that mutating one caller's result does not leak to others."""
+    group = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return {"items": []}
+
+    waiters = asyncio.gather(group.do("k", fetch), group.do("k", fetch))
+    await asyncio.sleep(0)
+    release.set()
+    first, second = await waiters
+    assert group.stats["coalesced"] == 1
+    first["items"].append("changed")
+    assert second == {"items": []}
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_are_not_cached():
+    """Test that a finished call is not reused by later callers."""
+    group = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await group.do("k", fetch) == 1
+    assert await group.do("k", fetch) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_callers():
+    """Test that a failing call raises for every waiter."""
+    group = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        raise ValueError("boom")
+
+    waiters = asyncio.gather(
+        group.do("k", fetch), group.do("k", fetch), return_exceptions=True
+    )
+    await asyncio.sleep(0)
+    release.set()
+    results = await waiters
+    assert group.stats["coalesced"] == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_call_alive():
+    """Test that the shared call survives while someone still waits."""
+    group = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    first = asyncio.ensure_future(group.do("k", fetch))
+    second = asyncio.ensure_future(group.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "done"
+    assert first.cancelled()
+
+
+def test_normalize_url():
+    """Test that equivalent URLs normalize to the same key."""
+    assert normalize_url("HTTPS://Example.com:443/Pricing/#plans") == (
+        "https://example.com/Pricing"
+    )
+    assert normalize_url("example.com") == "https://example.com/"
+    assert normalize_url("https://example.com/?a=1") == "https://example.com/?a=1"
+
+
+def test_normalize_query():
+    """Test that queries differing only by case and spacing match."""
+    assert normalize_query("  site:Notion.so   Pricing ") == "site:notion.so pricing"
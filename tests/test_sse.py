@@ -0,0 +1,51 @@
+"""Tests for the server-sent events parser and <think> splitting."""
+
+from pynions.core.completion_stream import ThinkSplitter, split_think
+from pynions.core.sse import SSEParser
+
+
+def feed_all(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+def test_events_split_at_any_character():
+    """Test that events come out the same however the body is chunked."""
+    body = (
+        "\ufeff: keep-alive\r\n"
+        "event: update\r\nid: 7\r\ndata: first\r\ndata: second\r\n\r\n"
+        'data:{"n": 1}\r\r'
+        "retry: 3000\nfield-without-colon\n\n"
+        "data: unfinished"
+    )
+    for size in (1, 2, 3, 7, len(body)):
+        parser = SSEParser()
+        chunks = [body[i : i + size] for i in range(0, len(body), size)]
+        events = feed_all(parser, chunks)
+
+        assert [(e.event, e.data, e.id) for e in events] == [
+            ("update", "first\nsecond", "7"),
+            ("message", '{"n": 1}', "7"),
+        ]
+        assert events[1].json() == {"n": 1}
+        assert parser.retry == 3000  # Lines without data dispatch nothing
+
+
+def test_think_splitter_handles_tags_across_deltas():
+    """Test that reasoning and answer are kept apart across chunk borders."""
+    text = "<think>Check the pricing page.</think>\n\nPlans start at $9 <b>now</b>"
+    for size in (1, 3, 5, len(text)):
+        splitter = ThinkSplitter()
+        segments = []
+        for i in range(0, len(text), size):
+            segments.extend(splitter.feed(text[i : i + size]))
+        segments.extend(splitter.flush())
+
+        think = "".join(t for kind, t in segments if kind == "think")
+        answer = "".join(t for kind, t in segments if kind == "answer")
+        assert think == "Check the pricing page."
+        assert answer == "\n\nPlans start at $9 <b>now</b>"
+
+    assert split_think("<think>still thinking") == ("still thinking", "")
@@ -0,0 +1,131 @@
+"""Tests for bounded streaming response reads."""
+
+import gzip
+import zlib
+import pytest
+from multidict import CIMultiDict
+from pynions.core.health import get_url_health
+from pynions.core.streaming import BodyTooLargeError, read_text
+from pynions.plugins.jina import JinaAIReader
+
+
+class RawResponse:
+    """In-memory response exposing the aiohttp API the readers use."""
+
+    def __init__(self, body: bytes, headers: dict):
+        self.status = 200
+        self.headers = CIMultiDict(headers)
+        self.content = self
+        self._body = body
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self._body), size):
+            yield self._body[start : start + size]
+
+
+def raw_response(body: bytes, encoding: str = None) -> RawResponse:
+    """Build an in-memory response with an optional content-encoding."""
+    return RawResponse(body, {"content-encoding": encoding} if encoding else {})
+
+
+@pytest.mark.asyncio
+async def test_gzip_body_is_decoded_and_bytes_saved_reported():
+    """Test that gzip bodies are inflated and savings are counted."""
+    text = "pricing plans " * 5000
+    response = raw_response(gzip.compress(text.encode()), "gzip")
+
+    result, stats = await read_text(response)
+
+    assert result == text
+    assert stats.decoded_bytes == len(text)
+    assert stats.wire_bytes < stats.decoded_bytes
+    assert stats.bytes_saved == stats.decoded_bytes - stats.wire_bytes
+    assert not stats.truncated
+
+
+@pytest.mark.asyncio
+async def test_raw_deflate_body_is_decoded():
+    """Test that headerless deflate streams are accepted."""
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    body = compressor.compress(b"hello world") + compressor.flush()
+
+    result, _ = await read_text(raw_response(body, "deflate"))
+    assert result == "hello world"
+
+
+@pytest.mark.asyncio
+async def test_char_budget_truncates_early():
+    """Test that reading stops once the character budget is met."""
+    response = raw_response(("x" * 200_000).encode())
+
+    result, stats = await read_text(response, max_chars=1000)
+
+    assert len(result) == 1000
+    assert stats.truncated
+    assert stats.wire_bytes < 200_000
+
+
+@pytest.mark.asyncio
+async def test_byte_cap_raises_or_truncates():
+    """Test the hard size cap in both strict and truncating modes."""
+    body = ("y" * 300_000).encode()
+
+    with pytest.raises(BodyTooLargeError):
+        await read_text(raw_response(body), max_bytes=100_000, truncate=False)
+
+    result, stats = await read_text(raw_response(body), max_bytes=100_000)
+    assert stats.truncated
+    assert len(result) <= 100_000
+
+
+@pytest.mark.asyncio
+async def test_multibyte_characters_split_across_chunks():
+    """Test that UTF-8 sequences split between chunks decode correctly."""
+    text = "é" * 70_000  # Two bytes each, so chunk boundaries fall mid-character
+    result, _ = await read_text(raw_response(text.encode()))
+    assert result == text
+
+
+@pytest.mark.asyncio
+async def test_jina_text_mode_applies_budget(jina_server):
+    """Test that a content budget switches Jina to truncated text mode."""
+    base_url, requests = jina_server
+    reader = JinaAIReader({"max_chars": 500, "coalesce": False})
+    reader.base_url = base_url
+
+    result = await reader.execute({"url": "https://example.com/pricing"})
+
+    assert result["title"] == "Pricing"
+    assert result["url"] == "https://example.com/pricing"
+    assert result["content"].startswith("Plan details.")
+    assert len(result["content"]) <= 500
+    assert result["truncated"]
+    assert result["transfer"]["encoding"] == "gzip"
+    assert "gzip" in requests[0].headers["Accept-Encoding"]
+
+
+@pytest.mark.asyncio
+async def test_jina_json_mode_unchanged(jina_server):
+    """Test that the default JSON mode still returns full results."""
+    base_url, _ = jina_server
+    reader = JinaAIReader({"coalesce": False})
+    reader.base_url = base_url
+
+    result = await reader.execute({"url": "https://example.com/pricing"})
+
+    assert result["content"] == "Plan details."
+    assert not result["truncated"]
+
+
+@pytest.mark.asyncio
+async def test_jina_json_mode_oversized_body_is_not_a_url_failure(jina_server):
+    """Test that a JSON body over max_bytes is dropped, not marked bad."""
+    base_url, requests = jina_server
+    reader = JinaAIReader({"max_bytes": 10, "coalesce": False})
+    reader.base_url = base_url
+    url = "https://example.com/pricing"
+
+    assert await reader.execute({"url": url}) is None
+    assert await get_url_health().aknown_bad(url) is None
+    assert await reader.execute({"url": url}) is None
+    assert len(requests) == 2  # Not skipped as a known-bad URL
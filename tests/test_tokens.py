@@ -0,0 +1,89 @@
+"""Tests for exact token counting with lazily loaded tokenizers."""
+
+import os
+import shutil
+from pynions.core import tokens
+from pynions.core.budget import TokenBudget
+from pynions.core.tokens import (
+    MIN_CACHED_CHARS,
+    TokenCounter,
+    count_message_tokens,
+    count_tokens,
+    estimate_tokens,
+    tokenizer_family,
+)
+
+
+def test_counts_are_exact_and_batched():
+    """Test tokenizer choice, exact counts and that batches match singles."""
+    assert tokenizer_family("gpt-4o-mini") == "o200k_base"
+    assert tokenizer_family("openai/gpt-4") == "cl100k_base"
+    assert tokenizer_family("anthropic/claude-3-5-sonnet") == "claude"
+    assert tokenizer_family("sonar-pro") == "cl100k_base"
+
+    counter = TokenCounter("cl100k_base")
+    assert counter.exact is None  # Nothing loaded until the first count
+    assert counter.count("hello world") == 2
+    assert counter.exact is True
+
+    texts = ["Pricing starts at $10 per seat.", "", "hello world"]
+    assert counter.count_many(texts) == [counter.count(t) for t in texts]
+    assert count_tokens("hello world", "gpt-4o") == 2
+    messages = [{"role": "user", "content": "hello world"}]
+    assert count_message_tokens(messages, "gpt-4o") == 2 + tokens.MESSAGE_OVERHEAD
+
+
+def test_long_texts_are_counted_once():
+    """Test that repeated long texts come from the cache."""
+    counter = TokenCounter("cl100k_base", cache_size=2)
+    prompt = "You are an expert researcher. " * 20
+    assert len(prompt) >= MIN_CACHED_CHARS
+
+    first = counter.count_many([prompt, prompt, "short"])
+    second = counter.count(prompt)
+
+    assert first[0] == first[1] == second
+    assert counter.stats()["hits"] == 1
+    assert counter.stats()["cached"] == 1  # Short texts are not kept
+
+
+def test_missing_tokenizer_falls_back_to_estimates(monkeypatch):
+    """Test that counting still works when no tokenizer can be loaded."""
+
+    def unavailable(family):
+        raise ImportError("No module named 'tiktoken'")
+
+    monkeypatch.setattr(tokens, "_load_tiktoken", unavailable)
+    counter = TokenCounter("o200k_base")
+
+    assert counter.count("abcdefgh") == estimate_tokens("abcdefgh")
+    assert counter.exact is False
+
+
+def test_user_tiktoken_cache_dir_is_kept(monkeypatch, tmp_path):
+    """Test that loading tiktoken never replaces a cache dir the user set."""
+    cache = tmp_path / "tiktoken"
+    shutil.copytree(tokens._bundled_tokenizers(), cache)
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(cache))
+    assert tokens._load_tiktoken("cl100k_base")(["hello world"]) == [2]
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == str(cache)
+
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR")
+    monkeypatch.setenv("DATA_GYM_CACHE_DIR", str(cache))
+    tokens._load_tiktoken("cl100k_base")
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ  # Would shadow DATA_GYM
+
+
+def test_budget_counts_exactly_near_the_limit():
+    """Test that a prompt the estimate overshoots is not trimmed."""
+    content = "word " * 3000  # Estimated 3750 tokens, really about 3000
+    messages = [{"role": "user", "content": content}]
+    budget = TokenBudget("gpt-4o-mini", window=3600, reserve=0)
+
+    assert budget.fits(messages)
+    assert budget.fit_messages(messages) == messages
+
+    small = TokenBudget("gpt-4o-mini", window=2000, reserve=0)
+    fitted = small.fit_messages(messages)
+    assert small.fits(fitted)
+    assert count_tokens(fitted[0]["content"], "gpt-4o-mini") > 1500
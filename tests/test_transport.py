@@ -0,0 +1,159 @@
+"""Tests for the shared plugin transport."""
+
+import asyncio
+import gzip
+import pytest
+from aiohttp import web
+from pynions.core.cassette import CassetteMissError, use_cassette
+from pynions.core.streaming import read_text
+from pynions.core.transport import (
+    RetryPolicy,
+    Transport,
+    TransportTimeoutError,
+    transport_stats,
+)
+
+
+@pytest.fixture
+async def server():
+    """Local server with JSON, gzip, flaky and slow endpoints."""
+    hits = {"json": 0, "flaky": 0}
+
+    async def json_handler(request):
+        hits["json"] += 1
+        await asyncio.sleep(0.02)
+        payload = await request.json() if request.can_read_body else {}
+        return web.json_response({"echo": payload, "hit": hits["json"]})
+
+    async def gzip_handler(request):
+        body = gzip.compress(("compressible " * 1000).encode())
+        return web.Response(body=body, headers={"Content-Encoding": "gzip"})
+
+    async def flaky_handler(request):
+        hits["flaky"] += 1
+        if hits["flaky"] < 3:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.json_response({"ok": True})
+
+    async def slow_handler(request):
+        await asyncio.sleep(1)
+        return web.Response(text="late")
+
+    app = web.Application()
+    app.router.add_route("*", "/json", json_handler)
+    app.router.add_get("/gzip", gzip_handler)
+    app.router.add_get("/flaky", flaky_handler)
+    app.router.add_get("/slow", slow_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", hits
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["aiohttp", "httpx"])
+async def test_backends_share_one_api(server, backend):
+    """Test that both backends return decoded bodies and record metrics."""
+    base_url, _ = server
+    transport = Transport(f"test-{backend}", backend=backend)
+
+    response = await transport.request("POST", f"{base_url}/json", json={"q": 1})
+    assert response.status == 200
+    assert (await response.json())["echo"] == {"q": 1}
+
+    response = await transport.request("GET", f"{base_url}/gzip")
+    assert (await response.text()).startswith("compressible")
+
+    stats = transport.metrics.as_dict()
+    assert stats["requests"] == 2
+    assert stats["statuses"] == {200: 2}
+    assert 0 < stats["wire_bytes"] < 13000  # The gzip body stayed compressed
+    assert stats["latency_p95"] > 0
+    assert f"test-{backend}" in transport_stats()
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_wire_bytes_for_bounded_reads(server):
+    """Test that streamed responses work with streaming.read_text."""
+    base_url, _ = server
+    transport = Transport("test-stream")
+
+    async with transport.stream("GET", f"{base_url}/gzip") as response:
+        text, stats = await read_text(response, max_chars=100)
+
+    assert text == ("compressible " * 1000)[:100]
+    assert stats.encoding == "gzip"
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_and_hooks(server):
+    """Test that retryable statuses are retried and hooks see each attempt."""
+    base_url, hits = server
+    transport = Transport("test-retry", retry=RetryPolicy(attempts=3, backoff=0))
+    seen = []
+    transport.add_hook("request", lambda request: seen.append(request.attempt))
+    transport.add_hook("retry", lambda request, outcome: seen.append(outcome.status))
+
+    response = await transport.request("GET", f"{base_url}/flaky")
+
+    assert response.status == 200
+    assert hits["flaky"] == 3
+    assert seen == [1, 503, 2, 503, 3]
+    assert transport.metrics.retries == 2
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_coalesced_requests_share_one_response(server):
+    """Test that identical concurrent requests hit the server once."""
+    base_url, hits = server
+    transport = Transport("test-coalesce")
+
+    responses = await asyncio.gather(
+        *(transport.request("GET", f"{base_url}/json", coalesce=True) for _ in range(3))
+    )
+
+    assert hits["json"] == 1
+    assert [(await r.json())["hit"] for r in responses] == [1, 1, 1]
+    assert transport.metrics.coalesced == 2
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_timeout_raises_transport_timeout(server):
+    """Test that timeouts surface as TransportTimeoutError."""
+    base_url, _ = server
+    transport = Transport("test-timeout", timeout=0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await transport.request("GET", f"{base_url}/slow")
+    with pytest.raises(TransportTimeoutError):
+        await transport.request("GET", f"{base_url}/slow")
+    assert transport.metrics.errors == 2
+    await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_transport_records_and_replays_cassettes(server, tmp_path):
+    """Test that transport traffic goes through the active cassette."""
+    base_url, hits = server
+    transport = Transport("test-cassette")
+    path = tmp_path / "transport.jsonl"
+
+    with use_cassette(path, mode="record"):
+        response = await transport.request("GET", f"{base_url}/gzip")
+        recorded = await response.text()
+
+    with use_cassette(path, mode="replay"):
+        response = await transport.request("GET", f"{base_url}/gzip")
+        assert await response.text() == recorded
+        assert response.headers["Content-Encoding"] == "gzip"
+        with pytest.raises(CassetteMissError):
+            await transport.request("GET", f"{base_url}/json")
+    assert hits["json"] == 0  # Replay misses never reach the network
+    await transport.aclose()
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 from pynions.core import Workflow, WorkflowStep
+from pynions.core.health import get_url_health
 from pynions.plugins.serper import SerperWebSearch
 from pynions.plugins.jina import JinaAIReader
 from pynions.plugins.litellm_plugin import LiteLLM
@@ -11,7 +12,9 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def verify_company_data(domain: str, data_type: str) -> dict:
+async def verify_company_data(
+    domain: str, data_type: str, max_sources: int = 5, max_candidates: int = 8
+) -> dict:
     """Verify specific data from company website using targeted search"""
     print(f"\n🔍 Verifying {data_type} data for {domain}")
 
@@ -22,27 +25,36 @@ async def verify_company_data(domain: str, data_type: str) -> dict:
         "about": f"site:{domain} about",
     }
 
-    serper = SerperWebSearch({"max_results": 5})
+    serper = SerperWebSearch({"max_results": max_candidates})
     jina = JinaAIReader()
 
     print(f"   Searching: {search_queries[data_type]}")
     results = await serper.execute({"query": search_queries[data_type]})
     verified_data = []
 
-    for idx, result in enumerate(results.get("organic", []), 1):
-        url = result["link"]
-        print(f"   Processing {idx}/5: {url}")
+    # Healthy pages first; spare results stand in for known-bad ones
+    candidates = await get_url_health().arank(
+        results.get("organic", []), key=lambda r: r["link"]
+    )
 
+    async def extract(url: str):
         try:
             content = await jina.execute({"url": url})
             if content and content.get("content"):
-                print(f"   ✅ Content extracted: {len(content['content'])} characters")
-                verified_data.append({"url": url, "content": content["content"]})
-            else:
-                print("   ⚠️ No content extracted")
+                print(f"   ✅ {url}: {len(content['content'])} characters")
+                return {"url": url, "content": content["content"]}
+            print(f"   ⚠️ No content extracted: {url}")
         except Exception as e:
-            print(f"   ❌ Error extracting content: {str(e)}")
-            continue
+            print(f"   ❌ Error extracting {url}: {str(e)}")
+        return None
+
+    # Extract in parallel waves, topping up from the spare results
+    pending = [result["link"] for result in candidates]
+    while pending and len(verified_data) < max_sources:
+        wave = pending[: max_sources - len(verified_data)]
+        pending = pending[len(wave) :]
+        pages = await asyncio.gather(*(extract(url) for url in wave))
+        verified_data += [page for page in pages if page]
 
     return {"domain": domain, "data_type": data_type, "sources": verified_data}
 
@@ -102,15 +114,20 @@ async def brand_alternatives_workflow(brand: str, number_of_items: int = 5):
         alternatives = alternatives_response["content"].split(",")
         verified_data = {}
 
-        for domain in alternatives:
-            domain = domain.strip()
-            print(f"\n📌 Processing {domain}")
-            verified_data[domain] = {}
-
-            for data_type in ["pricing", "features", "integrations", "about"]:
-                verified_data[domain][data_type] = await verify_company_data(
-                    domain, data_type
-                )
+        # All domains and data types run at once; JinaAIReader's host
+        # scheduler keeps the page fetches polite to each site
+        data_types = ["pricing", "features", "integrations", "about"]
+        jobs = [
+            (domain.strip(), data_type)
+            for domain in alternatives
+            for data_type in data_types
+        ]
+        print(f"\n📌 Processing {len(alternatives)} domains")
+        verifications = await asyncio.gather(
+            *(verify_company_data(domain, data_type) for domain, data_type in jobs)
+        )
+        for (domain, data_type), result in zip(jobs, verifications):
+            verified_data.setdefault(domain, {})[data_type] = result
 
         print("\n✅ Research complete!")
         return verified_data